@@ -204,6 +204,25 @@ CSRF_TRUSTED_ORIGINS = [
 # NCBI integration defaults
 NCBI_MAX_DOWNLOAD_BYTES = int(os.environ.get('NCBI_MAX_DOWNLOAD_BYTES', 1024 * 1024 * 1024))  # 1 GiB
 NCBI_HTTP_TIMEOUT = int(os.environ.get('NCBI_HTTP_TIMEOUT', 120))
+# Read size when streaming NCBI downloads to storage
+NCBI_DOWNLOAD_CHUNK_BYTES = int(os.environ.get('NCBI_DOWNLOAD_CHUNK_BYTES', 1024 * 1024))
+# Background imports (python manage.py run_ncbi_imports)
+NCBI_IMPORT_WORKERS = int(os.environ.get('NCBI_IMPORT_WORKERS', 4))
+NCBI_IMPORT_WORKER_INTERVAL_SECONDS = float(os.environ.get('NCBI_IMPORT_WORKER_INTERVAL_SECONDS', 1))
+NCBI_IMPORT_PROGRESS_SECONDS = float(os.environ.get('NCBI_IMPORT_PROGRESS_SECONDS', 1))
+# A running import that has not reported progress for this long is requeued
+NCBI_IMPORT_JOB_TIMEOUT_SECONDS = int(os.environ.get('NCBI_IMPORT_JOB_TIMEOUT_SECONDS', 300))
+NCBI_IMPORT_BATCH_MAX = int(os.environ.get('NCBI_IMPORT_BATCH_MAX', 500))
+# E-utilities identity; an API key raises NCBI's limit from 3 to 10 requests per second
+NCBI_API_KEY = os.environ.get('NCBI_API_KEY', '')
+NCBI_TOOL = os.environ.get('NCBI_TOOL', 'file_project')
+NCBI_EMAIL = os.environ.get('NCBI_EMAIL', '')
+# Overrides the limit implied by NCBI_API_KEY (0 = 3 or 10 per second)
+NCBI_REQUESTS_PER_SECOND = float(os.environ.get('NCBI_REQUESTS_PER_SECOND', 0))
+# Accessions per multi-ID esummary call
+NCBI_ESUMMARY_BATCH = int(os.environ.get('NCBI_ESUMMARY_BATCH', 200))
+NCBI_EUTILS_BASE = os.environ.get('NCBI_EUTILS_BASE', 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils')
+NCBI_SRA_FASTQ_URL = os.environ.get('NCBI_SRA_FASTQ_URL', 'https://trace.ncbi.nlm.nih.gov/Traces/sra-reads-be/fastq')
 
 # ===== File upload/download custom settings =====
 # 最大上传尺寸（字节），前端文案将与此保持一致
@@ -224,3 +243,48 @@ CELLXGENE_PID_FILE = os.environ.get('CELLXGENE_PID_FILE', os.path.join(BASE_DIR,
 CELLXGENE_LOG_FILE = os.environ.get('CELLXGENE_LOG_FILE', os.path.join(BASE_DIR, 'logs', 'cellxgene.log'))
 CELLXGENE_AUTO_RESTART = os.environ.get('CELLXGENE_AUTO_RESTART', 'true').lower() == 'true'
 CELLXGENE_PYTHON = os.environ.get('CELLXGENE_PYTHON', os.path.join(os.path.dirname(CELLXGENE_CMD), 'python'))
+
+# Background reaper for deleted file blobs (python manage.py reap_files)
+FILE_REAPER_INTERVAL_SECONDS = float(os.environ.get('FILE_REAPER_INTERVAL_SECONDS', 10))
+FILE_REAPER_BATCH_SIZE = int(os.environ.get('FILE_REAPER_BATCH_SIZE', 100))
+FILE_REAPER_MAX_UNLINKS_PER_SECOND = float(os.environ.get('FILE_REAPER_MAX_UNLINKS_PER_SECOND', 5))
+FILE_REAPER_TRUNCATE_STEP_BYTES = int(os.environ.get('FILE_REAPER_TRUNCATE_STEP_BYTES', 256 * 1024 * 1024))
+FILE_REAPER_TRUNCATE_PAUSE_SECONDS = float(os.environ.get('FILE_REAPER_TRUNCATE_PAUSE_SECONDS', 0.05))
+FILE_REAPER_MAX_ATTEMPTS = int(os.environ.get('FILE_REAPER_MAX_ATTEMPTS', 5))
+FILE_REAPER_ORPHAN_GRACE_SECONDS = int(os.environ.get('FILE_REAPER_ORPHAN_GRACE_SECONDS', 3600))
+
+# Keyset pagination for file listings
+FILE_LIST_PAGE_SIZE = int(os.environ.get('FILE_LIST_PAGE_SIZE', 100))
+FILE_LIST_MAX_PAGE_SIZE = int(os.environ.get('FILE_LIST_MAX_PAGE_SIZE', 1000))
+
+# Cache for per-user facet counts and storage stats. The web server, extract_metadata
+# and run_ncbi_imports all bump the version counters, so the backend must be shared
+# between processes: Redis when REDIS_URL is set, otherwise files on local disk.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('FILE_STATS_CACHE_DIR', os.path.join(BASE_DIR, '.cache', 'file-stats')),
+        }
+    }
+FILE_STATS_CACHE_TIMEOUT = int(os.environ.get('FILE_STATS_CACHE_TIMEOUT', 3600))
+
+# Background metadata extraction (python manage.py extract_metadata)
+METADATA_WORKERS = int(os.environ.get('METADATA_WORKERS', 2))
+METADATA_WORKER_INTERVAL_SECONDS = float(os.environ.get('METADATA_WORKER_INTERVAL_SECONDS', 2))
+METADATA_JOB_TIMEOUT_SECONDS = int(os.environ.get('METADATA_JOB_TIMEOUT_SECONDS', 1800))
+# Scan whole sequence files instead of sampling their head (needs numpy)
+METADATA_FULL_SCAN = os.environ.get('METADATA_FULL_SCAN', 'false').lower() == 'true'
+# Processes used to summarize one large VCF in parallel (0 = CPUs / METADATA_WORKERS)
+VCF_SUMMARY_WORKERS = int(os.environ.get('VCF_SUMMARY_WORKERS', 0))
+# Threads inflating bgzip blocks when reading compressed uploads (0 = up to 4, one per CPU)
+DECOMPRESSION_THREADS = int(os.environ.get('DECOMPRESSION_THREADS', 0))
+# Leading bytes of a chunked upload parsed for header metadata before the upload completes
+CHUNKED_HEAD_EXTRACTION_BYTES = int(os.environ.get('CHUNKED_HEAD_EXTRACTION_BYTES', 1024 * 1024))
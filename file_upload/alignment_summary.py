@@ -0,0 +1,302 @@
+"""
+Header and index summaries for SAM/BAM/CRAM alignment files.
+
+Only the header and the companion ``.bai``/``.csi`` index are read, never
+the alignment records, so the cost is independent of the file size. Read
+counts come from the index pseudo-bins that samtools writes for every
+reference (the numbers ``samtools idxstats`` prints).
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+from .compression import open_binary, open_text
+
+BAM_MAGIC = b'BAM\x01'
+CRAM_MAGIC = b'CRAM'
+BAI_MAGIC = b'BAI\x01'
+CSI_MAGIC = b'CSI\x01'
+# The BAI pseudo-bin holding (mapped, unmapped) counts per reference
+BAI_PSEUDO_BIN = 37450
+INDEX_SUFFIXES = ('.bai', '.csi', '.crai')
+
+# Cap the per-reference lists stored in ``extracted_metadata``
+MAX_LISTED_REFERENCES = 100
+
+CRAM_BLOCK_DECODERS = {0: lambda data: data, 1: gzip.decompress, 2: bz2.decompress, 3: lzma.decompress}
+
+
+def find_index(path: str) -> Optional[str]:
+    """An index stored next to ``path`` on disk (``x.bam.bai``, ``x.bai``, ``x.bam.csi``, ...)"""
+    stem = os.path.splitext(path)[0]
+    for suffix in INDEX_SUFFIXES:
+        for candidate in (path + suffix, stem + suffix):
+            if os.path.exists(candidate):
+                return candidate
+    return None
+
+
+def _read_exact(handle, size: int) -> bytes:
+    data = handle.read(size)
+    if len(data) != size:
+        raise ValueError('Truncated alignment header')
+    return data
+
+
+def read_bam_header(path: str) -> Tuple[str, List[Tuple[str, int]]]:
+    """Header text and the binary reference list from the first BGZF blocks of a BAM"""
+    # Single-threaded: only the first few blocks are inflated
+    with open_binary(path, threads=1) as handle:
+        if _read_exact(handle, 4) != BAM_MAGIC:
+            raise ValueError('Not a BAM file')
+        text_length = struct.unpack('<i', _read_exact(handle, 4))[0]
+        text = _read_exact(handle, text_length).rstrip(b'\x00').decode('utf-8', 'replace')
+        references = []
+        for _ in range(struct.unpack('<i', _read_exact(handle, 4))[0]):
+            name_length = struct.unpack('<i', _read_exact(handle, 4))[0]
+            name = _read_exact(handle, name_length).rstrip(b'\x00').decode('utf-8', 'replace')
+            references.append((name, struct.unpack('<i', _read_exact(handle, 4))[0]))
+    return text, references
+
+
+def read_sam_header(path: str) -> str:
+    lines = []
+    with open_text(path, threads=1) as handle:
+        for line in handle:
+            if not line.startswith('@'):
+                break
+            lines.append(line)
+    return ''.join(lines)
+
+
+def _itf8(data: bytes, position: int) -> Tuple[int, int]:
+    """Decode a CRAM ITF8 integer; returns (value, next position)"""
+    first = data[position]
+    if first < 0x80:
+        return first, position + 1
+    if first < 0xC0:
+        return ((first & 0x3F) << 8) | data[position + 1], position + 2
+    if first < 0xE0:
+        return ((first & 0x1F) << 16) | (data[position + 1] << 8) | data[position + 2], position + 3
+    if first < 0xF0:
+        value = ((first & 0x0F) << 24) | int.from_bytes(data[position + 1:position + 4], 'big')
+        return value, position + 4
+    value = ((first & 0x0F) << 28) | int.from_bytes(data[position + 1:position + 4], 'big') << 4
+    value |= data[position + 4] & 0x0F
+    if value >= 1 << 31:
+        value -= 1 << 32
+    return value, position + 5
+
+
+def _ltf8_length(first: int) -> int:
+    """Byte length of a CRAM LTF8 integer from its first byte (leading one bits + 1)"""
+    length = 1
+    while length < 9 and first & (0x80 >> (length - 1)):
+        length += 1
+    return length
+
+
+def read_cram_header(path: str) -> str:
+    """SAM header text from the first block of the first CRAM container"""
+    with open(path, 'rb') as handle:
+        definition = _read_exact(handle, 26)
+        if definition[:4] != CRAM_MAGIC:
+            raise ValueError('Not a CRAM file')
+        major = definition[4]
+        container_length = struct.unpack('<i', _read_exact(handle, 4))[0]
+        # The remaining container header fields are variable length; 64 bytes covers them
+        data = handle.read(64 + container_length)
+
+    position = 0
+    for _ in range(4):  # reference id, start, span, record count
+        _, position = _itf8(data, position)
+    for _ in range(2):  # record counter, base count
+        position += _ltf8_length(data[position])
+    _, position = _itf8(data, position)  # block count
+    landmarks, position = _itf8(data, position)
+    for _ in range(landmarks):
+        _, position = _itf8(data, position)
+    if major >= 3:
+        position += 4  # container CRC32
+
+    method = data[position]
+    position += 2  # compression method, content type
+    _, position = _itf8(data, position)  # content id
+    compressed_size, position = _itf8(data, position)
+    _, position = _itf8(data, position)  # raw size
+    decoder = CRAM_BLOCK_DECODERS.get(method)
+    if decoder is None:
+        raise ValueError(f'Unsupported CRAM header block compression method {method}')
+    block = decoder(bytes(data[position:position + compressed_size]))
+    text_length = struct.unpack('<i', block[:4])[0]
+    return block[4:4 + text_length].rstrip(b'\x00').decode('utf-8', 'replace')
+
+
+def parse_header_text(text: str) -> Dict[str, Any]:
+    """Split SAM header lines into @HD, @SQ, @RG and @PG records"""
+    header: Dict[str, Any] = {'HD': {}, 'SQ': [], 'RG': [], 'PG': [], 'CO': 0}
+    for line in text.splitlines():
+        record_type, _, rest = line.partition('\t')
+        record_type = record_type[1:]
+        if record_type == 'CO':
+            header['CO'] += 1
+            continue
+        fields = dict(field.split(':', 1) for field in rest.split('\t') if ':' in field)
+        if record_type == 'HD':
+            header['HD'] = fields
+        elif record_type in ('SQ', 'RG', 'PG'):
+            header[record_type].append(fields)
+    return header
+
+
+def program_chain(programs: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """@PG records ordered from the first program run to the last, following PP links"""
+    by_id = {program.get('ID'): program for program in programs}
+    children = {program.get('PP'): program for program in programs if program.get('PP') in by_id}
+    roots = [program for program in programs if program.get('PP') not in by_id]
+    ordered, seen = [], set()
+    for program in roots:
+        while program is not None and program.get('ID') not in seen:
+            seen.add(program.get('ID'))
+            ordered.append(program)
+            program = children.get(program.get('ID'))
+    ordered.extend(program for program in programs if program.get('ID') not in seen)
+    return [{
+        'id': program.get('ID'),
+        'name': program.get('PN'),
+        'version': program.get('VN'),
+        'command_line': program.get('CL'),
+    } for program in ordered]
+
+
+def _bai_counts(data: bytes) -> Tuple[List[Tuple[int, int]], Optional[int]]:
+    if data[:4] != BAI_MAGIC:
+        raise ValueError('Not a BAI index')
+    view = memoryview(data)
+    count = struct.unpack_from('<i', view, 4)[0]
+    position = 8
+    counts = []
+    for _ in range(count):
+        mapped = unmapped = 0
+        bins = struct.unpack_from('<i', view, position)[0]
+        position += 4
+        for _ in range(bins):
+            bin_id, chunks = struct.unpack_from('<Ii', view, position)
+            if bin_id == BAI_PSEUDO_BIN and chunks == 2:
+                mapped, unmapped = struct.unpack_from('<QQ', view, position + 24)
+            position += 8 + 16 * chunks
+        intervals = struct.unpack_from('<i', view, position)[0]
+        position += 4 + 8 * intervals
+        counts.append((mapped, unmapped))
+    no_coordinate = struct.unpack_from('<Q', view, position)[0] if len(view) >= position + 8 else None
+    return counts, no_coordinate
+
+
+def _csi_counts(data: bytes) -> Tuple[List[Tuple[int, int]], Optional[int]]:
+    if data[:4] != CSI_MAGIC:
+        raise ValueError('Not a CSI index')
+    view = memoryview(data)
+    _min_shift, depth, aux_length = struct.unpack_from('<iii', view, 4)
+    pseudo_bin = ((1 << ((depth + 1) * 3)) - 1) // 7 + 1
+    position = 16 + aux_length
+    count = struct.unpack_from('<i', view, position)[0]
+    position += 4
+    counts = []
+    for _ in range(count):
+        mapped = unmapped = 0
+        bins = struct.unpack_from('<i', view, position)[0]
+        position += 4
+        for _ in range(bins):
+            bin_id, _offset, chunks = struct.unpack_from('<IQi', view, position)
+            if bin_id == pseudo_bin and chunks == 2:
+                mapped, unmapped = struct.unpack_from('<QQ', view, position + 32)
+            position += 16 + 16 * chunks
+        counts.append((mapped, unmapped))
+    no_coordinate = struct.unpack_from('<Q', view, position)[0] if len(view) >= position + 8 else None
+    return counts, no_coordinate
+
+
+def read_index_counts(index_path: str) -> Tuple[str, List[Tuple[int, int]], Optional[int]]:
+    """``(index type, [(mapped, unmapped) per reference], unplaced unmapped reads)``"""
+    with open_binary(index_path, threads=1) as handle:
+        data = handle.read()
+    if data[:4] == BAI_MAGIC:
+        return ('bai',) + _bai_counts(data)
+    if data[:4] == CSI_MAGIC:
+        return ('csi',) + _csi_counts(data)
+    raise ValueError('Unrecognised alignment index')
+
+
+def detect_alignment_format(path: str) -> str:
+    """``'CRAM'``, ``'BAM'`` or ``'SAM'`` from the leading (decompressed) bytes"""
+    with open(path, 'rb') as probe:
+        if probe.read(4) == CRAM_MAGIC:
+            return 'CRAM'
+    with open_binary(path, threads=1) as handle:
+        return 'BAM' if handle.read(4) == BAM_MAGIC else 'SAM'
+
+
+def summarize_alignment(path: str, index_path: Optional[str] = None) -> Dict[str, Any]:
+    """Header summary of a SAM/BAM/CRAM file plus per-reference counts from its index"""
+    file_format = detect_alignment_format(path)
+    binary_references = None
+    if file_format == 'CRAM':
+        text = read_cram_header(path)
+    elif file_format == 'SAM':
+        text = read_sam_header(path)
+    else:
+        text, binary_references = read_bam_header(path)
+
+    header = parse_header_text(text)
+    # The binary list is authoritative for BAM; the text @SQ lines may be absent
+    references = binary_references or [(sq.get('SN'), int(sq.get('LN', 0) or 0)) for sq in header['SQ']]
+    read_groups = [{
+        'id': group.get('ID'),
+        'sample': group.get('SM'),
+        'platform': group.get('PL'),
+        'library': group.get('LB'),
+    } for group in header['RG']]
+    samples = sorted({group['sample'] for group in read_groups if group['sample']})
+
+    metadata: Dict[str, Any] = {
+        'alignment_format': file_format,
+        'format_version': header['HD'].get('VN'),
+        'sort_order': header['HD'].get('SO', 'unknown'),
+        'reference_count': len(references),
+        'total_reference_length': sum(length for _name, length in references),
+        'references': [{'name': name, 'length': length} for name, length in references[:MAX_LISTED_REFERENCES]],
+        'read_groups': read_groups,
+        'samples': samples,
+        'sample_count': len(samples),
+        'programs': program_chain(header['PG']),
+        'comment_count': header['CO'],
+        'indexed': False,
+    }
+    platforms = {group['platform'] for group in read_groups if group['platform']}
+    if len(platforms) == 1:
+        metadata['sequencing_platform'] = platforms.pop()
+
+    index_path = index_path or find_index(path)
+    if index_path and not index_path.endswith('.crai'):
+        index_type, counts, no_coordinate = read_index_counts(index_path)
+        mapped = sum(count[0] for count in counts)
+        unmapped = sum(count[1] for count in counts) + (no_coordinate or 0)
+        metadata.update({
+            'indexed': True,
+            'index_type': index_type,
+            'mapped_reads': mapped,
+            'unmapped_reads': unmapped,
+            'read_count': mapped + unmapped,
+            'reads_per_reference': [
+                {'name': name, 'mapped': counts[i][0], 'unmapped': counts[i][1]}
+                for i, (name, _length) in enumerate(references[:len(counts)]) if any(counts[i])
+            ][:MAX_LISTED_REFERENCES],
+        })
+    elif index_path:
+        # CRAM indexes list container offsets only, not read counts
+        metadata.update({'indexed': True, 'index_type': 'crai'})
+    return metadata
@@ -8,6 +8,10 @@ urlpatterns = [
     path('', api_views.file_list, name='api_file_list'),
     path('upload/', api_views.file_upload, name='api_file_upload'),
     path('ncbi/import/', api_views.ncbi_import, name='api_file_ncbi_import'),
+    path('ncbi/import/batch/', api_views.ncbi_import_batch, name='api_file_ncbi_import_batch'),
+    path('ncbi/jobs/', api_views.ncbi_job_list, name='api_ncbi_job_list'),
+    path('ncbi/jobs/<int:job_id>/', api_views.ncbi_job_detail, name='api_ncbi_job_detail'),
+    path('ncbi/jobs/<int:job_id>/cancel/', api_views.ncbi_job_cancel, name='api_ncbi_job_cancel'),
     path('<int:file_id>/delete/', api_views.file_delete, name='api_file_delete'),
     path('<int:file_id>/download/', api_views.file_download, name='api_file_download'),
     # Backward-compatible path: /api/files/download/<id>/
@@ -21,6 +25,7 @@ urlpatterns = [
     path('facets/', search_views.get_facets, name='file-facets'),
     path('suggestions/', search_views.search_suggestions, name='search-suggestions'),
     path('<int:file_id>/preview/', search_views.file_preview, name='file-preview'),
+    path('<int:file_id>/region/', search_views.file_region, name='file-region'),
     
     # Folder APIs
     path('folders/', api_views.folder_list_create, name='api_folder_list_create'),
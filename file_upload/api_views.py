@@ -7,7 +7,6 @@ import signal
 import subprocess
 import textwrap
 import time
-import requests
 from pathlib import Path
 
 from rest_framework import status
@@ -20,16 +19,18 @@ from django.conf import settings
 from django.http import Http404, StreamingHttpResponse, FileResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
-from django.core.files import File as DjangoFile
+from django.db.models import Count, Sum
 
-from .models import File, Folder
-from .serializers import FileSerializer, FileUploadSerializer, FolderSerializer, FolderCreateSerializer
-from .ncbi_client import (
-    NCBIDownloadError,
-    NCBIDownloadResult,
-    NCBIDownloadTooLarge,
-    download_ncbi_resource,
-)
+from . import h5ad_summary
+from .folder_index import FolderIndex
+from .metadata_index import METADATA_SORT_PREFIX, annotate_sort
+from .models import File, Folder, NcbiImportJob
+from .ncbi_client import NCBIDownloadError, import_filename
+from .ncbi_imports import cancel_import, submit_batch, submit_import, taken_targets
+from .pagination import InvalidCursor, paginate_keyset, parse_page_size, resolve_sort
+from .serializers import FileSerializer, FileUploadSerializer, FolderSerializer, FolderCreateSerializer, NcbiImportJobSerializer
+from .stats_cache import cached_for_user
+from .tags import filter_by_tags, parse_tags
 
 logger = logging.getLogger(__name__)
 
@@ -253,6 +254,11 @@ def restart_cellxgene_process(dataset_path: str):
 def file_list(request):
     """Return the current user's files, optionally filtered by folder"""
     folder_id = request.GET.get('folder_id')
+    cursor = request.GET.get('cursor') or None
+    sort_field = resolve_sort(request.GET.get('sort'))
+    default_order = 'asc' if sort_field == 'original_filename' else 'desc'
+    descending = request.GET.get('order', default_order) == 'desc'
+    page_size = parse_page_size(request.GET.get('page_size'))
     
     # Resolve folder metadata if provided
     current_folder = None
@@ -262,22 +268,31 @@ def file_list(request):
         except Folder.DoesNotExist:
             return Response({'error': 'Folder not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Fetch children for the active folder
-    if current_folder:
-        folders = Folder.objects.filter(user=request.user, parent=current_folder).order_by('name')
-        files = File.objects.filter(user=request.user, parent_folder=current_folder).order_by('-uploaded_at')
-    else:
-        # Root level: only items without parents
-        folders = Folder.objects.filter(user=request.user, parent=None).order_by('name')
-        files = File.objects.filter(user=request.user, parent_folder=None).order_by('-uploaded_at')
+    # Fetch children for the active folder (root level: only items without parents)
+    folders = Folder.objects.filter(user=request.user, parent=current_folder).order_by('name')
+    files = File.objects.filter(user=request.user, parent_folder=current_folder).select_related('parent_folder')
+    tags = [tag for raw in request.GET.getlist('tag') for tag in parse_tags(raw)]
+    if tags:
+        files = filter_by_tags(files, tags)
+    if sort_field.startswith(METADATA_SORT_PREFIX):
+        files = annotate_sort(files, sort_field[len(METADATA_SORT_PREFIX):])
+    
+    try:
+        page = paginate_keyset(files, sort_field, descending, cursor, page_size)
+    except InvalidCursor as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
     
-    folder_serializer = FolderSerializer(folders, many=True, context={'request': request})
-    file_serializer = FileSerializer(files, many=True, context={'request': request})
+    context = {'request': request, 'folder_index': FolderIndex.for_user(request.user)}
+    # Folders are only listed with the first page of files
+    folder_data = [] if cursor else FolderSerializer(folders.select_related('parent'), many=True, context=context).data
+    file_serializer = FileSerializer(page.items, many=True, context=context)
     
     return Response({
-        'current_folder': FolderSerializer(current_folder, context={'request': request}).data if current_folder else None,
-        'folders': folder_serializer.data,
-        'files': file_serializer.data
+        'current_folder': FolderSerializer(current_folder, context=context).data if current_folder else None,
+        'folders': folder_data,
+        'files': file_serializer.data,
+        'next_cursor': page.next_cursor,
+        'has_more': page.has_next,
     })
 
 
@@ -317,7 +332,7 @@ def file_upload(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def ncbi_import(request):
-    """Download an NCBI resource and store it for the authenticated user"""
+    """Queue an NCBI resource for download into the authenticated user's files"""
     url = request.data.get('url')
     parent_folder_id = request.data.get('parent_folder')
     project = request.data.get('project') or 'NCBI Import'
@@ -325,74 +340,109 @@ def ncbi_import(request):
 
     if not url:
         return Response({'message': 'Provide a valid NCBI link'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # Reject unparseable links now rather than in the worker
+        filename = import_filename(url)
+    except NCBIDownloadError as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
     parent_folder = None
     if parent_folder_id is not None:
         try:
-            parent_folder = Folder.objects.get(id=parent_folder_id, user=request.user)
+            parent_folder = Folder.objects.get(id=int(parent_folder_id), user=request.user)
+        except (TypeError, ValueError):
+            return Response({'message': 'parent_folder must be a folder id'}, status=status.HTTP_400_BAD_REQUEST)
         except Folder.DoesNotExist:
             return Response({'message': 'Folder not found or not accessible'}, status=status.HTTP_404_NOT_FOUND)
+    if taken_targets(request.user, parent_folder.id if parent_folder else None, [filename]):
+        return Response({'message': f'{filename} already exists in the target folder'},
+                        status=status.HTTP_409_CONFLICT)
+
+    job = submit_import(request.user, url, {
+        'parent_folder': parent_folder.id if parent_folder else None,
+        'project': project,
+        'access_level': access_level,
+        'tags': request.data.get('tags'),
+    })
+    # The run_ncbi_imports worker downloads it; poll ncbi/jobs/<id>/ for progress
+    return Response({'job': NcbiImportJobSerializer(job).data}, status=status.HTTP_202_ACCEPTED)
 
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def ncbi_import_batch(request):
+    """
+    Queue many NCBI links or bare accessions at once. ``items`` is a list or
+    a comma/newline separated string; invalid entries are reported in
+    ``errors`` without failing the rest.
+    """
+    items = request.data.get('items')
+    if isinstance(items, str):
+        items = [item for item in re.split(r'[,\s]+', items) if item]
+    if not isinstance(items, list) or not items:
+        return Response({'message': 'Provide a list of NCBI links or accessions'}, status=status.HTTP_400_BAD_REQUEST)
+    max_items = getattr(settings, 'NCBI_IMPORT_BATCH_MAX', 500)
+    if len(items) > max_items:
+        return Response({'message': f'At most {max_items} items per batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+    parent_folder_id = request.data.get('parent_folder')
+    if parent_folder_id is not None:
+        try:
+            parent_folder_id = int(parent_folder_id)
+        except (TypeError, ValueError):
+            return Response({'message': 'parent_folder must be a folder id'}, status=status.HTTP_400_BAD_REQUEST)
+        if not Folder.objects.filter(id=parent_folder_id, user=request.user).exists():
+            return Response({'message': 'Folder not found or not accessible'}, status=status.HTTP_404_NOT_FOUND)
+
+    jobs, errors = submit_batch(request.user, items, {
+        'parent_folder': parent_folder_id,
+        'project': request.data.get('project') or 'NCBI Import',
+        'access_level': request.data.get('access_level') or 'Internal',
+        'tags': request.data.get('tags'),
+    })
+    if not jobs:
+        return Response({'message': 'No valid NCBI links or accessions', 'errors': errors},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return Response({'jobs': NcbiImportJobSerializer(jobs, many=True).data, 'errors': errors},
+                    status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ncbi_job_list(request):
+    """The user's NCBI import jobs, newest first; ``status`` filters by state"""
+    jobs = NcbiImportJob.objects.filter(user=request.user)
+    if request.GET.get('status'):
+        jobs = jobs.filter(status=request.GET['status'])
+    limit = parse_page_size(request.GET.get('limit'), default=50)
+    return Response({'jobs': NcbiImportJobSerializer(jobs[:limit], many=True).data})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ncbi_job_detail(request, job_id):
+    """Status, bytes downloaded and ETA of one import; includes the file once it is done"""
     try:
-        download_result: NCBIDownloadResult = download_ncbi_resource(url)
-    except NCBIDownloadTooLarge as exc:
-        return Response({'message': str(exc)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
-    except NCBIDownloadError as exc:
-        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
-    except requests.RequestException as exc:
-        logger.exception("NCBI request failed: %s", exc)
-        return Response({'message': f'Unable to reach NCBI: {exc}'}, status=status.HTTP_502_BAD_GATEWAY)
-    except Exception as exc:
-        logger.exception("Unexpected NCBI import failure: %s", exc)
-        return Response({'message': f'Download failed: {exc}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    file_obj = None
-    try:
-        with open(download_result.file_path, 'rb') as handle:
-            django_file = DjangoFile(handle, name=download_result.filename)
-
-            raw_tags = request.data.get('tags')
-            user_tags = []
-            if isinstance(raw_tags, list):
-                user_tags = [str(tag).strip() for tag in raw_tags if str(tag).strip()]
-            elif isinstance(raw_tags, str):
-                user_tags = [tag.strip() for tag in raw_tags.split(',') if tag.strip()]
-            base_tags = ['NCBI', download_result.db.upper()]
-            combined_tags = []
-            for tag in base_tags + user_tags:
-                if tag and tag not in combined_tags:
-                    combined_tags.append(tag)
-            tag_string = ','.join(combined_tags)
-
-            metadata = download_result.metadata or {}
-            description = metadata.get('title') or metadata.get('extra') or ''
-            if metadata.get('summary'):
-                description = f"{description}\n{metadata['summary']}".strip()
-
-            file_obj = File.objects.create(
-                user=request.user,
-                file=django_file,
-                upload_method='NCBI Import',
-                parent_folder=parent_folder,
-                title=metadata.get('title') or download_result.filename,
-                project=project,
-                original_filename=download_result.filename,
-                file_format=download_result.file_format,
-                document_type=download_result.document_type,
-                access_level=access_level,
-                organism=metadata.get('organism') or '',
-                experiment_type=metadata.get('experiment_type') or '',
-                tags=tag_string,
-                description=description,
-            )
-            file_obj.extracted_metadata = metadata
-            file_obj.save()
-    finally:
-        if os.path.exists(download_result.file_path):
-            os.remove(download_result.file_path)
+        job = NcbiImportJob.objects.select_related('file').get(id=job_id, user=request.user)
+    except NcbiImportJob.DoesNotExist:
+        return Response({'message': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+    payload = {'job': NcbiImportJobSerializer(job).data}
+    if job.file is not None:
+        payload['file'] = FileSerializer(job.file, context={'request': request}).data
+    return Response(payload)
 
-    serializer = FileSerializer(file_obj, context={'request': request})
-    return Response({'file': serializer.data, 'metadata': download_result.metadata}, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def ncbi_job_cancel(request, job_id):
+    try:
+        job = NcbiImportJob.objects.get(id=job_id, user=request.user)
+    except NcbiImportJob.DoesNotExist:
+        return Response({'message': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not cancel_import(job):
+        return Response({'message': f'Import already {job.status}'}, status=status.HTTP_409_CONFLICT)
+    job.refresh_from_db()
+    return Response({'job': NcbiImportJobSerializer(job).data})
 
 
 @csrf_exempt
@@ -403,9 +453,7 @@ def file_delete(request, file_id):
     """Delete a file owned by the current user"""
     try:
         file_obj = File.objects.get(id=file_id, user=request.user)
-        # Remove the physical file if present
-        if file_obj.file and os.path.exists(file_obj.file.path):
-            os.remove(file_obj.file.path)
+        # The physical blob is tombstoned by a post_delete signal and unlinked by the reaper
         file_obj.delete()
         return Response({'message': 'File deleted successfully'}, status=status.HTTP_200_OK)
     except File.DoesNotExist:
@@ -571,7 +619,17 @@ def publish_cellxgene(request, file_id):
         except Exception as e:
             return Response({'message': f'Failed to copy file: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        prepare_info = prepare_h5ad_for_cellxgene(target_path)
+        # The upload-time h5ad summary answers the X_umap check without loading the dataset
+        metadata = file_obj.extracted_metadata or {}
+        if 'has_umap_layout' not in metadata and h5ad_summary.available():
+            try:
+                metadata = h5ad_summary.summarize_h5ad(file_obj.file.path)
+            except Exception as e:
+                logger.warning("Could not inspect %s lazily: %s", target_filename, e)
+        if metadata.get('has_umap_layout'):
+            prepare_info = {'status': 'skipped', 'message': 'Dataset already has a 2D X_umap layout'}
+        else:
+            prepare_info = prepare_h5ad_for_cellxgene(target_path)
         if prepare_info.get('status') == 'error':
             message = f"Copied to the Cellxgene data directory but failed to create embeddings: {prepare_info.get('message')}"
             logger.error("Cellxgene layout preparation failed for %s: %s", target_filename, prepare_info)
@@ -616,18 +674,19 @@ def publish_cellxgene(request, file_id):
 @permission_classes([IsAuthenticated])
 def user_stats(request):
     """Return aggregate stats for the authenticated user"""
-    user_files = File.objects.filter(user=request.user)
-    user_folders = Folder.objects.filter(user=request.user)
-    total_files = user_files.count()
-    total_folders = user_folders.count()
-    total_size = sum(f.file_size for f in user_files)
+    def compute():
+        totals = File.objects.filter(user=request.user).aggregate(
+            total_files=Count('id'), total_size=Sum('file_size')
+        )
+        total_size = totals['total_size'] or 0
+        return {
+            'total_files': totals['total_files'],
+            'total_folders': Folder.objects.filter(user=request.user).count(),
+            'total_size': total_size,
+            'total_size_mb': round(total_size / (1024 * 1024), 2) if total_size > 0 else 0
+        }
     
-    return Response({
-        'total_files': total_files,
-        'total_folders': total_folders,
-        'total_size': total_size,
-        'total_size_mb': round(total_size / (1024 * 1024), 2) if total_size > 0 else 0
-    })
+    return Response(cached_for_user(request.user.id, 'user_stats', compute))
 
 
 @api_view(['GET', 'POST'])
@@ -647,7 +706,8 @@ def folder_list_create(request):
             # Return root-level folders
             folders = Folder.objects.filter(user=request.user, parent=None).order_by('name')
         
-        serializer = FolderSerializer(folders, many=True, context={'request': request})
+        context = {'request': request, 'folder_index': FolderIndex.for_user(request.user)}
+        serializer = FolderSerializer(folders.select_related('parent'), many=True, context=context)
         return Response(serializer.data)
     
     elif request.method == 'POST':
@@ -708,15 +768,16 @@ def folder_breadcrumb(request, folder_id):
     except Folder.DoesNotExist:
         return Response({'error': 'Folder not found'}, status=status.HTTP_404_NOT_FOUND)
     
+    folder_index = FolderIndex.for_user(request.user)
     breadcrumb = []
-    current = folder
-    while current:
+    current = folder.id
+    while current is not None and current in folder_index:
         breadcrumb.insert(0, {
-            'id': current.id,
-            'name': current.name,
-            'path': current.get_path()
+            'id': current,
+            'name': folder_index.name(current),
+            'path': folder_index.path(current)
         })
-        current = current.parent
+        current = folder_index.parent_id(current)
     
     return Response(breadcrumb)
 
@@ -725,8 +786,9 @@ def folder_breadcrumb(request, folder_id):
 @permission_classes([IsAuthenticated])
 def folder_all(request):
     """Return all folders owned by the current user"""
-    folders = Folder.objects.filter(user=request.user).order_by('name')
-    folder_serializer = FolderSerializer(folders, many=True, context={'request': request})
+    folders = Folder.objects.filter(user=request.user).select_related('parent').order_by('name')
+    context = {'request': request, 'folder_index': FolderIndex.for_user(request.user)}
+    folder_serializer = FolderSerializer(folders, many=True, context=context)
     
     return Response({
         'folders': folder_serializer.data
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class FileUploadConfig(AppConfig):
     name = 'file_upload'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -10,6 +10,8 @@ from django.core.files import File as DjangoFile
 import os
 import uuid
 
+from .extraction import enqueue_extraction
+from .head_extraction import extract_session_head, head_ready
 from .models import UploadSession, File, Folder
 from .serializers import FileSerializer
 
@@ -111,7 +113,16 @@ def chunked_upload_chunk(request, session_id):
             f.write(chunk)
 
     session.uploaded_size = max(session.uploaded_size, end + 1)
-    session.save(update_fields=['uploaded_size'])
+    update_fields = ['uploaded_size']
+    if start <= session.contiguous_size:
+        session.contiguous_size = max(session.contiguous_size, end + 1)
+        update_fields.append('contiguous_size')
+
+    # Parse the header while the rest of the file is still streaming in
+    if not session.head_metadata and head_ready(session):
+        session.head_metadata = extract_session_head(session)
+        update_fields.append('head_metadata')
+    session.save(update_fields=update_fields)
     return Response({'uploaded_size': session.uploaded_size}, status=status.HTTP_200_OK)
 
 
@@ -140,10 +151,15 @@ def chunked_upload_complete(request, session_id):
                 original_filename=session.original_filename,
                 parent_folder=session.parent_folder
             )
+            if session.head_metadata.get('stats_scope') == 'head':
+                file_obj.extracted_metadata = session.head_metadata
             file_obj.file.save(session.original_filename, django_file, save=True)
     except Exception:
         return Response({'message': 'Failed to finalize uploaded file'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    # Head metadata is available now; whole-file statistics follow from the background workers
+    enqueue_extraction(file_obj)
+
     session.status = 'completed'
     session.save(update_fields=['status'])
     try:
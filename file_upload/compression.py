@@ -0,0 +1,249 @@
+"""
+Transparent decompression for stored files.
+
+Compression is detected from magic bytes rather than the file name, so a
+``.fastq.gz`` renamed to ``.fastq`` (or an NCBI download saved without a
+suffix) still reads as text. Extractors and previews open files through
+``open_binary``/``open_text`` and never see compressed bytes.
+
+BGZF (bgzip) files are a series of independent gzip members, so their
+blocks are inflated on a thread pool; zlib releases the GIL while
+inflating. Zstandard support needs the optional ``zstandard`` package.
+"""
+
+import gzip
+import io
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+BGZF_MAGIC = b'\x1f\x8b\x08\x04'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Compressed blocks handed to each inflate task; a BGZF block holds at most 64 KiB
+BGZF_BATCH_BLOCKS = 64
+COMPRESSED_SUFFIXES = ('gz', 'bgz', 'zst')
+# Read size used when skipping forward through a stream that cannot seek
+SKIP_CHUNK = 1024 * 1024
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """``'bgzf'``, ``'gzip'``, ``'zstd'`` or ``None`` for uncompressed files"""
+    with open(path, 'rb') as handle:
+        header = handle.read(16)
+    if header[:4] == BGZF_MAGIC and header[12:14] == b'BC':
+        return 'bgzf'
+    if header[:2] == GZIP_MAGIC:
+        return 'gzip'
+    if header[:4] == ZSTD_MAGIC:
+        return 'zstd'
+    return None
+
+
+def is_bgzf(path: str) -> bool:
+    return detect_compression(path) == 'bgzf'
+
+
+def _read_bgzf_block(handle) -> bytes:
+    """Next whole BGZF block from ``handle``, or ``b''`` at end of file"""
+    header = handle.read(12)
+    if len(header) < 12:
+        return b''
+    if header[:4] != BGZF_MAGIC:
+        raise ValueError(f'Not a BGZF block at offset {handle.tell() - len(header)}')
+    extra = handle.read(struct.unpack('<H', header[10:12])[0])
+    block_size = None
+    position = 0
+    while position + 4 <= len(extra):
+        length = struct.unpack('<H', extra[position + 2:position + 4])[0]
+        if extra[position:position + 2] == b'BC':
+            block_size = struct.unpack('<H', extra[position + 4:position + 6])[0] + 1
+        position += 4 + length
+    if block_size is None:
+        raise ValueError('BGZF block is missing its BC size field')
+    rest = handle.read(block_size - len(header) - len(extra))
+    return header + extra + rest
+
+
+def bgzf_block_offsets(path: str) -> List[int]:
+    """Compressed offsets of every BGZF block, read from block headers without inflating"""
+    offsets = []
+    with open(path, 'rb') as handle:
+        position = 0
+        while True:
+            header = handle.read(18)
+            if len(header) < 18:
+                break
+            if header[:4] != BGZF_MAGIC:
+                raise ValueError(f'Not a BGZF block at offset {position}')
+            block_size = struct.unpack('<H', header[16:18])[0] + 1
+            offsets.append(position)
+            position += block_size
+            handle.seek(position)
+    return offsets
+
+
+def inflate_bgzf_block(block: bytes) -> bytes:
+    """Decompress one BGZF block (a complete gzip member)"""
+    extra_length = struct.unpack('<H', block[10:12])[0]
+    return zlib.decompress(block[12 + extra_length:-8], -zlib.MAX_WBITS)
+
+
+def _inflate_batch(blocks: List[bytes]) -> bytes:
+    return b''.join(inflate_bgzf_block(block) for block in blocks)
+
+
+def bgzf_block(data: bytes) -> bytes:
+    """Compress up to 64 KiB of ``data`` into one BGZF block"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    header = BGZF_MAGIC + b'\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00'
+    trailer = struct.pack('<II', zlib.crc32(data), len(data))
+    return header + struct.pack('<H', len(header) + 2 + len(deflated) + len(trailer) - 1) + deflated + trailer
+
+
+def iter_bgzf_lines(path: str, start: int = 0):
+    """
+    ``(virtual offset, next virtual offset, line)`` for each line of a BGZF
+    file from virtual offset ``start``. A virtual offset is the compressed
+    block offset shifted left 16 bits plus the offset within the inflated block.
+    """
+    with open(path, 'rb') as handle:
+        block_offset = start >> 16
+        position = start & 0xFFFF
+        handle.seek(block_offset)
+        pending, pending_start = b'', 0
+        while True:
+            block = _read_bgzf_block(handle)
+            if not block:
+                break
+            base = block_offset << 16
+            lines = inflate_bgzf_block(block)[position:].split(b'\n')
+            tail = lines.pop()
+            for line in lines:
+                line_start = base | position
+                position += len(line) + 1
+                if pending:
+                    yield pending_start, base | position, pending + line
+                    pending = b''
+                else:
+                    yield line_start, base | position, line
+            if tail:
+                if not pending:
+                    pending_start = base | position
+                pending += tail
+            block_offset += len(block)
+            position = 0
+        if pending:
+            yield pending_start, block_offset << 16, pending
+
+
+class ThreadedBgzfReader(io.RawIOBase):
+    """Raw reader that inflates batches of BGZF blocks ahead of the consumer on a thread pool"""
+
+    def __init__(self, path: str, threads: int, batch_blocks: int = BGZF_BATCH_BLOCKS):
+        super().__init__()
+        self._handle = open(path, 'rb')
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='bgzf')
+        self._pending = deque()
+        self._depth = threads * 2
+        self._batch_blocks = batch_blocks
+        self._exhausted = False
+        self._buffer = b''
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def _schedule(self):
+        while not self._exhausted and len(self._pending) < self._depth:
+            blocks = []
+            while len(blocks) < self._batch_blocks:
+                block = _read_bgzf_block(self._handle)
+                if not block:
+                    self._exhausted = True
+                    break
+                blocks.append(block)
+            if blocks:
+                self._pending.append(self._pool.submit(_inflate_batch, blocks))
+
+    def readinto(self, target):
+        while self._position >= len(self._buffer):
+            self._schedule()
+            if not self._pending:
+                return 0
+            self._buffer = self._pending.popleft().result()
+            self._position = 0
+        count = min(len(target), len(self._buffer) - self._position)
+        target[:count] = self._buffer[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            for future in self._pending:
+                future.cancel()
+            self._pool.shutdown(wait=True)
+            self._handle.close()
+        super().close()
+
+
+def decompression_threads() -> int:
+    from django.conf import settings
+    configured = getattr(settings, 'DECOMPRESSION_THREADS', 0)
+    return configured or min(4, os.cpu_count() or 1)
+
+
+def open_binary(path: str, threads: Optional[int] = None):
+    """Open ``path`` for binary reading, decompressing gzip, bgzip or zstd by magic bytes"""
+    kind = detect_compression(path)
+    if kind == 'bgzf':
+        threads = decompression_threads() if threads is None else threads
+        if threads > 1:
+            return io.BufferedReader(ThreadedBgzfReader(path, threads), buffer_size=1024 * 1024)
+        return gzip.open(path, 'rb')
+    if kind == 'gzip':
+        return gzip.open(path, 'rb')
+    if kind == 'zstd':
+        if zstandard is None:
+            raise ValueError('zstandard is not installed; cannot read .zst files')
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(
+            open(path, 'rb'), read_across_frames=True, closefd=True))
+    return open(path, 'rb')
+
+
+def open_text(path: str, threads: Optional[int] = None):
+    """Text-mode counterpart of ``open_binary`` that ignores undecodable bytes"""
+    return io.TextIOWrapper(open_binary(path, threads), encoding='utf-8', errors='ignore')
+
+
+def open_at(path: str, offset: int):
+    """Binary handle on the decompressed content of ``path`` positioned at ``offset``"""
+    handle = open_binary(path)
+    if handle.seekable():
+        handle.seek(offset)
+        return handle
+    remaining = offset
+    while remaining > 0:
+        skipped = len(handle.read(min(remaining, SKIP_CHUNK)))
+        if not skipped:
+            break
+        remaining -= skipped
+    return handle
+
+
+def strip_compression_suffix(filename: str) -> str:
+    """``reads.fastq.gz`` -> ``reads.fastq``"""
+    base, dot, suffix = filename.rpartition('.')
+    if dot and base and suffix.lower() in COMPRESSED_SUFFIXES:
+        return base
+    return filename
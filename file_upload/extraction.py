@@ -0,0 +1,270 @@
+"""
+Background metadata extraction.
+
+Uploads only mark the ``File`` row as queued; the ``extract_metadata``
+management command claims queued rows and runs the format extractors in a
+process pool, so parsing a large PDF or FASTQ never blocks a request. The
+rows themselves are the queue: ``extraction_status`` moves through
+pending -> running -> done/failed.
+
+Results are cached by (content checksum, extractor version), so duplicate
+content is extracted once; bumping a version in ``metadata_extractor``
+makes stale files re-extract lazily or via ``reextract_metadata``.
+
+Sorted, bgzipped VCF/BED/GTF/GFF files also get their region index built
+here, next to the extractor, instead of inside the first region query.
+"""
+
+import logging
+from concurrent.futures import as_completed
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .metadata_extractor import DEGRADED_KEY, extractor_version
+from .models import ExtractionCacheEntry, File
+from .region_index import REGION_FORMATS, build_region_sidecar
+
+logger = logging.getLogger(__name__)
+
+# (file id, stored name, file format, checksum)
+Job = Tuple[int, str, str, str]
+
+ALIGNMENT_FORMATS = ('BAM', 'SAM', 'CRAM')
+INDEX_SUFFIXES = ('.bai', '.csi', '.crai')
+
+
+def _index_names(filename: str) -> List[str]:
+    stem = filename.rsplit('.', 1)[0]
+    return [name + suffix for suffix in INDEX_SUFFIXES for name in (filename, stem)]
+
+
+def find_alignment_index(file_id: int):
+    """The uploaded .bai/.csi/.crai that sits beside an alignment file in the same folder"""
+    file_obj = File.objects.filter(pk=file_id).only('user_id', 'parent_folder_id', 'original_filename').first()
+    if file_obj is None or not file_obj.original_filename:
+        return None
+    names = _index_names(file_obj.original_filename)
+    candidates = {
+        original: name for original, name in File.objects.filter(
+            user_id=file_obj.user_id, parent_folder_id=file_obj.parent_folder_id, original_filename__in=names,
+        ).exclude(file='').values_list('original_filename', 'file')
+    }
+    # Prefer sample.bam.bai over sample.bai, and BAI over CSI
+    for name in names:
+        if name in candidates:
+            return candidates[name]
+    return None
+
+
+def _alignments_for_index(file_obj):
+    """Alignment files in the same folder that ``file_obj`` (an uploaded index) belongs to"""
+    name = file_obj.original_filename or ''
+    stem, _dot, suffix = name.rpartition('.')
+    if f'.{suffix.lower()}' not in INDEX_SUFFIXES or not stem:
+        return File.objects.none()
+    return File.objects.filter(
+        user_id=file_obj.user_id, parent_folder_id=file_obj.parent_folder_id, file_format__in=ALIGNMENT_FORMATS,
+        original_filename__in=[stem] + [f'{stem}.{fmt.lower()}' for fmt in ALIGNMENT_FORMATS],
+    )
+
+
+def enqueue_extraction(file_obj):
+    """Queue ``file_obj`` for extraction without re-saving the row"""
+    now = timezone.now()
+    File.objects.filter(pk=file_obj.pk).update(
+        extraction_status='pending', extraction_queued_at=now, extraction_error='', extraction_finished_at=None,
+    )
+    file_obj.extraction_status = 'pending'
+    file_obj.extraction_queued_at = now
+    file_obj.extraction_error = ''
+    file_obj.extraction_finished_at = None
+
+    # An index uploaded after its BAM unlocks read counts for it
+    _alignments_for_index(file_obj).exclude(extraction_status__in=('pending', 'running')).update(
+        extraction_status='pending', extraction_queued_at=now, extraction_error='', extraction_finished_at=None,
+    )
+
+
+def refresh_if_stale(file_obj) -> bool:
+    """
+    Queue re-extraction when ``file_obj`` was extracted by an older extractor
+    version; a blank version means it predates versioning altogether.
+    """
+    if file_obj.extraction_status != 'done' or not file_obj.file:
+        return False
+    if file_obj.extractor_version == extractor_version(file_obj.file.name, file_obj.file_format):
+        return False
+    enqueue_extraction(file_obj)
+    return True
+
+
+def requeue_stale(timeout_seconds=None) -> int:
+    """Return jobs left running by a worker that died to the queue"""
+    if timeout_seconds is None:
+        timeout_seconds = getattr(settings, 'METADATA_JOB_TIMEOUT_SECONDS', 1800)
+    cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+    return File.objects.filter(extraction_status='running', extraction_queued_at__lt=cutoff).update(
+        extraction_status='pending'
+    )
+
+
+def claim_jobs(limit: int) -> List[Job]:
+    """
+    Atomically move up to ``limit`` of the oldest queued files to running.
+
+    Each row is claimed with a conditional UPDATE, so several workers can
+    poll the same table without processing a file twice.
+    """
+    candidates = (
+        File.objects.filter(extraction_status='pending')
+        .order_by('extraction_queued_at', 'id')
+        .values_list('id', 'file', 'file_format', 'checksum')[:limit]
+    )
+    claimed = []
+    for file_id, name, file_format, checksum in candidates:
+        with transaction.atomic():
+            taken = File.objects.filter(pk=file_id, extraction_status='pending').update(
+                extraction_status='running', extraction_queued_at=timezone.now()
+            )
+        if taken and name:
+            claimed.append((file_id, name, file_format, checksum))
+        elif taken:
+            finish_job(file_id, error='File has no stored content')
+    return claimed
+
+
+def run_extractor(path: str, file_format: str, index_path: Optional[str] = None) -> Dict[str, Any]:
+    """Pool entry point; runs in a worker process and touches no database state"""
+    from .metadata_extractor import extract_file_metadata
+    return extract_file_metadata(path, file_format, index_path=index_path)
+
+
+def cached_metadata(checksum: str, version: str) -> Optional[Dict[str, Any]]:
+    return ExtractionCacheEntry.objects.filter(checksum=checksum, extractor_version=version).values_list(
+        'metadata', flat=True).first()
+
+
+def store_cached_metadata(checksum: str, version: str, metadata: Dict[str, Any]):
+    ExtractionCacheEntry.objects.bulk_create(
+        [ExtractionCacheEntry(checksum=checksum, extractor_version=version, metadata=metadata)],
+        update_conflicts=True, unique_fields=['checksum', 'extractor_version'], update_fields=['metadata'],
+    )
+
+
+def finish_job(file_id: int, metadata: Dict[str, Any] = None, error: str = '', version: str = ''):
+    """Store an extraction result on the file and mark the job done or failed"""
+    try:
+        file_obj = File.objects.get(pk=file_id)
+    except File.DoesNotExist:
+        return
+    file_obj.extraction_finished_at = timezone.now()
+    file_obj.extraction_status = 'failed' if error else 'done'
+    file_obj.extraction_error = error[:2000]
+    update_fields = ['extraction_status', 'extraction_error', 'extraction_finished_at']
+    if not error:
+        file_obj.extractor_version = version
+        update_fields.append('extractor_version')
+
+    if metadata:
+        file_obj.extracted_metadata = metadata
+        update_fields.append('extracted_metadata')
+
+        # Autofill organism if user left it blank
+        if not file_obj.organism and 'detected_organism' in metadata:
+            file_obj.organism = metadata['detected_organism']
+            update_fields.append('organism')
+
+        # Populate description using detected keywords when possible
+        keywords = metadata.get('detected_keywords')
+        if not file_obj.description and keywords:
+            file_obj.description = f"Detected keywords: {', '.join(keywords[:5])}"
+            update_fields.append('description')
+
+        if 'organism' in update_fields or 'description' in update_fields:
+            update_fields.append('search_vector')
+
+    file_obj.save(update_fields=update_fields)
+
+
+def process_jobs(jobs: List[Job], pool=None, use_cache: bool = True) -> int:
+    """
+    Run claimed jobs, in ``pool`` when given, and record their results.
+
+    Files whose content and extractor version match a cached result are
+    finished without running an extractor, and files sharing a checksum
+    within the batch are extracted once. Region indexes are built alongside
+    and a file is only marked finished once its index is stored.
+    """
+    storage = File._meta.get_field('file').storage
+    region_builds = {}
+    for file_id, name, file_format, _checksum in jobs:
+        if file_format in REGION_FORMATS:
+            args = (name, storage.path(name), file_format)
+            region_builds[file_id] = pool.submit(build_region_sidecar, *args) if pool is not None else args
+
+    def await_region_index(file_id):
+        build = region_builds.pop(file_id, None)
+        if build is None:
+            return
+        try:
+            if pool is not None:
+                build.result()
+            else:
+                build_region_sidecar(*build)
+        except Exception as exc:
+            logger.error(f"Region index build failed for file {file_id}: {exc}")
+
+    # Work key -> (path, format, index path, version) and the files waiting on it
+    work: Dict[Tuple, Tuple[str, str, Optional[str], str]] = {}
+    waiting: Dict[Tuple, List[int]] = {}
+
+    for file_id, name, file_format, checksum in jobs:
+        path = storage.path(name)
+        index_name = find_alignment_index(file_id) if file_format in ALIGNMENT_FORMATS else None
+        index_path = storage.path(index_name) if index_name else None
+        version = extractor_version(path, file_format)
+        # Alignment summaries also depend on the index file, so they are not shared
+        if checksum and index_path is None:
+            cached = cached_metadata(checksum, version) if use_cache else None
+            if cached:
+                await_region_index(file_id)
+                finish_job(file_id, cached, version=version)
+                continue
+            key = (checksum, version)
+        else:
+            key = (None, file_id)
+        work.setdefault(key, (path, file_format, index_path, version))
+        waiting.setdefault(key, []).append(file_id)
+
+    def record(key, metadata=None, error=''):
+        version = work[key][3]
+        # Fallback output (sampled stats, swallowed errors) is kept off the cache
+        if metadata and key[0] is not None and DEGRADED_KEY not in metadata:
+            store_cached_metadata(key[0], version, metadata)
+        for file_id in waiting[key]:
+            await_region_index(file_id)
+            finish_job(file_id, metadata, error, version)
+
+    if pool is None:
+        for key, (path, file_format, index_path, _version) in work.items():
+            try:
+                record(key, run_extractor(path, file_format, index_path))
+            except Exception as exc:
+                logger.exception(f"Metadata extraction failed for files {waiting[key]}")
+                record(key, error=str(exc))
+        return len(jobs)
+
+    futures = {pool.submit(run_extractor, path, file_format, index_path): key
+               for key, (path, file_format, index_path, _version) in work.items()}
+    for future in as_completed(futures):
+        key = futures[future]
+        try:
+            record(key, future.result())
+        except Exception as exc:
+            logger.error(f"Metadata extraction failed for files {waiting[key]}: {exc}")
+            record(key, error=str(exc))
+    return len(jobs)
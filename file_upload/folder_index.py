@@ -0,0 +1,94 @@
+"""
+In-memory view of a user's folder tree.
+
+Serializers use it to answer path, child-count and size questions for every
+row of a listing from two queries instead of walking parents per row.
+"""
+
+from collections import defaultdict
+from typing import Dict, Optional
+
+from django.db.models import Count, Sum
+
+from .models import File, Folder
+
+
+class FolderIndex:
+    """Folder hierarchy plus per-folder file aggregates for one user"""
+
+    def __init__(self, folders, file_stats):
+        self._names: Dict[int, str] = {}
+        self._parents: Dict[int, Optional[int]] = {}
+        self._children = defaultdict(list)
+        for folder_id, name, parent_id in folders:
+            self._names[folder_id] = name
+            self._parents[folder_id] = parent_id
+            self._children[parent_id].append(folder_id)
+
+        self._file_counts: Dict[int, int] = {}
+        self._file_sizes: Dict[int, int] = {}
+        for folder_id, count, size in file_stats:
+            self._file_counts[folder_id] = count
+            self._file_sizes[folder_id] = size or 0
+
+        self._paths: Dict[int, str] = {}
+        self._sizes: Dict[int, int] = {}
+
+    @classmethod
+    def for_user(cls, user):
+        folders = Folder.objects.filter(user=user).values_list('id', 'name', 'parent_id')
+        file_stats = (
+            File.objects.filter(user=user, parent_folder__isnull=False)
+            .values('parent_folder_id')
+            .annotate(count=Count('id'), size=Sum('file_size'))
+            .values_list('parent_folder_id', 'count', 'size')
+        )
+        return cls(list(folders), list(file_stats))
+
+    def __contains__(self, folder_id):
+        return folder_id in self._names
+
+    def name(self, folder_id: int) -> str:
+        return self._names[folder_id]
+
+    def parent_id(self, folder_id: int) -> Optional[int]:
+        return self._parents[folder_id]
+
+    def path(self, folder_id: int) -> str:
+        """Slash-joined folder names from the root down to ``folder_id``"""
+        if folder_id not in self._paths:
+            parts = []
+            current = folder_id
+            while current is not None and current in self._names:
+                if current in self._paths:
+                    parts.append(self._paths[current])
+                    break
+                parts.append(self._names[current])
+                current = self._parents[current]
+            self._paths[folder_id] = '/'.join(reversed(parts))
+        return self._paths[folder_id]
+
+    def subfolder_count(self, folder_id: int) -> int:
+        return len(self._children.get(folder_id, ()))
+
+    def file_count(self, folder_id: int) -> int:
+        return self._file_counts.get(folder_id, 0)
+
+    def total_size(self, folder_id: int) -> int:
+        """Size of all files below ``folder_id``, descendants included"""
+        if folder_id not in self._sizes:
+            # Iterative post-order walk so deep trees do not hit the recursion limit
+            stack = [(folder_id, False)]
+            while stack:
+                current, expanded = stack.pop()
+                if current in self._sizes:
+                    continue
+                children = self._children.get(current, ())
+                if expanded:
+                    self._sizes[current] = self._file_sizes.get(current, 0) + sum(
+                        self._sizes[child] for child in children
+                    )
+                else:
+                    stack.append((current, True))
+                    stack.extend((child, False) for child in children if child not in self._sizes)
+        return self._sizes[folder_id]
@@ -0,0 +1,182 @@
+"""
+Seek points for gzip-compressed uploads.
+
+The first random-access read of a stored ``.gz`` blob records
+``[compressed offset, decompressed offset]`` pairs, roughly every
+``CHECKPOINT_SPAN`` decompressed bytes, at places where decompression can
+restart from scratch: BGZF block starts (read from block headers without
+inflating, like a ``.gzi``) and member boundaries of multi-member gzip.
+Reads deep into the file then inflate at most one span before the target.
+
+A single-member gzip stream can only be resumed mid-member with the
+deflate window and bit offset (zran), which Python's zlib cannot restore;
+those files use ``indexed_gzip`` when it is installed and are otherwise
+read sequentially from the start. The member scan gives up once the first
+member outgrows ``FIRST_MEMBER_SCAN_LIMIT``: a file made of one huge member
+gains nothing from a full inflating pass.
+"""
+
+import bisect
+import gzip
+import os
+import struct
+import zlib
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from .compression import SKIP_CHUNK, detect_compression, open_at as open_sequential_at
+from .sidecars import is_fresh, load_or_build_json, sidecar_path, write_atomically
+
+try:
+    import indexed_gzip
+except ImportError:  # pragma: no cover - indexed_gzip is optional
+    indexed_gzip = None
+
+# Decompressed bytes between seek points; the most a read inflates before its target
+CHECKPOINT_SPAN = 1024 * 1024
+# Seek-point spacing passed to indexed_gzip for single-member files
+ZRAN_SPACING = 4 * 1024 * 1024
+SCAN_CHUNK = 1024 * 1024
+# Decompressed size of the first member past which the scan stops and reads stay sequential
+FIRST_MEMBER_SCAN_LIMIT = 16 * 1024 * 1024
+
+
+def available() -> bool:
+    return indexed_gzip is not None
+
+
+def _bgzf_points(path: str) -> Dict[str, Any]:
+    points = [[0, 0]]
+    compressed = decompressed = since_point = 0
+    with open(path, 'rb') as handle:
+        while True:
+            header = handle.read(18)
+            if len(header) < 18:
+                break
+            block_size = struct.unpack('<H', header[16:18])[0] + 1
+            # ISIZE, the block's decompressed length, closes every block
+            handle.seek(compressed + block_size - 4)
+            block_bytes = struct.unpack('<I', handle.read(4))[0]
+            compressed += block_size
+            decompressed += block_bytes
+            since_point += block_bytes
+            if since_point >= CHECKPOINT_SPAN:
+                points.append([compressed, decompressed])
+                since_point = 0
+    return {'kind': 'bgzf', 'points': points, 'size': decompressed}
+
+
+def _member_points(path: str) -> Dict[str, Any]:
+    """
+    One inflating pass that notes where each gzip member starts. Output is
+    inflated ``SCAN_CHUNK`` at a time and discarded, so memory stays flat
+    whatever the compression ratio.
+    """
+    points = [[0, 0]]
+    members = 0
+    compressed = decompressed = since_point = 0
+    at_boundary = True
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    with open(path, 'rb') as handle:
+        while True:
+            data = handle.read(SCAN_CHUNK)
+            if not data:
+                break
+            while data:
+                if at_boundary:
+                    if not data.strip(b'\x00'):
+                        # Zero padding after the last member
+                        compressed += len(data)
+                        break
+                    members += 1
+                    if since_point >= CHECKPOINT_SPAN:
+                        points.append([compressed, decompressed])
+                        since_point = 0
+                    at_boundary = False
+                produced = len(inflater.decompress(data, SCAN_CHUNK))
+                decompressed += produced
+                since_point += produced
+                if members == 1 and decompressed > FIRST_MEMBER_SCAN_LIMIT:
+                    return {'kind': 'gzip', 'points': [[0, 0]], 'size': None, 'members': 1,
+                            'sequential': True}
+                if inflater.eof:
+                    compressed += len(data) - len(inflater.unused_data)
+                    data = inflater.unused_data
+                    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    at_boundary = True
+                elif inflater.unconsumed_tail:
+                    compressed += len(data) - len(inflater.unconsumed_tail)
+                    data = inflater.unconsumed_tail
+                else:
+                    compressed += len(data)
+                    break
+    return {'kind': 'gzip', 'points': points, 'size': decompressed, 'members': members}
+
+
+def build_gzip_index(path: str) -> Dict[str, Any]:
+    if detect_compression(path) == 'bgzf':
+        return _bgzf_points(path)
+    return _member_points(path)
+
+
+class _MemberReader(gzip.GzipFile):
+    """GzipFile reading from a member boundary of a raw handle it owns"""
+
+    def close(self):
+        raw = self.fileobj
+        try:
+            super().close()
+        finally:
+            if raw is not None:
+                raw.close()
+
+
+def _storage_name(path: str) -> Optional[str]:
+    """Storage name of a blob under MEDIA_ROOT; other paths get no sidecar"""
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    resolved = os.path.realpath(path)
+    if resolved.startswith(root + os.sep):
+        return os.path.relpath(resolved, root).replace(os.sep, '/')
+    return None
+
+
+def _open_zran(file_name: str, path: str, offset: int):
+    index_path = sidecar_path(file_name, '.gzidx')
+    if is_fresh(index_path, path):
+        handle = indexed_gzip.IndexedGzipFile(path, spacing=ZRAN_SPACING, index_file=index_path)
+    else:
+        handle = indexed_gzip.IndexedGzipFile(path, spacing=ZRAN_SPACING)
+        handle.build_full_index()
+        write_atomically(index_path, lambda target: handle.export_index(fileobj=target), mode='wb')
+    handle.seek(offset)
+    return handle
+
+
+def open_at(path: str, offset: int):
+    """
+    Binary handle on the decompressed content of ``path`` positioned at
+    ``offset``, resuming gzip decompression from the nearest seek point.
+    """
+    kind = detect_compression(path)
+    file_name = _storage_name(path)
+    if kind not in ('gzip', 'bgzf') or file_name is None or offset == 0:
+        return open_sequential_at(path, offset)
+    index = load_or_build_json(file_name, path, '.gzi.json', build_gzip_index)
+    if index.get('sequential') or (index.get('members') == 1 and index['size'] > CHECKPOINT_SPAN):
+        if indexed_gzip is not None:
+            return _open_zran(file_name, path, offset)
+        return open_sequential_at(path, offset)
+
+    position = bisect.bisect_right([point[1] for point in index['points']], offset) - 1
+    compressed, decompressed = index['points'][position]
+    raw = open(path, 'rb')
+    raw.seek(compressed)
+    handle = _MemberReader(fileobj=raw)
+    remaining = offset - decompressed
+    while remaining > 0:
+        skipped = len(handle.read(min(remaining, SKIP_CHUNK)))
+        if not skipped:
+            break
+        remaining -= skipped
+    return handle
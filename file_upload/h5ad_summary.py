@@ -0,0 +1,143 @@
+"""
+Structure of AnnData ``.h5ad`` files read lazily through h5py.
+
+Only HDF5 attributes, dataset shapes and the (small) obs/var column
+encodings are touched; ``X``, layers and embeddings are never loaded, so a
+multi-GB file is summarized in milliseconds. Both the current group-based
+layout (anndata >= 0.7) and the legacy compound-dataset obs/var are read.
+"""
+
+from typing import Any, Dict, List, Optional
+
+try:
+    import h5py
+except ImportError:  # pragma: no cover - h5py is optional
+    h5py = None
+
+HDF5_MAGIC = b'\x89HDF\r\n\x1a\n'
+SPARSE_ENCODINGS = ('csr_matrix', 'csc_matrix')
+# Cap the column listings stored in ``extracted_metadata``
+MAX_LISTED_COLUMNS = 200
+
+
+def available() -> bool:
+    return h5py is not None
+
+
+def _text(value) -> str:
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else str(value)
+
+
+def _attr(node, name, default=None):
+    value = node.attrs.get(name, default)
+    return _text(value) if isinstance(value, (bytes, str)) else value
+
+
+def _shape(node) -> Optional[List[int]]:
+    """Shape of a dense dataset or an encoded sparse/dataframe group"""
+    if isinstance(node, h5py.Dataset):
+        return list(node.shape)
+    shape = node.attrs.get('shape', node.attrs.get('h5sparse_shape'))
+    return [int(size) for size in shape] if shape is not None else None
+
+
+def matrix_info(node) -> Dict[str, Any]:
+    """Encoding, shape, dtype and (for sparse matrices) stored-element density"""
+    if isinstance(node, h5py.Dataset):
+        return {'encoding': 'dense', 'shape': list(node.shape), 'dtype': str(node.dtype)}
+    encoding = _attr(node, 'encoding-type') or _attr(node, 'h5sparse_format', '')
+    if encoding in ('csr', 'csc'):
+        encoding += '_matrix'
+    info: Dict[str, Any] = {'encoding': encoding or 'group', 'shape': _shape(node)}
+    if encoding in SPARSE_ENCODINGS and 'data' in node:
+        nnz = int(node['data'].shape[0])
+        info.update({'dtype': str(node['data'].dtype), 'nnz': nnz})
+        if info['shape'] and info['shape'][0] and info['shape'][1]:
+            info['density'] = round(nnz / (info['shape'][0] * info['shape'][1]), 6)
+    return info
+
+
+def dataframe_columns(node) -> List[Dict[str, Any]]:
+    """``[{name, dtype}]`` for an obs/var dataframe without reading its values"""
+    if isinstance(node, h5py.Dataset):
+        # Legacy layout: one compound dataset with the index as the first field
+        names = node.dtype.names or ()
+        return [{'name': name, 'dtype': str(node.dtype[name])} for name in names[1:]]
+
+    order = node.attrs.get('column-order', [])
+    columns = []
+    for name in [_text(name) for name in order]:
+        if name not in node:
+            continue
+        column = node[name]
+        if isinstance(column, h5py.Group) and _attr(column, 'encoding-type') == 'categorical':
+            columns.append({'name': name, 'dtype': 'category', 'categories': int(column['categories'].shape[0])})
+        elif isinstance(column, h5py.Group):
+            columns.append({'name': name, 'dtype': _attr(column, 'encoding-type', 'group')})
+        elif h5py.check_string_dtype(column.dtype) is not None:
+            columns.append({'name': name, 'dtype': 'string'})
+        else:
+            columns.append({'name': name, 'dtype': str(column.dtype)})
+    # Pre-0.7 files stored categories in a separate __categories group
+    categories = node.get('__categories')
+    if categories is not None:
+        for column in columns:
+            if column['name'] in categories:
+                column.update({'dtype': 'category', 'categories': int(categories[column['name']].shape[0])})
+    return columns
+
+
+def _dataframe_length(node) -> Optional[int]:
+    if isinstance(node, h5py.Dataset):
+        return int(node.shape[0])
+    index = _attr(node, '_index', '_index')
+    return int(node[index].shape[0]) if index in node else None
+
+
+def _mapping(file, name) -> Dict[str, Any]:
+    group = file.get(name)
+    if group is None:
+        return {}
+    return {key: matrix_info(group[key]) for key in group.keys()}
+
+
+def summarize_h5ad(path: str) -> Dict[str, Any]:
+    """Dimensions, obs/var schema, embeddings and layers of an h5ad file"""
+    with h5py.File(path, 'r') as file:
+        x_info = matrix_info(file['X']) if 'X' in file else {}
+        obs = file.get('obs')
+        var = file.get('var')
+        shape = x_info.get('shape') or []
+        n_obs = shape[0] if len(shape) == 2 else (_dataframe_length(obs) if obs is not None else None)
+        n_vars = shape[1] if len(shape) == 2 else (_dataframe_length(var) if var is not None else None)
+        obs_columns = dataframe_columns(obs) if obs is not None else []
+        var_columns = dataframe_columns(var) if var is not None else []
+
+        obsm = {key: info.get('shape') for key, info in _mapping(file, 'obsm').items()}
+        umap = obsm.get('X_umap')
+        metadata = {
+            'n_obs': n_obs,
+            'n_vars': n_vars,
+            'x_encoding': x_info.get('encoding'),
+            'x_dtype': x_info.get('dtype'),
+            'obs_column_count': len(obs_columns),
+            'obs_columns': obs_columns[:MAX_LISTED_COLUMNS],
+            'var_column_count': len(var_columns),
+            'var_columns': var_columns[:MAX_LISTED_COLUMNS],
+            'obsm': obsm,
+            'varm': sorted(file['varm'].keys()) if 'varm' in file else [],
+            'obsp': sorted(file['obsp'].keys()) if 'obsp' in file else [],
+            'layers': _mapping(file, 'layers'),
+            'uns_keys': sorted(file['uns'].keys()) if 'uns' in file else [],
+            'has_umap_layout': bool(umap and len(umap) == 2 and umap[1] >= 2),
+            'encoding_version': _attr(file, 'encoding-version'),
+        }
+        if 'nnz' in x_info:
+            metadata['x_nnz'] = x_info['nnz']
+            metadata['x_density'] = x_info.get('density')
+    return metadata
+
+
+def is_hdf5(path: str) -> bool:
+    with open(path, 'rb') as handle:
+        return handle.read(8) == HDF5_MAGIC
@@ -0,0 +1,112 @@
+"""
+Header-level metadata for chunked uploads that are still streaming in.
+
+Once the first contiguous bytes of an upload have arrived, they are
+decompressed into a small head file and run through the extractors in
+head-only mode: format detection, header parsing and sample statistics
+are ready when ``complete`` is called, and the queued full extraction
+replaces them with whole-file statistics afterwards.
+"""
+
+import io
+import logging
+import os
+import zlib
+from typing import Any, Dict
+
+from django.conf import settings
+
+from .compression import detect_compression, strip_compression_suffix, zstandard
+from .metadata_extractor import MetadataExtractor
+from .models import detect_file_format
+
+logger = logging.getLogger(__name__)
+
+# Formats whose extractors work from the leading bytes alone (PDF and h5ad need the whole file)
+HEAD_FORMATS = ('FASTQ', 'FASTA', 'VCF', 'CSV', 'txt', 'BAM', 'SAM', 'CRAM')
+# A decompressed head never grows past this many bytes
+MAX_DECOMPRESSED_HEAD = 16 * 1024 * 1024
+
+
+def head_bytes() -> int:
+    return getattr(settings, 'CHUNKED_HEAD_EXTRACTION_BYTES', 1024 * 1024)
+
+
+def head_ready(session) -> bool:
+    """Whether enough leading bytes have arrived, in order, to extract the head"""
+    return session.contiguous_size >= min(head_bytes(), session.total_size)
+
+
+def _inflate_prefix(data: bytes, kind: str) -> bytes:
+    """Decompress as much of a truncated compressed stream as is present"""
+    if kind == 'zstd':
+        if zstandard is None:
+            raise ValueError('zstandard is not installed; cannot read .zst files')
+        # Read up to the cap rather than inflating everything first: a small,
+        # highly compressible head could otherwise expand to gigabytes
+        reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True)
+        output, size = [], 0
+        try:
+            while size < MAX_DECOMPRESSED_HEAD:
+                block = reader.read(min(1024 * 1024, MAX_DECOMPRESSED_HEAD - size))
+                if not block:
+                    break
+                output.append(block)
+                size += len(block)
+        except zstandard.ZstdError:
+            # The head ends mid-frame; keep what was decoded before the cut
+            pass
+        return b''.join(output)
+    # gzip and BGZF; a gzip stream may hold several members back to back
+    output, size = [], 0
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    while data and size < MAX_DECOMPRESSED_HEAD:
+        block = inflater.decompress(data, MAX_DECOMPRESSED_HEAD - size)
+        output.append(block)
+        size += len(block)
+        if inflater.eof:
+            data = inflater.unused_data
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            # Either the output cap was hit or the head ends mid-block
+            break
+    return b''.join(output)
+
+
+def _write_head(session, head_path: str) -> int:
+    """Copy the contiguous head of the upload to ``head_path``, decompressed"""
+    with open(session.temp_path, 'rb') as source:
+        data = source.read(min(head_bytes(), session.contiguous_size))
+    kind = detect_compression(session.temp_path)
+    if kind is not None:
+        data = _inflate_prefix(data, kind)
+    with open(head_path, 'wb') as target:
+        target.write(data)
+    return len(data)
+
+
+def extract_session_head(session) -> Dict[str, Any]:
+    """
+    Head-only metadata for an in-progress upload. Formats that need the
+    whole file, and failures, yield a marker with ``stats_scope='none'`` so
+    the extraction is not retried on every chunk.
+    """
+    file_format = detect_file_format(session.original_filename)
+    skipped = {'detected_format': file_format, 'stats_scope': 'none'}
+    if file_format not in HEAD_FORMATS:
+        return skipped
+    suffix = os.path.splitext(strip_compression_suffix(session.original_filename))[1]
+    head_path = f'{session.temp_path}.head{suffix}'
+    try:
+        size = _write_head(session, head_path)
+        metadata = MetadataExtractor(head_only=True).extract_metadata(head_path, file_format)
+    except Exception as e:
+        logger.error(f"Head extraction failed for upload {session.session_id}: {e}")
+        return skipped
+    finally:
+        if os.path.exists(head_path):
+            os.remove(head_path)
+    if not metadata:
+        return skipped
+    metadata.update({'detected_format': file_format, 'stats_scope': 'head', 'head_bytes': size})
+    return metadata
@@ -0,0 +1,85 @@
+"""
+Sparse line-offset index for paging through large text files.
+
+One streaming pass records the byte offset of every
+``LINE_INDEX_INTERVAL``-th line; a window starting anywhere in the file is
+then one seek plus at most ``LINE_INDEX_INTERVAL`` skipped lines away.
+Newlines are counted a block at a time, so building the index stays close
+to raw read speed. Offsets are in decompressed bytes.
+"""
+
+import csv
+import itertools
+from typing import Any, Dict, List
+
+from .compression import open_binary
+from .gzip_index import open_at
+from .sidecars import load_or_build_json
+
+LINE_INDEX_INTERVAL = 10000
+SCAN_BLOCK = 64 * 1024
+
+
+def build_line_index(path: str) -> Dict[str, Any]:
+    """``{interval, offsets, line_count}`` where ``offsets[k]`` is the start of line ``k * interval``"""
+    interval = LINE_INDEX_INTERVAL
+    offsets = [0]
+    lines = 0
+    position = 0
+    last_byte = b'\n'
+    with open_binary(path) as handle:
+        while True:
+            block = handle.read(SCAN_BLOCK)
+            if not block:
+                break
+            newlines = block.count(b'\n')
+            # Only blocks that cross the next checkpoint are searched line by line
+            cursor = 0
+            while lines + newlines >= len(offsets) * interval:
+                for _ in range(len(offsets) * interval - lines):
+                    cursor = block.index(b'\n', cursor) + 1
+                    lines += 1
+                    newlines -= 1
+                offsets.append(position + cursor)
+            lines += newlines
+            position += len(block)
+            last_byte = block[-1:]
+    if offsets[-1] == position:
+        offsets.pop()
+    line_count = lines + (last_byte != b'\n')
+    return {'interval': interval, 'offsets': offsets or [0], 'line_count': line_count}
+
+
+def line_index(file_name: str, path: str) -> Dict[str, Any]:
+    """The line index of a stored blob, building it on first use"""
+    return load_or_build_json(file_name, path, '.lines', build_line_index)
+
+
+def iter_lines_from(path: str, index: Dict[str, Any], start: int):
+    """Decoded lines from ``start`` (zero-based) to the end of the file"""
+    checkpoint = min(start // index['interval'], len(index['offsets']) - 1)
+    handle = open_at(path, index['offsets'][checkpoint])
+    try:
+        lines = itertools.islice(handle, start - checkpoint * index['interval'], None)
+        for line in lines:
+            yield line.rstrip(b'\r\n').decode('utf-8', 'replace')
+    finally:
+        handle.close()
+
+
+def read_lines(path: str, index: Dict[str, Any], start: int, count: int) -> List[str]:
+    if start >= index['line_count'] or count <= 0:
+        return []
+    return list(itertools.islice(iter_lines_from(path, index, start), count))
+
+
+def read_rows(path: str, index: Dict[str, Any], start: int, count: int, delimiter: str) -> List[List[str]]:
+    """
+    Parse ``count`` delimited rows starting at line ``start``. Fields with
+    embedded newlines are followed to their end, but line numbers count
+    physical lines.
+    """
+    if start >= index['line_count'] or count <= 0:
+        return []
+    reader = csv.reader(iter_lines_from(path, index, start), delimiter=delimiter)
+    return list(itertools.islice(reader, count))
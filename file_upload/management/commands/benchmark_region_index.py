@@ -0,0 +1,86 @@
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from file_upload.compression import bgzf_block
+from file_upload.region_index import REGION_FORMATS, build_region_index, query_region
+
+BLOCK_BYTES = 65280
+
+
+def write_synthetic_vcf(path: str, target_bytes: int, references: int = 24, seed: int = 0) -> int:
+    """Sorted, bgzipped VCF of roughly ``target_bytes`` decompressed bytes; returns the record count"""
+    rng = random.Random(seed)
+    per_reference = max(target_bytes // 90 // references, 1)
+    records = 0
+    buffer = bytearray(b'##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS1\n')
+    with open(path, 'wb') as handle:
+        for reference in range(1, references + 1):
+            position = 0
+            for _ in range(per_reference):
+                position += rng.randint(1, 200)
+                buffer += b'chr%d\t%d\t.\tA\tG\t60\tPASS\tDP=%d;AF=0.5\tGT:DP\t0/1:%d\n' % (
+                    reference, position, rng.randint(5, 80), rng.randint(5, 80))
+                records += 1
+                while len(buffer) >= BLOCK_BYTES:
+                    handle.write(bgzf_block(bytes(buffer[:BLOCK_BYTES])))
+                    del buffer[:BLOCK_BYTES]
+        handle.write(bgzf_block(bytes(buffer)))
+        handle.write(bgzf_block(b''))
+    return records
+
+
+class Command(BaseCommand):
+    help = "Time region-index builds and queries on a sorted, bgzipped VCF/BED/GTF/GFF file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Existing bgzipped file (a synthetic VCF is generated otherwise)')
+        parser.add_argument('--format', default='VCF', choices=REGION_FORMATS)
+        parser.add_argument('--size-mb', type=int, default=1024, help='Decompressed size of the synthetic VCF')
+        parser.add_argument('--queries', type=int, default=100, help='Random region queries to run')
+        parser.add_argument('--width', type=int, default=300000, help='Width of each queried region in bases')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        generated = None
+        if path is None:
+            handle, generated = tempfile.mkstemp(suffix='.vcf.gz')
+            os.close(handle)
+            path = generated
+            started = time.monotonic()
+            records = write_synthetic_vcf(path, options['size_mb'] * 1024 * 1024)
+            self.stdout.write(f"Generated {records} records ({os.path.getsize(path) / 2 ** 20:.0f} MiB compressed) "
+                              f"in {time.monotonic() - started:.1f}s")
+        elif not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+
+        try:
+            started = time.monotonic()
+            index = build_region_index(path, options['format'])
+            build_seconds = time.monotonic() - started
+            size_mb = os.path.getsize(path) / 2 ** 20
+            self.stdout.write(f"Index build: {index['records']} records in {build_seconds:.1f}s "
+                              f"({size_mb / build_seconds:.1f} MiB/s compressed)")
+
+            rng = random.Random(1)
+            timings, found = [], 0
+            for _ in range(options['queries']):
+                reference = rng.choice(index['references'])
+                span = len(reference['linear']) << 14
+                begin = rng.randrange(max(span - options['width'], 1))
+                started = time.monotonic()
+                found += sum(1 for _ in query_region(path, index, reference['name'], begin, begin + options['width']))
+                timings.append(time.monotonic() - started)
+            timings.sort()
+            if timings:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{len(timings)} queries of {options['width']} bp: {found / len(timings):.0f} records each, "
+                    f"median {timings[len(timings) // 2] * 1000:.1f} ms, "
+                    f"p95 {timings[int(len(timings) * 0.95)] * 1000:.1f} ms"
+                ))
+        finally:
+            if generated:
+                os.remove(generated)
@@ -0,0 +1,52 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from file_upload.extraction import claim_jobs, enqueue_extraction, process_jobs, requeue_stale
+from file_upload.models import File
+
+
+class Command(BaseCommand):
+    help = "Run queued metadata extraction jobs over a pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Extractor processes (0 runs inline)')
+        parser.add_argument('--once', action='store_true', help='Drain the current queue and exit')
+        parser.add_argument('--interval', type=float, default=None, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--queue-missing', action='store_true',
+                            help='Queue files that were never extracted before starting')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers is None:
+            workers = getattr(settings, 'METADATA_WORKERS', 2)
+        interval = options['interval']
+        if interval is None:
+            interval = getattr(settings, 'METADATA_WORKER_INTERVAL_SECONDS', 2)
+
+        if options['queue_missing']:
+            missing = File.objects.filter(Q(extraction_status='idle') | Q(extraction_status='failed'))
+            for file_obj in missing.only('id').iterator():
+                enqueue_extraction(file_obj)
+
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        batch = max(1, workers) * 4
+        try:
+            while True:
+                recovered = requeue_stale()
+                if recovered:
+                    self.stdout.write(f"Requeued {recovered} stale job(s)")
+                jobs = claim_jobs(batch)
+                if jobs:
+                    done = process_jobs(jobs, pool)
+                    self.stdout.write(f"Extracted metadata for {done} file(s)")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(interval)
+        finally:
+            if pool is not None:
+                pool.shutdown()
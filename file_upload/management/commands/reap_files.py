@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from file_upload.reaper import reap_tombstones, scan_orphans
+
+
+class Command(BaseCommand):
+    help = "Unlink tombstoned file blobs in the background and optionally scan media/files/ for orphans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process one batch and exit')
+        parser.add_argument('--interval', type=float, default=None, help='Seconds to sleep between batches')
+        parser.add_argument('--rate', type=float, default=None, help='Maximum unlinks per second')
+        parser.add_argument('--scan-orphans', action='store_true', help='Report blobs without a database row')
+        parser.add_argument('--enqueue-orphans', action='store_true', help='Tombstone orphans so they get reaped')
+
+    def handle(self, *args, **options):
+        if options['scan_orphans'] or options['enqueue_orphans']:
+            orphans = scan_orphans(enqueue=options['enqueue_orphans'])
+            total = sum(size for _path, size in orphans)
+            for path, size in orphans:
+                self.stdout.write(f"orphan {path} ({size} bytes)")
+            action = 'queued' if options['enqueue_orphans'] else 'found'
+            self.stdout.write(self.style.SUCCESS(f"{len(orphans)} orphan(s) {action}, {total} bytes"))
+            return
+
+        interval = options['interval']
+        if interval is None:
+            interval = getattr(settings, 'FILE_REAPER_INTERVAL_SECONDS', 10)
+
+        while True:
+            cleared = reap_tombstones(max_per_second=options['rate'])
+            if cleared:
+                self.stdout.write(f"Reaped {cleared} blob(s)")
+            if options['once']:
+                break
+            time.sleep(interval)
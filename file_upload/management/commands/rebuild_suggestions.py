@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from file_upload.suggestions import rebuild_for_user
+
+
+class Command(BaseCommand):
+    help = "Rebuild the autocomplete trigram index, e.g. after bulk QuerySet.update() calls that bypass signals"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='Only rebuild this user id (repeatable)')
+
+    def handle(self, *args, **options):
+        user_ids = options['user'] or get_user_model().objects.values_list('id', flat=True)
+        count = 0
+        for user_id in user_ids:
+            rebuild_for_user(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt suggestions for {count} user(s)"))
@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from file_upload.extraction import process_jobs
+from file_upload.metadata_extractor import extractor_version
+from file_upload.models import File
+
+
+class Command(BaseCommand):
+    help = "Re-extract metadata for files produced by an older extractor version"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Extractor processes (0 runs inline)')
+        parser.add_argument('--format', action='append', dest='formats', help='Only files of this format (repeatable)')
+        parser.add_argument('--all', action='store_true', help='Include files already at the current version')
+        parser.add_argument('--no-cache', action='store_true', help='Ignore cached results and overwrite them')
+        parser.add_argument('--batch-size', type=int, default=200, help='Files handed to the pool per batch')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers is None:
+            workers = getattr(settings, 'METADATA_WORKERS', 2)
+
+        files = File.objects.exclude(file='').exclude(file__isnull=True)
+        if options['formats']:
+            files = files.filter(file_format__in=options['formats'])
+        # Ordered by checksum so duplicate content lands in the same batch and is extracted once
+        rows = files.order_by('checksum', 'id').values_list('id', 'file', 'file_format', 'checksum', 'extractor_version')
+        jobs = [
+            (file_id, name, file_format, checksum)
+            for file_id, name, file_format, checksum, version in rows.iterator()
+            if options['all'] or version != extractor_version(name, file_format)
+        ]
+        total = len(jobs)
+        if not total:
+            self.stdout.write("All extracted metadata is current")
+            return
+        self.stdout.write(f"Re-extracting {total} file(s) with {workers or 'no'} worker process(es)")
+
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        started = time.monotonic()
+        done = 0
+        try:
+            for start in range(0, total, options['batch_size']):
+                batch = jobs[start:start + options['batch_size']]
+                # Keep the queue workers away from files this command is handling
+                File.objects.filter(pk__in=[job[0] for job in batch]).update(
+                    extraction_status='running', extraction_queued_at=timezone.now()
+                )
+                done += process_jobs(batch, pool, use_cache=not options['no_cache'])
+                elapsed = time.monotonic() - started
+                rate = done / elapsed if elapsed else 0
+                remaining = (total - done) / rate if rate else 0
+                self.stdout.write(f"[{done}/{total}] {rate:.1f} files/s, ~{remaining:.0f}s remaining")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        failed = File.objects.filter(pk__in=[job[0] for job in jobs], extraction_status='failed').count()
+        self.stdout.write(self.style.SUCCESS(f"Re-extracted {done} file(s), {failed} failed"))
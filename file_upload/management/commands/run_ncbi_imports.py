@@ -0,0 +1,57 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from file_upload.ncbi_imports import claim_import_jobs, prefetch_summaries, requeue_stale_imports, run_import_job
+
+
+def _run(job_id):
+    try:
+        return job_id, run_import_job(job_id)
+    except Exception as exc:
+        # A job deleted with its user, or a database hiccup, must not stop the worker
+        return job_id, f'error ({exc})'
+    finally:
+        # Each pool thread holds its own database connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Run queued NCBI import jobs, several downloads at a time over one pooled, rate-limited session"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Concurrent downloads')
+        parser.add_argument('--once', action='store_true', help='Drain the current queue and exit')
+        parser.add_argument('--interval', type=float, default=None, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or getattr(settings, 'NCBI_IMPORT_WORKERS', 4)
+        interval = options['interval']
+        if interval is None:
+            interval = getattr(settings, 'NCBI_IMPORT_WORKER_INTERVAL_SECONDS', 1)
+
+        # future -> job id; jobs still downloading here are never requeued by this loop
+        running = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ncbi-import') as pool:
+            while True:
+                recovered = requeue_stale_imports(exclude_ids=running.values())
+                if recovered:
+                    self.stdout.write(f"Requeued {recovered} stalled import(s)")
+                claimed = claim_import_jobs(workers - len(running))
+                if claimed:
+                    prefetch_summaries(claimed)
+                for job_id in claimed:
+                    running[pool.submit(_run, job_id)] = job_id
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(interval)
+                    continue
+                finished, _pending = wait(running, timeout=interval, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    del running[future]
+                    job_id, outcome = future.result()
+                    self.stdout.write(f"NCBI import {job_id}: {outcome}")
@@ -1,25 +1,91 @@
 """
 File metadata extraction utilities for BioFileManager.
 Each extractor focuses on low-cost parsing of common bioinformatics formats.
+Files are opened through ``compression`` so gzip/bgzip/zstd inputs parse as text.
 """
 
+import os
 import re
 import json
 import logging
 from typing import Dict, Any, Optional
 from pathlib import Path
 
+from . import alignment_summary, h5ad_summary, sequence_stats, vcf_summary
+from .compression import open_text
+
 logger = logging.getLogger(__name__)
 
 
+# Bump an entry whenever its extractor's output changes; files extracted by an
+# older version are re-extracted lazily and cached results are not reused
+EXTRACTOR_VERSIONS = {
+    'FASTA': 2,
+    'FASTQ': 2,
+    'VCF': 2,
+    'BAM': 1,
+    'SAM': 1,
+    'CRAM': 1,
+    'H5AD': 1,
+    'PDF': 1,
+    'CSV': 1,
+    'txt': 1,
+}
+BASIC_EXTRACTOR = 'basic'
+# Set on output produced by a fallback (missing optional package, swallowed
+# error); such results are served but never cached by checksum
+DEGRADED_KEY = 'extraction_degraded'
+
+
+def mark_degraded(metadata: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    metadata[DEGRADED_KEY] = reason
+    return metadata
+
+
+def resolve_format(file_path: str, file_format: str) -> str:
+    """The extractor key for a file, or ``'basic'`` when only file stats are available"""
+    if file_format in EXTRACTOR_VERSIONS:
+        return file_format
+    if file_path.lower().endswith('.h5ad'):
+        # Older uploads recorded AnnData files as 'other'
+        return 'H5AD'
+    return BASIC_EXTRACTOR
+
+
+def extractor_version(file_path: str, file_format: str, full_scan: Optional[bool] = None) -> str:
+    """
+    Identifies the code and options that produce a file's metadata, e.g.
+    ``FASTQ/2+full``; with the content checksum it keys the extraction cache.
+    """
+    key = resolve_format(file_path, file_format)
+    version = f"{key}/{EXTRACTOR_VERSIONS.get(key, 1)}"
+    if key == 'FASTQ':
+        if full_scan is None:
+            from django.conf import settings
+            full_scan = getattr(settings, 'METADATA_FULL_SCAN', False)
+        if full_scan:
+            version += '+full'
+    return version
+
+
 class MetadataExtractor:
     """Metadata extractor that understands several bioinformatics formats"""
     
-    def __init__(self):
+    def __init__(self, full_scan: bool = False, index_path: Optional[str] = None, head_only: bool = False):
+        # Full scans read the whole file instead of sampling its head (see sequence_stats.py)
+        self.full_scan = full_scan and not head_only
+        # Head-only extraction samples the leading bytes of a partial upload (see head_extraction.py)
+        self.head_only = head_only
+        # Companion .bai/.csi/.crai for alignment files stored under a different name
+        self.index_path = index_path
         self.extractors = {
             'FASTA': self._extract_fasta_metadata,
             'FASTQ': self._extract_fastq_metadata,
             'VCF': self._extract_vcf_metadata,
+            'BAM': self._extract_alignment_metadata,
+            'SAM': self._extract_alignment_metadata,
+            'CRAM': self._extract_alignment_metadata,
+            'H5AD': self._extract_h5ad_metadata,
             'PDF': self._extract_pdf_metadata,
             'CSV': self._extract_csv_metadata,
             'txt': self._extract_text_metadata,
@@ -37,7 +103,7 @@ class MetadataExtractor:
             dict containing extracted metadata fields
         """
         try:
-            extractor = self.extractors.get(file_format)
+            extractor = self.extractors.get(resolve_format(file_path, file_format))
             if extractor:
                 return extractor(file_path)
             else:
@@ -60,9 +126,25 @@ class MetadataExtractor:
     
     def _extract_fasta_metadata(self, file_path: str) -> Dict[str, Any]:
         """Extract metadata from FASTA files"""
+        fallback = 'numpy is not installed; statistics are sampled from the file head'
+        if sequence_stats.available() and not self.head_only:
+            # Assembly statistics are only meaningful over every sequence
+            try:
+                metadata = sequence_stats.fasta_stats(file_path)
+                organism = self._extract_organism_from_headers(metadata['sample_headers'])
+                if organism:
+                    metadata['detected_organism'] = organism
+                return metadata
+            except Exception as e:
+                # Fall back to sampling the head, flagged with the scan error
+                logger.error(f"FASTA metadata extraction failed: {e}")
+                fallback = f'{e}; statistics are sampled from the file head'
+        
         metadata = {}
+        if not self.head_only:
+            mark_degraded(metadata, fallback)
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            with open_text(file_path) as f:
                 # Read headers from the first few sequences
                 headers = []
                 sequence_count = 0
@@ -84,8 +166,8 @@ class MetadataExtractor:
                         
                         if sequence_count > 10:  # Only analyze the first 10 sequences
                             break
-                elif line and not line.startswith('>'):
-                    current_seq_length += len(line)
+                    elif line:
+                        current_seq_length += len(line)
             
                 # Account for the final sequence
                 if current_seq_length > 0:
@@ -104,6 +186,7 @@ class MetadataExtractor:
                     
         except Exception as e:
             logger.error(f"FASTA metadata extraction failed: {e}")
+            mark_degraded(metadata, str(e))
         
         return metadata
     
@@ -111,7 +194,7 @@ class MetadataExtractor:
         """Extract metadata from FASTQ files"""
         metadata = {}
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            with open_text(file_path) as f:
                 read_count = 0
                 total_length = 0
                 quality_scores = []
@@ -153,49 +236,54 @@ class MetadataExtractor:
                 platform = self._detect_sequencing_platform(headers)
                 if platform:
                     metadata['sequencing_platform'] = platform
+            
+            if self.full_scan:
+                if sequence_stats.available():
+                    metadata.update(sequence_stats.fastq_stats(file_path))
+                else:
+                    logger.warning("numpy is not installed; FASTQ statistics are sampled from the file head")
+                    mark_degraded(metadata, 'numpy is not installed; statistics are sampled from the file head')
                     
         except Exception as e:
             logger.error(f"FASTQ metadata extraction failed: {e}")
+            mark_degraded(metadata, str(e))
         
         return metadata
     
     def _extract_vcf_metadata(self, file_path: str) -> Dict[str, Any]:
-        """Extract metadata from VCF files"""
-        metadata = {}
+        """Extract header definitions and whole-file variant tallies from VCF files"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                header_lines = []
-                variant_count = 0
-                sample_names = []
-                
-                for line_num, line in enumerate(f):
-                    if line_num > 1000:  # Cap how much of the file we scan
-                        break
-                    
-                    line = line.strip()
-                    if line.startswith('##'):
-                        header_lines.append(line)
-                    elif line.startswith('#CHROM'):
-                        # Parse sample names
-                        columns = line.split('\t')
-                        if len(columns) > 9:
-                            sample_names = columns[9:]
-                    elif line and not line.startswith('#'):
-                        variant_count += 1
-                        if variant_count >= 100:  # Count only the first 100 variants
-                            break
-                
-                metadata.update({
-                    'variant_count_sample': variant_count,
-                    'sample_count': len(sample_names),
-                    'sample_names': sample_names[:10],  # Keep the first 10 sample names
-                    'header_info': self._parse_vcf_headers(header_lines),
-                })
-                
+            from django.conf import settings
+            if self.head_only:
+                return vcf_summary.summarize_vcf_head(file_path)
+            workers = getattr(settings, 'VCF_SUMMARY_WORKERS', 0)
+            if not workers:
+                # Every extraction worker may be summarizing a VCF at once; split the CPUs between them
+                outer = max(getattr(settings, 'METADATA_WORKERS', 2), 1)
+                workers = max((os.cpu_count() or 1) // outer, 1)
+            return vcf_summary.summarize_vcf(file_path, workers=workers)
         except Exception as e:
             logger.error(f"VCF metadata extraction failed: {e}")
-        
-        return metadata
+            return mark_degraded(self._extract_basic_metadata(file_path), str(e))
+    
+    def _extract_alignment_metadata(self, file_path: str) -> Dict[str, Any]:
+        """Extract header records and index read counts from SAM/BAM/CRAM files"""
+        try:
+            return alignment_summary.summarize_alignment(file_path, self.index_path)
+        except Exception as e:
+            logger.error(f"Alignment metadata extraction failed: {e}")
+            return mark_degraded(self._extract_basic_metadata(file_path), str(e))
+    
+    def _extract_h5ad_metadata(self, file_path: str) -> Dict[str, Any]:
+        """Extract AnnData dimensions and schema without loading the matrix"""
+        if not h5ad_summary.available():
+            logger.warning("h5py is not installed; skipping h5ad metadata extraction")
+            return mark_degraded(self._extract_basic_metadata(file_path), 'h5py is not installed')
+        try:
+            return h5ad_summary.summarize_h5ad(file_path)
+        except Exception as e:
+            logger.error(f"h5ad metadata extraction failed: {e}")
+            return mark_degraded(self._extract_basic_metadata(file_path), str(e))
     
     def _extract_pdf_metadata(self, file_path: str) -> Dict[str, Any]:
         """Extract simple metadata from PDF files"""
@@ -232,9 +320,11 @@ class MetadataExtractor:
                     
             except ImportError:
                 logger.warning("pypdf is not installed; skipping PDF text extraction")
+                mark_degraded(metadata, 'pypdf is not installed')
                 
         except Exception as e:
             logger.error(f"PDF metadata extraction failed: {e}")
+            mark_degraded(metadata, str(e))
         
         return metadata
     
@@ -242,7 +332,7 @@ class MetadataExtractor:
         """Extract metadata from CSV-like files"""
         metadata = {}
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            with open_text(file_path) as f:
                 # Read the first few lines to infer structure
                 lines = []
                 for i, line in enumerate(f):
@@ -274,6 +364,7 @@ class MetadataExtractor:
                     
         except Exception as e:
             logger.error(f"CSV metadata extraction failed: {e}")
+            mark_degraded(metadata, str(e))
         
         return metadata
     
@@ -281,7 +372,7 @@ class MetadataExtractor:
         """Extract simple stats from plain-text files"""
         metadata = {}
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            with open_text(file_path) as f:
                 content = f.read(5000)  # Read the first 5,000 characters
                 
                 lines = content.split('\n')
@@ -301,6 +392,7 @@ class MetadataExtractor:
                     
         except Exception as e:
             logger.error(f"Text metadata extraction failed: {e}")
+            mark_degraded(metadata, str(e))
         
         return metadata
     
@@ -340,20 +432,6 @@ class MetadataExtractor:
         
         return None
     
-    def _parse_vcf_headers(self, header_lines: list) -> Dict[str, Any]:
-        """Parse high-level VCF header information"""
-        info = {}
-        for line in header_lines[:20]:  # Process at most 20 header lines
-            if '=' in line:
-                if line.startswith('##fileformat='):
-                    info['file_format'] = line.split('=', 1)[1]
-                elif line.startswith('##reference='):
-                    info['reference'] = line.split('=', 1)[1]
-                elif line.startswith('##source='):
-                    info['source'] = line.split('=', 1)[1]
-        
-        return info
-    
     def _extract_keywords_from_text(self, text: str) -> list:
         """Extract a small set of bio-medical keywords from text"""
         # Common life-science keywords we scan for
@@ -377,9 +455,16 @@ class MetadataExtractor:
 
 
 # Convenience helper
-def extract_file_metadata(file_path: str, file_format: str) -> Dict[str, Any]:
+def extract_file_metadata(file_path: str, file_format: str, full_scan: Optional[bool] = None,
+                          index_path: Optional[str] = None) -> Dict[str, Any]:
     """
     Extract metadata for a file given its normalized format.
+
+    ``full_scan`` defaults to the ``METADATA_FULL_SCAN`` setting; ``index_path``
+    points alignment files at their uploaded index.
     """
-    extractor = MetadataExtractor()
+    if full_scan is None:
+        from django.conf import settings
+        full_scan = getattr(settings, 'METADATA_FULL_SCAN', False)
+    extractor = MetadataExtractor(full_scan=full_scan, index_path=index_path)
     return extractor.extract_metadata(file_path, file_format)
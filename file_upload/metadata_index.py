@@ -0,0 +1,130 @@
+"""
+Indexed side table for selected ``extracted_metadata`` fields.
+
+The keys below are copied out of the JSON blob into ``MetadataValue`` rows
+whenever a file is saved, so search can filter (``platform:Illumina``,
+``reads>1000000``) and sort on them with index range scans.
+"""
+
+import re
+from typing import Dict, List, Tuple, Union
+
+from django.db.models import FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import MetadataValue
+
+# Query alias -> (extracted_metadata key, value kind)
+INDEXED_METADATA = {
+    'reads': ('read_count', 'number'),
+    'read_length': ('average_read_length', 'number'),
+    'quality': ('average_quality', 'number'),
+    'bases': ('total_bases', 'number'),
+    'gc': ('gc_content', 'number'),
+    'platform': ('sequencing_platform', 'text'),
+    'sequences': ('sequence_count', 'number'),
+    'sequence_length': ('average_length', 'number'),
+    'total_length': ('total_length', 'number'),
+    'n50': ('n50', 'number'),
+    'variants': ('variant_count', 'number'),
+    'snvs': ('snv_count', 'number'),
+    'indels': ('indel_count', 'number'),
+    'tstv': ('ts_tv_ratio', 'number'),
+    'mapped': ('mapped_reads', 'number'),
+    'unmapped': ('unmapped_reads', 'number'),
+    'references': ('reference_count', 'number'),
+    'samples': ('sample_count', 'number'),
+    'cells': ('n_obs', 'number'),
+    'genes': ('n_vars', 'number'),
+    'columns': ('column_count', 'number'),
+    'rows': ('sample_rows', 'number'),
+    'pages': ('page_count', 'number'),
+    'lines': ('line_count', 'number'),
+}
+NUMERIC_KEYS = {alias for alias, (_key, kind) in INDEXED_METADATA.items() if kind == 'number'}
+
+COMPARISON_PATTERN = re.compile(r'(\w+)(>=|<=|>|<|=)([^\s]+)')
+COMPARISON_LOOKUPS = {'>': 'gt', '>=': 'gte', '<': 'lt', '<=': 'lte', '=': 'exact'}
+
+METADATA_SORT_PREFIX = 'meta_'
+# Files without a value sort after every real value in descending order
+MISSING_SORT_VALUE = -1e300
+
+Scalar = Union[str, float]
+
+
+def project_metadata(metadata) -> Dict[str, Scalar]:
+    """The indexed subset of an ``extracted_metadata`` dict, keyed by alias"""
+    values = {}
+    if not isinstance(metadata, dict):
+        return values
+    for alias, (key, kind) in INDEXED_METADATA.items():
+        raw = metadata.get(key)
+        if raw is None or isinstance(raw, (dict, list)):
+            continue
+        if kind == 'number':
+            try:
+                values[alias] = float(raw)
+            except (TypeError, ValueError):
+                continue
+        else:
+            text = str(raw).strip().lower()[:255]
+            if text:
+                values[alias] = text
+    return values
+
+
+def sync_metadata_values(file_obj, values: Dict[str, Scalar]):
+    """Replace the file's side-table rows with ``values``"""
+    MetadataValue.objects.filter(file=file_obj).delete()
+    MetadataValue.objects.bulk_create([
+        MetadataValue(
+            file=file_obj,
+            key=alias,
+            number_value=value if alias in NUMERIC_KEYS else None,
+            text_value=None if alias in NUMERIC_KEYS else value,
+        )
+        for alias, value in values.items()
+    ])
+
+
+def parse_comparisons(query: str) -> Tuple[List[Tuple[str, str, float]], str]:
+    """
+    Pull ``key>number`` style clauses for indexed numeric keys out of ``query``.
+
+    Returns the clauses and the query with them removed; anything that does
+    not name an indexed key or compare against a number is left in place.
+    """
+    clauses = []
+
+    def take(match):
+        alias, op, raw = match.groups()
+        if alias in NUMERIC_KEYS:
+            try:
+                clauses.append((alias, op, float(raw)))
+                return ' '
+            except ValueError:
+                pass
+        return match.group(0)
+
+    return clauses, COMPARISON_PATTERN.sub(take, query)
+
+
+def filter_by_comparison(queryset, alias: str, op: str, value: float):
+    lookup = COMPARISON_LOOKUPS[op]
+    return queryset.filter(
+        metadata_values__key=alias, **{f'metadata_values__number_value__{lookup}': value}
+    )
+
+
+def filter_by_text(queryset, alias: str, value: str):
+    return queryset.filter(metadata_values__key=alias, metadata_values__text_value=value.strip().lower())
+
+
+def annotate_sort(queryset, alias: str):
+    """Annotate ``meta_<alias>`` so keyset pagination can order by a numeric key"""
+    field = f'{METADATA_SORT_PREFIX}{alias}'
+    value = MetadataValue.objects.filter(file=OuterRef('pk'), key=alias).values('number_value')[:1]
+    return queryset.annotate(**{
+        field: Coalesce(Subquery(value), Value(MISSING_SORT_VALUE), output_field=FloatField())
+    })
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.14 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0003_alter_file_file_format_alter_file_upload_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileTombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Path relative to MEDIA_ROOT', max_length=1024)),
+                ('size', models.BigIntegerField(default=0)),
+                ('reason', models.CharField(choices=[('delete', 'Deleted'), ('orphan', 'Orphan')], default='delete', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+    ]
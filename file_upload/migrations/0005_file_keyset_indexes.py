@@ -0,0 +1,21 @@
+# Generated by Django 4.2.14 on 2026-10-19 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0004_filetombstone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['user', 'parent_folder', '-uploaded_at', '-id'], name='file_folder_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['user', '-uploaded_at', '-id'], name='file_user_uploaded_idx'),
+        ),
+    ]
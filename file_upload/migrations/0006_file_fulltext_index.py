@@ -0,0 +1,107 @@
+# Generated by Django 4.2.14 on 2026-10-19 11:20
+
+from django.db import migrations
+
+INDEXED_COLUMNS = ('title', 'tags', 'project', 'organism', 'original_filename', 'description', 'uploader')
+COLUMNS = ', '.join(INDEXED_COLUMNS)
+NEW_COLUMNS = ', '.join(f'new.{column}' for column in INDEXED_COLUMNS)
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS file_upload_file_fts USING fts5(
+        {COLUMNS},
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS file_upload_file_fts_ai AFTER INSERT ON file_upload_file BEGIN
+        INSERT INTO file_upload_file_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_COLUMNS});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS file_upload_file_fts_ad AFTER DELETE ON file_upload_file BEGIN
+        DELETE FROM file_upload_file_fts WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS file_upload_file_fts_au AFTER UPDATE OF {COLUMNS} ON file_upload_file BEGIN
+        DELETE FROM file_upload_file_fts WHERE rowid = old.id;
+        INSERT INTO file_upload_file_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_COLUMNS});
+    END
+    """,
+    f"""
+    INSERT INTO file_upload_file_fts(rowid, {COLUMNS}) SELECT id, {COLUMNS} FROM file_upload_file
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS file_upload_file_fts_au",
+    "DROP TRIGGER IF EXISTS file_upload_file_fts_ad",
+    "DROP TRIGGER IF EXISTS file_upload_file_fts_ai",
+    "DROP TABLE IF EXISTS file_upload_file_fts",
+]
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE file_upload_file ADD COLUMN search_document tsvector",
+    """
+    CREATE OR REPLACE FUNCTION file_upload_file_search_document() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_document :=
+            setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.tags, '') || ' ' || coalesce(NEW.project, '') || ' ' || coalesce(NEW.organism, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(NEW.original_filename, '')), 'C') ||
+            setweight(to_tsvector('simple', coalesce(NEW.description, '') || ' ' || coalesce(NEW.uploader, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE TRIGGER file_upload_file_search_document_trg
+        BEFORE INSERT OR UPDATE OF {COLUMNS} ON file_upload_file
+        FOR EACH ROW EXECUTE FUNCTION file_upload_file_search_document()
+    """,
+    # Fire the trigger once for existing rows
+    "UPDATE file_upload_file SET title = title",
+    "CREATE INDEX file_upload_file_search_document_gin ON file_upload_file USING GIN (search_document)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS file_upload_file_search_document_gin",
+    "DROP TRIGGER IF EXISTS file_upload_file_search_document_trg ON file_upload_file",
+    "DROP FUNCTION IF EXISTS file_upload_file_search_document()",
+    "ALTER TABLE file_upload_file DROP COLUMN IF EXISTS search_document",
+]
+
+
+def _run(schema_editor, by_vendor):
+    statements = by_vendor.get(schema_editor.connection.vendor)
+    if not statements:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def install_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                # Without FTS5 the search backend falls back to icontains
+                return
+    _run(schema_editor, {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+
+
+def remove_fulltext_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0005_file_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_fulltext_index, remove_fulltext_index),
+    ]
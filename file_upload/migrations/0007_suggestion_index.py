@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:29
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+FIELDS = ('project', 'organism', 'title')
+
+
+def _trigrams(value):
+    grams = set()
+    for word in value.lower().split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def backfill_suggestions(apps, schema_editor):
+    File = apps.get_model('file_upload', 'File')
+    SuggestionTerm = apps.get_model('file_upload', 'SuggestionTerm')
+    SuggestionTrigram = apps.get_model('file_upload', 'SuggestionTrigram')
+    for field in FIELDS:
+        rows = File.objects.exclude(**{field: ''}).values('user_id', field).annotate(count=Count('id'))
+        for row in rows:
+            value = row[field]
+            grams = _trigrams(value)
+            term = SuggestionTerm.objects.create(
+                user_id=row['user_id'], field=field, value=value,
+                normalized=' '.join(value.lower().split())[:500],
+                trigram_count=len(grams), file_count=row['count'],
+            )
+            SuggestionTrigram.objects.bulk_create(
+                [SuggestionTrigram(user_id=row['user_id'], term=term, trigram=gram) for gram in grams]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('file_upload', '0006_file_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestionTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('project', 'Project'), ('organism', 'Organism'), ('title', 'Title')], max_length=20)),
+                ('value', models.CharField(max_length=500)),
+                ('normalized', models.CharField(help_text='Lowercased value used for matching', max_length=500)),
+                ('trigram_count', models.IntegerField(default=0)),
+                ('file_count', models.IntegerField(default=0, help_text='Files currently carrying this value')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestion_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SuggestionTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='file_upload.suggestionterm')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'trigram'], name='suggestion_trigram_idx')],
+                'unique_together': {('term', 'trigram')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='suggestionterm',
+            index=models.Index(fields=['user', 'normalized'], name='suggestion_prefix_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='suggestionterm',
+            unique_together={('user', 'field', 'value')},
+        ),
+        migrations.RunPython(backfill_suggestions, migrations.RunPython.noop),
+    ]
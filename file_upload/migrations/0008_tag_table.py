@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_tags(apps, schema_editor):
+    File = apps.get_model('file_upload', 'File')
+    Tag = apps.get_model('file_upload', 'Tag')
+    tags = {}
+    for file_obj in File.objects.exclude(tags='').only('id', 'user_id', 'tags').iterator():
+        links = set()
+        for name in file_obj.tags.split(','):
+            name = name.strip()[:100]
+            if not name:
+                continue
+            key = (file_obj.user_id, name.lower())
+            if key not in tags:
+                tags[key] = Tag.objects.create(user_id=file_obj.user_id, name=name, key=name.lower())
+            links.add(tags[key].pk)
+        file_obj.tag_set.set(links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('file_upload', '0007_suggestion_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Tag')),
+                ('key', models.CharField(help_text='Lowercased name used for exact matching', max_length=100)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='file_tags', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['name'],
+                'unique_together': {('user', 'key')},
+            },
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='files', to='file_upload.tag'),
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
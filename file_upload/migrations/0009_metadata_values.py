@@ -0,0 +1,86 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copy of metadata_index.INDEXED_METADATA as of this migration; the
+# live mapping keeps changing and must not alter what this backfill writes
+INDEXED_METADATA = {
+    'reads': ('read_count', 'number'),
+    'read_length': ('average_read_length', 'number'),
+    'quality': ('average_quality', 'number'),
+    'platform': ('sequencing_platform', 'text'),
+    'sequences': ('sequence_count', 'number'),
+    'sequence_length': ('average_length', 'number'),
+    'variants': ('variant_count_sample', 'number'),
+    'samples': ('sample_count', 'number'),
+    'columns': ('column_count', 'number'),
+    'rows': ('sample_rows', 'number'),
+    'pages': ('page_count', 'number'),
+    'lines': ('line_count', 'number'),
+}
+NUMERIC_KEYS = {alias for alias, (_key, kind) in INDEXED_METADATA.items() if kind == 'number'}
+
+
+def project_metadata(metadata):
+    values = {}
+    if not isinstance(metadata, dict):
+        return values
+    for alias, (key, kind) in INDEXED_METADATA.items():
+        raw = metadata.get(key)
+        if raw is None or isinstance(raw, (dict, list)):
+            continue
+        if kind == 'number':
+            try:
+                values[alias] = float(raw)
+            except (TypeError, ValueError):
+                continue
+        else:
+            text = str(raw).strip().lower()[:255]
+            if text:
+                values[alias] = text
+    return values
+
+
+def backfill_metadata_values(apps, schema_editor):
+    File = apps.get_model('file_upload', 'File')
+    MetadataValue = apps.get_model('file_upload', 'MetadataValue')
+    rows = []
+    for file_id, metadata in File.objects.values_list('id', 'extracted_metadata').iterator():
+        for alias, value in project_metadata(metadata).items():
+            numeric = alias in NUMERIC_KEYS
+            rows.append(MetadataValue(
+                file_id=file_id, key=alias,
+                number_value=value if numeric else None,
+                text_value=None if numeric else value,
+            ))
+        if len(rows) >= 1000:
+            MetadataValue.objects.bulk_create(rows)
+            rows = []
+    MetadataValue.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0008_tag_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetadataValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50)),
+                ('text_value', models.CharField(blank=True, help_text='Lowercased for exact matching', max_length=255, null=True)),
+                ('number_value', models.FloatField(blank=True, null=True)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metadata_values', to='file_upload.file')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'number_value'], name='metadata_number_idx'), models.Index(fields=['key', 'text_value'], name='metadata_text_idx')],
+                'unique_together': {('file', 'key')},
+            },
+        ),
+        migrations.RunPython(backfill_metadata_values, migrations.RunPython.noop),
+    ]
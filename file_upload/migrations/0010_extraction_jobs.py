@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:35
+
+from django.db import migrations, models
+
+
+def mark_extracted_rows_done(apps, schema_editor):
+    File = apps.get_model('file_upload', 'File')
+    File.objects.exclude(extracted_metadata={}).update(extraction_status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0009_metadata_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='extraction_error',
+            field=models.TextField(blank=True, verbose_name='Extraction error'),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='extraction_finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='extraction_queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='extraction_status',
+            field=models.CharField(choices=[('idle', 'Not queued'), ('pending', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='idle', max_length=20, verbose_name='Extraction status'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['extraction_status', 'extraction_queued_at'], name='file_extraction_queue_idx'),
+        ),
+        migrations.RunPython(mark_extracted_rows_done, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0011_cram_format'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='file',
+            name='file_format',
+            field=models.CharField(choices=[('FASTQ', 'FASTQ'), ('FASTA', 'FASTA'), ('VCF', 'VCF'), ('BAM', 'BAM'), ('SAM', 'SAM'), ('CRAM', 'CRAM'), ('BED', 'BED'), ('GTF', 'GTF'), ('GFF', 'GFF'), ('PDF', 'PDF'), ('DOC', 'Word Document'), ('DOCX', 'Word Document'), ('PPT', 'PowerPoint'), ('PPTX', 'PowerPoint'), ('RTF', 'Rich Text Format'), ('CSV', 'CSV'), ('TSV', 'TSV'), ('XLS', 'Excel'), ('XLSX', 'Excel'), ('JSON', 'JSON'), ('XML', 'XML'), ('H5AD', 'AnnData (h5ad)'), ('YAML', 'YAML'), ('SQL', 'SQL'), ('py', 'Python'), ('ipynb', 'Jupyter Notebook'), ('R', 'R Script'), ('Rmd', 'R Markdown'), ('js', 'JavaScript'), ('html', 'HTML'), ('css', 'CSS'), ('java', 'Java'), ('cpp', 'C++'), ('c', 'C'), ('sh', 'Shell Script'), ('pl', 'Perl'), ('php', 'PHP'), ('rb', 'Ruby'), ('go', 'Go'), ('rs', 'Rust'), ('swift', 'Swift'), ('kt', 'Kotlin'), ('scala', 'Scala'), ('txt', 'Text'), ('md', 'Markdown'), ('log', 'Log File'), ('conf', 'Configuration'), ('ini', 'INI File'), ('cfg', 'Config File'), ('jpg', 'JPEG Image'), ('jpeg', 'JPEG Image'), ('png', 'PNG Image'), ('gif', 'GIF Image'), ('bmp', 'BMP Image'), ('tiff', 'TIFF Image'), ('svg', 'SVG Image'), ('webp', 'WebP Image'), ('ico', 'Icon'), ('mp3', 'MP3 Audio'), ('wav', 'WAV Audio'), ('flac', 'FLAC Audio'), ('aac', 'AAC Audio'), ('ogg', 'OGG Audio'), ('m4a', 'M4A Audio'), ('mp4', 'MP4 Video'), ('avi', 'AVI Video'), ('mov', 'MOV Video'), ('wmv', 'WMV Video'), ('flv', 'FLV Video'), ('mkv', 'MKV Video'), ('webm', 'WebM Video'), ('m4v', 'M4V Video'), ('zip', 'ZIP Archive'), ('rar', 'RAR Archive'), ('7z', '7-Zip Archive'), ('tar', 'TAR Archive'), ('gz', 'GZIP Archive'), ('bz2', 'BZIP2 Archive'), ('xz', 'XZ Archive'), ('other', 'Other')], default='other', max_length=20, verbose_name='File format'),
+        ),
+    ]
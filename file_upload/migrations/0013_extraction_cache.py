@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0012_h5ad_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='extractor_version',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.CreateModel(
+            name='ExtractionCacheEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checksum', models.CharField(max_length=64)),
+                ('extractor_version', models.CharField(max_length=40)),
+                ('metadata', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('checksum', 'extractor_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0013_extraction_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='contiguous_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='head_metadata',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+def reproject_variant_counts(apps, schema_editor):
+    """
+    ``variants`` used to hold ``variant_count_sample`` (records in the
+    sampled head) and now holds the whole-file ``variant_count``. Rows for
+    files extracted before the change are dropped rather than mixed in; they
+    come back once the file is re-extracted.
+    """
+    File = apps.get_model('file_upload', 'File')
+    MetadataValue = apps.get_model('file_upload', 'MetadataValue')
+    MetadataValue.objects.filter(key='variants').delete()
+    rows = []
+    for file_id, metadata in File.objects.values_list('id', 'extracted_metadata').iterator():
+        if not isinstance(metadata, dict) or isinstance(metadata.get('variant_count'), (dict, list)):
+            continue
+        try:
+            count = float(metadata['variant_count'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        rows.append(MetadataValue(file_id=file_id, key='variants', number_value=count))
+        if len(rows) >= 1000:
+            MetadataValue.objects.bulk_create(rows)
+            rows = []
+    MetadataValue.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0015_ncbi_import_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(reproject_variant_counts, migrations.RunPython.noop),
+    ]
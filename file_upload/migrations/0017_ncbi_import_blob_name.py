@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0016_reproject_variant_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ncbiimportjob',
+            name='blob_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
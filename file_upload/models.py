@@ -4,6 +4,8 @@ from django.core.exceptions import ValidationError
 import os
 import uuid
 
+from .compression import strip_compression_suffix
+
 User = get_user_model()
 
 # Create your models here.
@@ -21,6 +23,126 @@ def user_directory_path(instance, filename):
     return os.path.join("files", str(instance.user.id), filename)
 
 
+def detect_file_format(filename):
+    """Infer the file format from the extension, looking through .gz/.bgz/.zst"""
+    if not filename:
+        return 'other'
+
+    ext = strip_compression_suffix(filename.lower()).split('.')[-1]
+    format_mapping = {
+        # Bioinformatics formats
+        'fastq': 'FASTQ',
+        'fq': 'FASTQ',
+        'fasta': 'FASTA',
+        'fa': 'FASTA',
+        'vcf': 'VCF',
+        'bam': 'BAM',
+        'sam': 'SAM',
+        'cram': 'CRAM',
+        'bed': 'BED',
+        'gtf': 'GTF',
+        'gff': 'GFF',
+        
+        # Document formats
+        'pdf': 'PDF',
+        'doc': 'DOC',
+        'docx': 'DOCX',
+        'ppt': 'PPT',
+        'pptx': 'PPTX',
+        'rtf': 'RTF',
+        
+        # Data formats
+        'csv': 'CSV',
+        'tsv': 'TSV',
+        'xls': 'XLS',
+        'xlsx': 'XLSX',
+        'json': 'JSON',
+        'xml': 'XML',
+        'h5ad': 'H5AD',
+        'yaml': 'YAML',
+        'yml': 'YAML',
+        'sql': 'SQL',
+        
+        # Code formats
+        'py': 'py',
+        'ipynb': 'ipynb',
+        'r': 'R',
+        'rmd': 'Rmd',
+        'js': 'js',
+        'html': 'html',
+        'htm': 'html',
+        'css': 'css',
+        'java': 'java',
+        'cpp': 'cpp',
+        'cxx': 'cpp',
+        'cc': 'cpp',
+        'c': 'c',
+        'h': 'c',
+        'hpp': 'cpp',
+        'sh': 'sh',
+        'bash': 'sh',
+        'zsh': 'sh',
+        'pl': 'pl',
+        'php': 'php',
+        'rb': 'rb',
+        'go': 'go',
+        'rs': 'rs',
+        'swift': 'swift',
+        'kt': 'kt',
+        'scala': 'scala',
+        
+        # Text formats
+        'txt': 'txt',
+        'md': 'md',
+        'markdown': 'md',
+        'log': 'log',
+        'conf': 'conf',
+        'config': 'conf',
+        'ini': 'ini',
+        'cfg': 'cfg',
+        
+        # Image formats
+        'jpg': 'jpg',
+        'jpeg': 'jpeg',
+        'png': 'png',
+        'gif': 'gif',
+        'bmp': 'bmp',
+        'tiff': 'tiff',
+        'tif': 'tiff',
+        'svg': 'svg',
+        'webp': 'webp',
+        'ico': 'ico',
+        
+        # Audio formats
+        'mp3': 'mp3',
+        'wav': 'wav',
+        'flac': 'flac',
+        'aac': 'aac',
+        'ogg': 'ogg',
+        'm4a': 'm4a',
+        
+        # Video formats
+        'mp4': 'mp4',
+        'avi': 'avi',
+        'mov': 'mov',
+        'wmv': 'wmv',
+        'flv': 'flv',
+        'mkv': 'mkv',
+        'webm': 'webm',
+        'm4v': 'm4v',
+        
+        # Archive formats
+        'zip': 'zip',
+        'rar': 'rar',
+        '7z': '7z',
+        'tar': 'tar',
+        'gz': 'gz',
+        'bz2': 'bz2',
+        'xz': 'xz',
+    }
+    return format_mapping.get(ext, 'other')
+
+
 class Folder(models.Model):
     """Folder model with hierarchical relationships"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='folders')
@@ -67,6 +189,20 @@ class Folder(models.Model):
         return f"{self.get_path()} - {self.user.username}"
 
 
+class Tag(models.Model):
+    """Normalized tag; ``File.tags`` stays the editable comma-separated source"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='file_tags')
+    name = models.CharField(max_length=100, verbose_name="Tag")
+    key = models.CharField(max_length=100, help_text="Lowercased name used for exact matching")
+
+    class Meta:
+        ordering = ['name']
+        unique_together = ['user', 'key']
+
+    def __str__(self):
+        return self.name
+
+
 class File(models.Model):
     # Document type choices
     DOCUMENT_TYPE_CHOICES = [
@@ -84,6 +220,7 @@ class File(models.Model):
         ('VCF', 'VCF'),
         ('BAM', 'BAM'),
         ('SAM', 'SAM'),
+        ('CRAM', 'CRAM'),
         ('BED', 'BED'),
         ('GTF', 'GTF'),
         ('GFF', 'GFF'),
@@ -103,6 +240,7 @@ class File(models.Model):
         ('XLSX', 'Excel'),
         ('JSON', 'JSON'),
         ('XML', 'XML'),
+        ('H5AD', 'AnnData (h5ad)'),
         ('YAML', 'YAML'),
         ('SQL', 'SQL'),
         
@@ -203,6 +341,14 @@ class File(models.Model):
         ('pending', 'Pending'),
     ]
 
+    EXTRACTION_STATUS_CHOICES = [
+        ('idle', 'Not queued'),
+        ('pending', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
     # Core fields
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='files')
     file = models.FileField(upload_to=user_directory_path, null=True)
@@ -224,14 +370,24 @@ class File(models.Model):
     organism = models.CharField(max_length=200, blank=True, verbose_name="Organism", help_text="e.g., Homo sapiens")
     experiment_type = models.CharField(max_length=50, choices=EXPERIMENT_TYPE_CHOICES, blank=True, verbose_name="Assay type")
     tags = models.TextField(blank=True, verbose_name="Tags", help_text="Comma-separated tags")
+    # Kept in sync with ``tags`` on save (see tags.py) for indexed filtering and facets
+    tag_set = models.ManyToManyField(Tag, blank=True, related_name='files')
     description = models.TextField(blank=True, verbose_name="Description", help_text="Detailed notes")
     checksum = models.CharField(max_length=64, blank=True, verbose_name="Checksum", help_text="MD5 hash")
     qc_status = models.CharField(max_length=20, choices=QC_STATUS_CHOICES, default='unknown', verbose_name="QC status")
     
     # Automatically extracted metadata
     extracted_metadata = models.JSONField(default=dict, blank=True, verbose_name="Extracted metadata", help_text="Auto-generated insights")
+    # Background extraction job state; the pending rows are the queue (see extraction.py)
+    extraction_status = models.CharField(max_length=20, choices=EXTRACTION_STATUS_CHOICES, default='idle', verbose_name="Extraction status")
+    extraction_error = models.TextField(blank=True, verbose_name="Extraction error")
+    extraction_queued_at = models.DateTimeField(null=True, blank=True)
+    extraction_finished_at = models.DateTimeField(null=True, blank=True)
+    # metadata_extractor.extractor_version() of the code that produced extracted_metadata
+    extractor_version = models.CharField(max_length=40, blank=True)
     
-    # Full-text search field (tsvector in PostgreSQL; plain text in SQLite)
+    # Plain-text search document; the indexed engine (FTS5 table on SQLite, tsvector
+    # column on PostgreSQL) is maintained by triggers, see search_backend.py
     search_vector = models.TextField(blank=True, verbose_name="Search vector", help_text="Materialized text for search")
 
     def save(self, *args, **kwargs):
@@ -259,120 +415,7 @@ class File(models.Model):
     
     def _detect_file_format(self):
         """Infer the file format from the extension"""
-        if not self.original_filename:
-            return 'other'
-        
-        ext = self.original_filename.lower().split('.')[-1]
-        format_mapping = {
-            # Bioinformatics formats
-            'fastq': 'FASTQ',
-            'fq': 'FASTQ',
-            'fasta': 'FASTA',
-            'fa': 'FASTA',
-            'vcf': 'VCF',
-            'bam': 'BAM',
-            'sam': 'SAM',
-            'bed': 'BED',
-            'gtf': 'GTF',
-            'gff': 'GFF',
-            
-            # Document formats
-            'pdf': 'PDF',
-            'doc': 'DOC',
-            'docx': 'DOCX',
-            'ppt': 'PPT',
-            'pptx': 'PPTX',
-            'rtf': 'RTF',
-            
-            # Data formats
-            'csv': 'CSV',
-            'tsv': 'TSV',
-            'xls': 'XLS',
-            'xlsx': 'XLSX',
-            'json': 'JSON',
-            'xml': 'XML',
-            'yaml': 'YAML',
-            'yml': 'YAML',
-            'sql': 'SQL',
-            
-            # Code formats
-            'py': 'py',
-            'ipynb': 'ipynb',
-            'r': 'R',
-            'rmd': 'Rmd',
-            'js': 'js',
-            'html': 'html',
-            'htm': 'html',
-            'css': 'css',
-            'java': 'java',
-            'cpp': 'cpp',
-            'cxx': 'cpp',
-            'cc': 'cpp',
-            'c': 'c',
-            'h': 'c',
-            'hpp': 'cpp',
-            'sh': 'sh',
-            'bash': 'sh',
-            'zsh': 'sh',
-            'pl': 'pl',
-            'php': 'php',
-            'rb': 'rb',
-            'go': 'go',
-            'rs': 'rs',
-            'swift': 'swift',
-            'kt': 'kt',
-            'scala': 'scala',
-            
-            # Text formats
-            'txt': 'txt',
-            'md': 'md',
-            'markdown': 'md',
-            'log': 'log',
-            'conf': 'conf',
-            'config': 'conf',
-            'ini': 'ini',
-            'cfg': 'cfg',
-            
-            # Image formats
-            'jpg': 'jpg',
-            'jpeg': 'jpeg',
-            'png': 'png',
-            'gif': 'gif',
-            'bmp': 'bmp',
-            'tiff': 'tiff',
-            'tif': 'tiff',
-            'svg': 'svg',
-            'webp': 'webp',
-            'ico': 'ico',
-            
-            # Audio formats
-            'mp3': 'mp3',
-            'wav': 'wav',
-            'flac': 'flac',
-            'aac': 'aac',
-            'ogg': 'ogg',
-            'm4a': 'm4a',
-            
-            # Video formats
-            'mp4': 'mp4',
-            'avi': 'avi',
-            'mov': 'mov',
-            'wmv': 'wmv',
-            'flv': 'flv',
-            'mkv': 'mkv',
-            'webm': 'webm',
-            'm4v': 'm4v',
-            
-            # Archive formats
-            'zip': 'zip',
-            'rar': 'rar',
-            '7z': '7z',
-            'tar': 'tar',
-            'gz': 'gz',
-            'bz2': 'bz2',
-            'xz': 'xz',
-        }
-        return format_mapping.get(ext, 'other')
+        return detect_file_format(self.original_filename)
     
     def _calculate_checksum(self):
         """Calculate the file MD5 checksum"""
@@ -413,7 +456,15 @@ class File(models.Model):
     class Meta:
         ordering = ['-uploaded_at']
         # Do not allow duplicate file names within the same folder for a user
+        # (the unique index also serves keyset pages ordered by name)
         unique_together = ['user', 'parent_folder', 'original_filename']
+        indexes = [
+            # Keyset pagination on (uploaded_at, id) within a folder and across the catalogue
+            models.Index(fields=['user', 'parent_folder', '-uploaded_at', '-id'], name='file_folder_uploaded_idx'),
+            models.Index(fields=['user', '-uploaded_at', '-id'], name='file_user_uploaded_idx'),
+            # Extraction workers claim the oldest queued rows
+            models.Index(fields=['extraction_status', 'extraction_queued_at'], name='file_extraction_queue_idx'),
+        ]
 
 
 class UploadSession(models.Model):
@@ -429,6 +480,9 @@ class UploadSession(models.Model):
     total_size = models.BigIntegerField(default=0)
     chunk_size = models.IntegerField(default=2 * 1024 * 1024)  # 2 MB default chunks
     uploaded_size = models.BigIntegerField(default=0)
+    # Bytes received without gaps from offset 0; the head extractor starts once enough arrive
+    contiguous_size = models.BigIntegerField(default=0)
+    head_metadata = models.JSONField(default=dict, blank=True)
     temp_path = models.CharField(max_length=512)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     parent_folder = models.ForeignKey(Folder, on_delete=models.CASCADE, null=True, blank=True, related_name='upload_sessions')
@@ -436,3 +490,147 @@ class UploadSession(models.Model):
 
     def __str__(self):
         return f"Session {self.session_id} ({self.original_filename}) - {self.status}"
+
+
+class FileTombstone(models.Model):
+    """Physical blob queued for removal by the background reaper"""
+    REASON_CHOICES = (
+        ('delete', 'Deleted'),
+        ('orphan', 'Orphan'),
+    )
+
+    path = models.CharField(max_length=1024, help_text="Path relative to MEDIA_ROOT")
+    size = models.BigIntegerField(default=0)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default='delete')
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+
+    def __str__(self):
+        return f"Tombstone {self.path} ({self.reason})"
+
+
+class SuggestionTerm(models.Model):
+    """Distinct metadata value offered by search autocomplete"""
+    FIELD_CHOICES = (
+        ('project', 'Project'),
+        ('organism', 'Organism'),
+        ('title', 'Title'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='suggestion_terms')
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    value = models.CharField(max_length=500)
+    normalized = models.CharField(max_length=500, help_text="Lowercased value used for matching")
+    trigram_count = models.IntegerField(default=0)
+    file_count = models.IntegerField(default=0, help_text="Files currently carrying this value")
+
+    class Meta:
+        unique_together = ['user', 'field', 'value']
+        indexes = [
+            models.Index(fields=['user', 'normalized'], name='suggestion_prefix_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.field}: {self.value} ({self.file_count})"
+
+
+class SuggestionTrigram(models.Model):
+    """Trigram posting for a suggestion term; user is denormalized for the lookup index"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    term = models.ForeignKey(SuggestionTerm, on_delete=models.CASCADE, related_name='trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ['term', 'trigram']
+        indexes = [
+            models.Index(fields=['user', 'trigram'], name='suggestion_trigram_idx'),
+        ]
+
+
+class MetadataValue(models.Model):
+    """One promoted ``extracted_metadata`` field, indexed for filtering and sorting"""
+    file = models.ForeignKey(File, on_delete=models.CASCADE, related_name='metadata_values')
+    key = models.CharField(max_length=50)
+    text_value = models.CharField(max_length=255, null=True, blank=True, help_text="Lowercased for exact matching")
+    number_value = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['file', 'key']
+        indexes = [
+            models.Index(fields=['key', 'number_value'], name='metadata_number_idx'),
+            models.Index(fields=['key', 'text_value'], name='metadata_text_idx'),
+        ]
+
+    def __str__(self):
+        value = self.number_value if self.number_value is not None else self.text_value
+        return f"{self.key}={value}"
+
+
+class ExtractionCacheEntry(models.Model):
+    """Extraction result shared by every file with the same content and extractor version"""
+    checksum = models.CharField(max_length=64)
+    extractor_version = models.CharField(max_length=40)
+    metadata = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['checksum', 'extractor_version']
+
+    def __str__(self):
+        return f"{self.checksum} ({self.extractor_version})"
+
+
+class NcbiImportJob(models.Model):
+    """NCBI download run by the ``run_ncbi_imports`` worker; polled for progress by the client"""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    )
+    FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ncbi_import_jobs')
+    url = models.CharField(max_length=2048)
+    # parent_folder, project, access_level and tags to apply to the imported file
+    options = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    cancel_requested = models.BooleanField(default=False)
+    bytes_downloaded = models.BigIntegerField(default=0)
+    total_bytes = models.BigIntegerField(null=True, blank=True, help_text="Content-Length, when NCBI sends one")
+    error = models.TextField(blank=True)
+    # HTTP status the synchronous endpoint would have returned for this error
+    error_status = models.IntegerField(null=True, blank=True)
+    file = models.ForeignKey(File, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Storage name the running claim is writing to, so a requeue can reap the partial blob
+    blob_name = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set on every claim; workers only write to the job while it still matches theirs
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed with every progress write; a running job with an old heartbeat has lost its worker
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='ncbi_import_queue_idx'),
+        ]
+
+    def eta_seconds(self, now):
+        """Seconds left at the average rate so far, when the total size is known"""
+        if self.status != 'running' or not self.total_bytes or not self.started_at or not self.bytes_downloaded:
+            return None
+        elapsed = (now - self.started_at).total_seconds()
+        if elapsed <= 0:
+            return None
+        rate = self.bytes_downloaded / elapsed
+        return max(self.total_bytes - self.bytes_downloaded, 0) / rate
+
+    def __str__(self):
+        return f"NCBI import {self.url} ({self.status})"
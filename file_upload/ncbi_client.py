@@ -1,21 +1,41 @@
+import hashlib
 import os
 import re
 import tempfile
+import threading
+import time
 from dataclasses import dataclass
-from typing import Dict, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Tuple
 from urllib.parse import parse_qs, urlparse
 
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
+# Defaults for the NCBI_EUTILS_BASE and NCBI_SRA_FASTQ_URL settings, read per
+# request so tests can point them at a local stub server
 EUTILS_BASE = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
-EFETCH_URL = f"{EUTILS_BASE}/efetch.fcgi"
-ESUMMARY_URL = f"{EUTILS_BASE}/esummary.fcgi"
 SRA_FASTQ_URL = "https://trace.ncbi.nlm.nih.gov/Traces/sra-reads-be/fastq"
+NCBI_WEB_BASE = "https://www.ncbi.nlm.nih.gov"
 
 DEFAULT_MAX_BYTES = getattr(settings, "NCBI_MAX_DOWNLOAD_BYTES", 1024 * 1024 * 1024)  # 1 GiB
 DEFAULT_TIMEOUT = getattr(settings, "NCBI_HTTP_TIMEOUT", 120)
+DOWNLOAD_CHUNK_BYTES = getattr(settings, "NCBI_DOWNLOAD_CHUNK_BYTES", 1024 * 1024)
+ESUMMARY_BATCH = getattr(settings, "NCBI_ESUMMARY_BATCH", 200)
+# Throttled and failed answers are retried in _get, each attempt taking a rate-limiter token
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.5
+MAX_RETRY_AFTER_SECONDS = 60
+
+# Accessions named inside SRA summaries (runs and expxml hold XML fragments)
+SRA_ACCESSION_ATTR = re.compile(r'\bacc="([^"]+)"')
+
+# progress(bytes_downloaded, total_bytes_or_None)
+ProgressCallback = Callable[[int, Optional[int]], None]
 
 
 class NCBIDownloadError(Exception):
@@ -35,6 +55,8 @@ class NCBIDownloadResult:
   file_format: str
   document_type: str
   metadata: Dict[str, object]
+  size: int = 0
+  checksum: str = ""
 
 
 RESOURCE_MAP: Dict[str, Dict[str, str]] = {
@@ -57,7 +79,12 @@ ACCESSION_PREFIX_MAP = {
   "SAM": "biosample",
   "GSE": "pubmed",  # fallback to summary text
   "GSM": "pubmed",
+  "NP_": "protein",
+  "XP_": "protein",
+  "YP_": "protein",
+  "WP_": "protein",
 }
+ACCESSION_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9_.-]*$")
 
 FORMAT_MAP = {
   "fasta": "FASTA",
@@ -119,45 +146,200 @@ def parse_ncbi_url(url: str) -> Tuple[str, str]:
   return resource, accession
 
 
-def _download_streaming(url: str, params: Optional[Dict[str, str]], suffix: str, max_bytes: int) -> Tuple[str, int, Dict[str, str]]:
-  with requests.get(url, params=params, stream=True, timeout=DEFAULT_TIMEOUT) as resp:
+def ncbi_item_url(item: str) -> str:
+  """
+  Normalise a batch entry, either an NCBI link or a bare accession, to a
+  link ``parse_ncbi_url`` accepts. Accessions without a known prefix are
+  looked up in nuccore. Raises NCBIDownloadError for anything else.
+  """
+  item = (item or "").strip()
+  if "://" in item:
+    parse_ncbi_url(item)
+    return item
+  if not ACCESSION_PATTERN.match(item):
+    raise NCBIDownloadError(f"Not an NCBI link or accession: {item!r}")
+  resource = next(
+    (mapped for prefix, mapped in ACCESSION_PREFIX_MAP.items() if item.upper().startswith(prefix)), "nuccore"
+  )
+  return f"{NCBI_WEB_BASE}/{resource}/{item}"
+
+
+def import_filename(url: str) -> str:
+  """Name an import of ``url`` is stored under, ``<accession>.<ext>``"""
+  resource, accession = parse_ncbi_url(url)
+  config = RESOURCE_MAP.get(resource)
+  if not config:
+    raise NCBIDownloadError(f"Unsupported NCBI resource type: {resource}")
+  return f"{accession}.{config.get('ext', 'txt')}"
+
+
+def summary_target(url: str) -> Tuple[str, str]:
+  """(esummary db, accession) for an NCBI link"""
+  resource, accession = parse_ncbi_url(url)
+  config = RESOURCE_MAP.get(resource)
+  if not config:
+    raise NCBIDownloadError(f"Unsupported NCBI resource type: {resource}")
+  return ("sra" if config.get("strategy") == "sra_fastq" else config["db"]), accession
+
+
+class TokenBucket:
+  """
+  Blocking token bucket shared by every thread of the process. ``capacity``
+  is the burst allowed after an idle spell; NCBI counts requests per
+  second, so the default of one spaces requests evenly.
+  """
+
+  def __init__(self, rate: float, capacity: float = 1, clock=time.monotonic, sleep=time.sleep):
+    self.rate = rate
+    self.capacity = capacity
+    self.tokens = capacity
+    self.clock = clock
+    self.sleep = sleep
+    self.updated = clock()
+    self._lock = threading.Lock()
+
+  def acquire(self) -> None:
+    # Take the token now, possibly going into debt, then sleep the debt off
+    # outside the lock; waiting threads are served in arrival order
+    with self._lock:
+      now = self.clock()
+      self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate) - 1
+      self.updated = now
+      wait = -self.tokens / self.rate if self.tokens < 0 else 0
+    if wait:
+      self.sleep(wait)
+
+
+_session: Optional[requests.Session] = None
+_limiters: Dict[float, TokenBucket] = {}
+_client_lock = threading.Lock()
+
+
+def request_rate() -> float:
+  """Requests per second allowed by NCBI: 3, or 10 with an API key, unless NCBI_REQUESTS_PER_SECOND is set"""
+  configured = getattr(settings, "NCBI_REQUESTS_PER_SECOND", 0)
+  if configured:
+    return float(configured)
+  return 10.0 if getattr(settings, "NCBI_API_KEY", "") else 3.0
+
+
+def rate_limiter() -> TokenBucket:
+  rate = request_rate()
+  with _client_lock:
+    if rate not in _limiters:
+      _limiters[rate] = TokenBucket(rate)
+    return _limiters[rate]
+
+
+def get_session() -> requests.Session:
+  """
+  Process-wide session, so downloads reuse TCP/TLS connections. The pool
+  holds one connection per import worker. The adapter only retries failed
+  connects, which never reach NCBI; 429 and 5xx answers are retried by
+  ``_get`` so every attempt passes the rate limiter.
+  """
+  global _session
+  with _client_lock:
+    if _session is None:
+      session = requests.Session()
+      workers = max(getattr(settings, "NCBI_IMPORT_WORKERS", 4), 1)
+      retry = Retry(total=MAX_RETRIES, connect=MAX_RETRIES, read=0, status=0, other=0,
+                    backoff_factor=RETRY_BACKOFF_SECONDS)
+      adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers, max_retries=retry)
+      session.mount("https://", adapter)
+      session.mount("http://", adapter)
+      _session = session
+    return _session
+
+
+def _eutils_url(endpoint: str) -> str:
+  return f"{getattr(settings, 'NCBI_EUTILS_BASE', EUTILS_BASE).rstrip('/')}/{endpoint}"
+
+
+def _retry_delay(resp: requests.Response, attempt: int) -> float:
+  """Seconds to wait before retrying: Retry-After (seconds or HTTP date) when given, else exponential backoff"""
+  retry_after = resp.headers.get("Retry-After", "").strip()
+  delay = RETRY_BACKOFF_SECONDS * (2 ** attempt)
+  if retry_after.isdigit():
+    delay = float(retry_after)
+  elif retry_after:
+    try:
+      delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+    except (TypeError, ValueError):
+      pass
+  return min(max(delay, 0.0), MAX_RETRY_AFTER_SECONDS)
+
+
+def _get(url: str, params: Optional[Dict[str, str]] = None, stream: bool = False) -> requests.Response:
+  """
+  GET through the shared session once the rate limiter allows it; E-utilities
+  calls carry tool/email/api_key. 429 and 5xx answers are retried up to
+  ``MAX_RETRIES`` times, and each retry waits for its own token.
+  """
+  params = dict(params or {})
+  if url.startswith(_eutils_url("")):
+    identity = {
+      "tool": getattr(settings, "NCBI_TOOL", ""),
+      "email": getattr(settings, "NCBI_EMAIL", ""),
+      "api_key": getattr(settings, "NCBI_API_KEY", ""),
+    }
+    params.update({key: value for key, value in identity.items() if value})
+  for attempt in range(MAX_RETRIES + 1):
+    rate_limiter().acquire()
+    resp = get_session().get(url, params=params, stream=stream, timeout=DEFAULT_TIMEOUT)
+    if resp.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+      return resp
+    resp.close()
+    time.sleep(_retry_delay(resp, attempt))
+
+
+def _default_destination(filename: str) -> str:
+  handle, file_path = tempfile.mkstemp(suffix=f"_{filename}")
+  os.close(handle)
+  return file_path
+
+
+def _download_streaming(url: str, params: Optional[Dict[str, str]], filename: str, max_bytes: int,
+                        destination: Callable[[str], str],
+                        progress: Optional[ProgressCallback] = None) -> Tuple[str, int, str, Dict[str, str]]:
+  """
+  Stream the response into ``destination(filename)``, hashing (MD5) and
+  counting bytes in the same pass. ``progress(downloaded, total)`` runs
+  after every chunk; an exception it raises aborts the download and
+  removes the partial file. Returns (path, size, checksum, headers).
+  """
+  with _get(url, params=params, stream=True) as resp:
     if resp.status_code != 200:
       raise NCBIDownloadError(f"NCBI returned HTTP {resp.status_code}")
     total_bytes = 0
+    digest = hashlib.md5()
     headers = resp.headers
     content_length = headers.get("Content-Length")
     if content_length and int(content_length) > max_bytes:
       raise NCBIDownloadTooLarge(f"Content length {content_length} exceeds limit {max_bytes}")
-
-    handle, file_path = tempfile.mkstemp(suffix=f".{suffix}")
-    with os.fdopen(handle, "wb") as tmp:
-      for chunk in resp.iter_content(chunk_size=8192):
-        if not chunk:
-          continue
-        total_bytes += len(chunk)
-        if total_bytes > max_bytes:
-          tmp.close()
-          os.remove(file_path)
-          raise NCBIDownloadTooLarge(f"Download size exceeds limit {max_bytes} bytes")
-        tmp.write(chunk)
-    return file_path, total_bytes, headers
-
-
-def _fetch_summary(db: str, accession: str) -> Dict[str, object]:
-  params = {"db": db, "id": accession, "retmode": "json"}
-  try:
-    resp = requests.get(ESUMMARY_URL, params=params, timeout=DEFAULT_TIMEOUT)
-    resp.raise_for_status()
-    data = resp.json()
-  except Exception:
-    return {}
-
-  result = data.get("result", {})
-  uid = (result.get("uids") or [None])[0]
-  if not uid:
-    return {}
-
-  summary = result.get(uid, {})
+    expected = int(content_length) if content_length else None
+
+    file_path = destination(filename)
+    try:
+      with open(file_path, "wb") as target:
+        for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+          if not chunk:
+            continue
+          total_bytes += len(chunk)
+          if total_bytes > max_bytes:
+            raise NCBIDownloadTooLarge(f"Download size exceeds limit {max_bytes} bytes")
+          digest.update(chunk)
+          target.write(chunk)
+          if progress is not None:
+            progress(total_bytes, expected)
+    except BaseException:
+      if os.path.exists(file_path):
+        os.remove(file_path)
+      raise
+    return file_path, total_bytes, digest.hexdigest(), headers
+
+
+def _summary_metadata(summary: Dict[str, object]) -> Dict[str, object]:
   metadata = {
     "title": summary.get("title") or summary.get("extra", ""),
     "organism": summary.get("organism") or summary.get("taxname"),
@@ -170,6 +352,47 @@ def _fetch_summary(db: str, accession: str) -> Dict[str, object]:
   return {k: v for k, v in metadata.items() if v}
 
 
+def fetch_summaries(db: str, accessions: List[str]) -> Dict[str, Dict[str, object]]:
+  """
+  Metadata for many accessions of one database, ``ESUMMARY_BATCH`` IDs per
+  esummary call. Summaries are matched back by UID, accession, caption or,
+  for SRA, the run and experiment accessions they list. esummary does not
+  keep request order, so response order is only trusted for a lone ID.
+  Accessions that match no summary are left out; request errors propagate.
+  """
+  found: Dict[str, Dict[str, object]] = {}
+  for start in range(0, len(accessions), ESUMMARY_BATCH):
+    batch = accessions[start:start + ESUMMARY_BATCH]
+    resp = _get(_eutils_url("esummary.fcgi"), {"db": db, "id": ",".join(batch), "retmode": "json"})
+    resp.raise_for_status()
+    result = resp.json().get("result", {})
+    uids = result.get("uids") or []
+    by_key = {}
+    for uid in uids:
+      summary = result.get(uid) or {}
+      keys = [uid, summary.get("accessionversion"), summary.get("caption")]
+      for field in ("runs", "expxml"):
+        if isinstance(summary.get(field), str):
+          keys += SRA_ACCESSION_ATTR.findall(summary[field])
+      for key in keys:
+        if key:
+          by_key[str(key)] = summary
+    for accession in batch:
+      summary = by_key.get(accession) or by_key.get(accession.split(".")[0])
+      if summary is None and len(batch) == 1 and len(uids) == 1:
+        summary = result.get(uids[0])
+      if summary:
+        found[accession] = _summary_metadata(summary)
+  return found
+
+
+def _fetch_summary(db: str, accession: str) -> Dict[str, object]:
+  try:
+    return fetch_summaries(db, [accession]).get(accession, {})
+  except Exception:
+    return {}
+
+
 def _normalize_file_format(extension: str) -> str:
   extension = extension.lower()
   if extension in FORMAT_MAP:
@@ -177,7 +400,18 @@ def _normalize_file_format(extension: str) -> str:
   return "other"
 
 
-def download_ncbi_resource(url: str, max_bytes: Optional[int] = None) -> NCBIDownloadResult:
+def download_ncbi_resource(url: str, max_bytes: Optional[int] = None,
+                           destination: Optional[Callable[[str], str]] = None,
+                           progress: Optional[ProgressCallback] = None,
+                           summary: Optional[Dict[str, object]] = None) -> NCBIDownloadResult:
+  """
+  Download an NCBI resource. ``destination`` maps the provisional file name
+  (``<accession>.<ext>``) to the path the body is written to, so callers can
+  stream straight into final storage; a temporary file is used otherwise.
+  ``progress`` is passed through to ``_download_streaming``. ``summary``
+  is metadata already fetched with ``fetch_summaries``; esummary is called
+  for this accession alone otherwise.
+  """
   resource, accession = parse_ncbi_url(url)
   config = RESOURCE_MAP.get(resource)
 
@@ -185,20 +419,23 @@ def download_ncbi_resource(url: str, max_bytes: Optional[int] = None) -> NCBIDow
     raise NCBIDownloadError(f"Unsupported NCBI resource type: {resource}")
 
   max_allowed = max_bytes or DEFAULT_MAX_BYTES
+  destination = destination or _default_destination
   strategy = config.get("strategy")
 
   if strategy == "sra_fastq":
     suffix = config["ext"]
     params = {"acc": accession}
-    file_path, total_bytes, headers = _download_streaming(SRA_FASTQ_URL, params=params, suffix=suffix, max_bytes=max_allowed)
+    filename = f"{accession}.{suffix}"
+    file_path, total_bytes, checksum, headers = _download_streaming(
+      getattr(settings, "NCBI_SRA_FASTQ_URL", SRA_FASTQ_URL), params=params, filename=filename, max_bytes=max_allowed, destination=destination,
+      progress=progress)
     file_format = _normalize_file_format(suffix)
-    metadata = _fetch_summary("sra", accession)
+    metadata = dict(summary) if summary is not None else _fetch_summary("sra", accession)
     metadata.update({
       "ncbi_db": "sra",
       "download_bytes": total_bytes,
       "source_url": url,
     })
-    filename = f"{accession}.{suffix}"
     return NCBIDownloadResult(
       accession=accession,
       db="sra",
@@ -207,6 +444,8 @@ def download_ncbi_resource(url: str, max_bytes: Optional[int] = None) -> NCBIDow
       file_format=file_format,
       document_type=config.get("document_type", "Dataset"),
       metadata=metadata,
+      size=total_bytes,
+      checksum=checksum,
     )
 
   db = config["db"]
@@ -219,9 +458,11 @@ def download_ncbi_resource(url: str, max_bytes: Optional[int] = None) -> NCBIDow
   suffix = config.get("ext", "txt")
   params = {k: v for k, v in params.items() if v}
 
-  file_path, total_bytes, headers = _download_streaming(EFETCH_URL, params=params, suffix=suffix, max_bytes=max_allowed)
+  file_path, total_bytes, checksum, headers = _download_streaming(
+    _eutils_url("efetch.fcgi"), params=params, filename=f"{accession}.{suffix}", max_bytes=max_allowed, destination=destination,
+    progress=progress)
   file_format = _normalize_file_format(suffix)
-  metadata = _fetch_summary(db, accession)
+  metadata = dict(summary) if summary is not None else _fetch_summary(db, accession)
   metadata.update({
     "ncbi_db": db,
     "download_bytes": total_bytes,
@@ -246,4 +487,6 @@ def download_ncbi_resource(url: str, max_bytes: Optional[int] = None) -> NCBIDow
     file_format=file_format,
     document_type=config.get("document_type", "Dataset"),
     metadata=metadata,
+    size=total_bytes,
+    checksum=checksum,
   )
@@ -0,0 +1,321 @@
+"""
+Background NCBI imports.
+
+``ncbi_import`` only records an ``NcbiImportJob``; the ``run_ncbi_imports``
+worker claims queued jobs, streams each download into storage and writes
+progress to the row at most every ``NCBI_IMPORT_PROGRESS_SECONDS``. The
+same conditional UPDATE is how a running download notices it was cancelled.
+Every write is also fenced on the claim (``status='running'`` and the
+``started_at`` the worker claimed with), so a download whose job was
+requeued behind its back stops instead of racing the new claim.
+Metadata for claimed and upcoming jobs is fetched ahead in multi-ID
+esummary calls, so a batch of N accessions costs N downloads plus a few
+summaries rather than 2N requests against NCBI's rate limit.
+"""
+
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import File, Folder, NcbiImportJob, user_directory_path
+from .reaper import record_tombstone
+from .ncbi_client import (
+    NCBIDownloadError, NCBIDownloadResult, NCBIDownloadTooLarge, download_ncbi_resource, fetch_summaries,
+    import_filename, ncbi_item_url, summary_target,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ImportCancelled(Exception):
+    """Raised from the progress callback once a job's cancellation is seen"""
+
+
+class ImportClaimLost(Exception):
+    """Raised once the job was requeued or finished by someone else while downloading"""
+
+
+def submit_import(user, url: str, options: dict) -> NcbiImportJob:
+    return NcbiImportJob.objects.create(user=user, url=url, options=options)
+
+
+def taken_targets(user, parent_folder_id: Optional[int], names: Iterable[str]) -> Set[str]:
+    """
+    The ``names`` already used in the folder by a file or by an unfinished
+    import; importing them again would download the data and then fail on
+    the folder's unique file names.
+    """
+    names = set(names)
+    taken = set(
+        File.objects.filter(user=user, parent_folder_id=parent_folder_id, original_filename__in=names)
+        .values_list('original_filename', flat=True)
+    )
+    active = NcbiImportJob.objects.filter(user=user, status__in=('queued', 'running')).values_list('url', 'options')
+    for url, options in active:
+        if (options or {}).get('parent_folder') != parent_folder_id:
+            continue
+        try:
+            name = import_filename(url)
+        except NCBIDownloadError:
+            continue
+        if name in names:
+            taken.add(name)
+    return taken
+
+
+def submit_batch(user, items: Iterable[str], options: dict) -> Tuple[List[NcbiImportJob], List[Dict[str, str]]]:
+    """
+    One job per valid link or accession, in order; the rest come back as
+    ``{item, message}`` errors. Repeated items and targets that already
+    exist in the folder are reported rather than queued.
+    """
+    candidates, errors, seen = [], [], set()
+    for item in items:
+        try:
+            url = ncbi_item_url(str(item))
+            name = import_filename(url)
+        except NCBIDownloadError as exc:
+            errors.append({'item': str(item), 'message': str(exc)})
+            continue
+        if name in seen:
+            errors.append({'item': str(item), 'message': f'{name} is already in this batch'})
+            continue
+        seen.add(name)
+        candidates.append((item, url, name))
+
+    taken = taken_targets(user, options.get('parent_folder'), seen)
+    jobs = []
+    for item, url, name in candidates:
+        if name in taken:
+            errors.append({'item': str(item), 'message': f'{name} already exists in the target folder'})
+            continue
+        jobs.append(NcbiImportJob(user=user, url=url, options=dict(options)))
+    return NcbiImportJob.objects.bulk_create(jobs), errors
+
+
+def cancel_import(job: NcbiImportJob) -> bool:
+    """Cancel a queued job outright or flag a running one; False if it already finished"""
+    now = timezone.now()
+    if NcbiImportJob.objects.filter(pk=job.pk, status='queued').update(
+            status='cancelled', cancel_requested=True, finished_at=now):
+        return True
+    return bool(NcbiImportJob.objects.filter(pk=job.pk, status='running').update(cancel_requested=True))
+
+
+def requeue_stale_imports(timeout_seconds=None, exclude_ids: Iterable[int] = ()) -> int:
+    """
+    Return jobs whose worker stopped reporting progress to the queue; they
+    restart from zero. ``exclude_ids`` are jobs the caller is still running
+    itself. The partial blob of each requeued job is queued for the reaper.
+    """
+    if timeout_seconds is None:
+        timeout_seconds = getattr(settings, 'NCBI_IMPORT_JOB_TIMEOUT_SECONDS', 300)
+    cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+    stale = (
+        NcbiImportJob.objects.filter(status='running', heartbeat_at__lt=cutoff)
+        .exclude(pk__in=list(exclude_ids))
+        .values_list('id', 'started_at', 'blob_name')
+    )
+    requeued = 0
+    for job_id, claimed_at, blob_name in stale:
+        if not NcbiImportJob.objects.filter(
+                pk=job_id, status='running', started_at=claimed_at, heartbeat_at__lt=cutoff).update(
+                status='queued', bytes_downloaded=0, blob_name=''):
+            continue
+        requeued += 1
+        if blob_name and not File.objects.filter(file=blob_name).exists():
+            record_tombstone(blob_name, reason='orphan')
+    return requeued
+
+
+def claim_import_jobs(limit: int) -> List[int]:
+    """Atomically move up to ``limit`` of the oldest queued jobs to running"""
+    candidates = (
+        NcbiImportJob.objects.filter(status='queued')
+        .order_by('created_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in candidates:
+        now = timezone.now()
+        with transaction.atomic():
+            taken = NcbiImportJob.objects.filter(pk=job_id, status='queued').update(
+                status='running', started_at=now, heartbeat_at=now
+            )
+        if taken:
+            claimed.append(job_id)
+    return claimed
+
+
+def prefetch_summaries(job_ids: List[int], lookahead: Optional[int] = None) -> int:
+    """
+    Store esummary metadata in ``options['summary']`` for the given jobs and
+    the next ``lookahead`` queued ones, one multi-ID call per database. Jobs
+    whose accession matched no summary get ``None`` so they are not batched
+    again and fetch their own at download time, as they do if the call fails.
+    """
+    if lookahead is None:
+        lookahead = getattr(settings, 'NCBI_ESUMMARY_BATCH', 200)
+    jobs = list(NcbiImportJob.objects.filter(pk__in=job_ids).order_by('created_at', 'id'))
+    jobs += NcbiImportJob.objects.filter(status='queued').exclude(pk__in=job_ids).order_by('created_at', 'id')[:lookahead]
+    pending: Dict[str, Dict[str, List[NcbiImportJob]]] = {}
+    for job in jobs:
+        if 'summary' in job.options:
+            continue
+        try:
+            db, accession = summary_target(job.url)
+        except NCBIDownloadError:
+            continue
+        pending.setdefault(db, {}).setdefault(accession, []).append(job)
+
+    stored = 0
+    for db, by_accession in pending.items():
+        try:
+            summaries = fetch_summaries(db, list(by_accession))
+        except (requests.RequestException, ValueError) as exc:
+            logger.warning("Batched esummary for %s failed: %s", db, exc)
+            continue
+        for accession, accession_jobs in by_accession.items():
+            for job in accession_jobs:
+                options = dict(job.options, summary=summaries.get(accession))
+                stored += NcbiImportJob.objects.filter(pk=job.pk).update(options=options)
+    return stored
+
+
+def _tag_string(db: str, raw_tags) -> str:
+    user_tags = []
+    if isinstance(raw_tags, list):
+        user_tags = [str(tag).strip() for tag in raw_tags if str(tag).strip()]
+    elif isinstance(raw_tags, str):
+        user_tags = [tag.strip() for tag in raw_tags.split(',') if tag.strip()]
+    combined_tags = []
+    for tag in ['NCBI', db.upper()] + user_tags:
+        if tag and tag not in combined_tags:
+            combined_tags.append(tag)
+    return ','.join(combined_tags)
+
+
+def create_imported_file(user, result: NCBIDownloadResult, storage_name: str, options: dict,
+                         parent_folder: Optional[Folder]) -> File:
+    """Register a download already written to ``storage_name``; a single INSERT, no copy or re-read"""
+    metadata = result.metadata or {}
+    description = metadata.get('title') or metadata.get('extra') or ''
+    if metadata.get('summary'):
+        description = f"{description}\n{metadata['summary']}".strip()
+    return File.objects.create(
+        user=user,
+        file=storage_name,
+        upload_method='NCBI Import',
+        parent_folder=parent_folder,
+        title=metadata.get('title') or result.filename,
+        project=options.get('project') or 'NCBI Import',
+        original_filename=result.filename,
+        file_format=result.file_format,
+        document_type=result.document_type,
+        access_level=options.get('access_level') or 'Internal',
+        organism=metadata.get('organism') or '',
+        experiment_type=metadata.get('experiment_type') or '',
+        tags=_tag_string(result.db, options.get('tags')),
+        description=description,
+        checksum=result.checksum,
+        extracted_metadata=metadata,
+    )
+
+
+def _claimed(job: NcbiImportJob):
+    return NcbiImportJob.objects.filter(pk=job.pk, status='running', started_at=job.started_at)
+
+
+def _finish(job: NcbiImportJob, status: str, error: str = '', error_status: Optional[int] = None, **fields) -> bool:
+    """Record the outcome; False if the claim was lost and the job now belongs to someone else"""
+    now = timezone.now()
+    return bool(_claimed(job).update(
+        status=status, error=error[:2000], error_status=error_status, finished_at=now, heartbeat_at=now, **fields
+    ))
+
+
+def run_import_job(job_id: int) -> str:
+    """
+    Download one claimed job into storage and record the outcome; returns
+    the final status, or ``'lost'`` if the job was requeued meanwhile.
+    """
+    job = NcbiImportJob.objects.select_related('user').get(pk=job_id)
+    interval = getattr(settings, 'NCBI_IMPORT_PROGRESS_SECONDS', 1.0)
+    last_write = [float('-inf')]
+
+    def progress(downloaded, total):
+        now = time.monotonic()
+        if now - last_write[0] < interval and downloaded != total:
+            return
+        last_write[0] = now
+        updated = _claimed(job).filter(cancel_requested=False).update(
+            bytes_downloaded=downloaded, total_bytes=total, heartbeat_at=timezone.now()
+        )
+        if not updated:
+            raise ImportCancelled() if _claimed(job).exists() else ImportClaimLost()
+
+    storage_names = []
+
+    def destination(filename):
+        # Stream straight into the blob's final location rather than a temp file copied later
+        name = user_directory_path(File(user=job.user), filename)
+        if not _claimed(job).update(blob_name=name, heartbeat_at=timezone.now()):
+            raise ImportClaimLost()
+        storage_names.append(name)
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def finish(status, error='', error_status=None, **fields):
+        return status if _finish(job, status, error, error_status, **fields) else 'lost'
+
+    folder_id = job.options.get('parent_folder')
+    parent_folder = None
+    if folder_id is not None:
+        parent_folder = Folder.objects.filter(id=folder_id, user=job.user).first()
+        if parent_folder is None:
+            return finish('failed', 'Folder not found or not accessible', 404)
+
+    try:
+        result = download_ncbi_resource(job.url, destination=destination, progress=progress,
+                                        summary=job.options.get('summary'))
+    except ImportClaimLost:
+        # The partial blob is already gone; the new claim owns the job row
+        return 'lost'
+    except ImportCancelled:
+        return finish('cancelled')
+    except NCBIDownloadTooLarge as exc:
+        return finish('failed', str(exc), 413)
+    except NCBIDownloadError as exc:
+        return finish('failed', str(exc), 400)
+    except requests.RequestException as exc:
+        logger.exception("NCBI request failed: %s", exc)
+        return finish('failed', f'Unable to reach NCBI: {exc}', 502)
+    except Exception as exc:
+        logger.exception("Unexpected NCBI import failure: %s", exc)
+        return finish('failed', f'Download failed: {exc}', 500)
+
+    try:
+        with transaction.atomic():
+            file_obj = create_imported_file(job.user, result, storage_names[-1], job.options, parent_folder)
+            if not _finish(job, 'done', file=file_obj, bytes_downloaded=result.size):
+                raise ImportClaimLost()
+    except ImportClaimLost:
+        # Requeued between the last chunk and here: keep neither the row nor the blob
+        if os.path.exists(result.file_path):
+            os.remove(result.file_path)
+        return 'lost'
+    except Exception as exc:
+        logger.exception("Storing NCBI import %s failed: %s", job_id, exc)
+        if os.path.exists(result.file_path):
+            os.remove(result.file_path)
+        return finish('failed', f'Download failed: {exc}', 500)
+    return 'done'
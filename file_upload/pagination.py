@@ -0,0 +1,112 @@
+"""
+Keyset (cursor) pagination for file listings.
+
+Pages are addressed by an opaque cursor that encodes the sort key of the
+last row served, so fetching page N costs the same as fetching page 1.
+"""
+
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .metadata_index import METADATA_SORT_PREFIX, NUMERIC_KEYS
+
+# Public sort name -> model field; every ordering is tie-broken on id
+SORT_FIELDS = {
+    'uploaded_at': 'uploaded_at',
+    'name': 'original_filename',
+    'original_filename': 'original_filename',
+    'title': 'title',
+    'project': 'project',
+    'file_size': 'file_size',
+    # Annotated by search_views.apply_search_query
+    'relevance': 'search_rank',
+}
+# Indexed extracted_metadata keys, annotated by metadata_index.annotate_sort
+SORT_FIELDS.update({alias: f'{METADATA_SORT_PREFIX}{alias}' for alias in sorted(NUMERIC_KEYS)})
+DATETIME_FIELDS = {'uploaded_at'}
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded or does not match the ordering"""
+
+
+@dataclass
+class KeysetPage:
+    items: List[Any]
+    next_cursor: Optional[str]
+    page_size: int
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def resolve_sort(sort_by: Optional[str], default: str = 'uploaded_at') -> str:
+    """Map a user supplied sort name onto a keyset-capable model field"""
+    return SORT_FIELDS.get(sort_by or default, SORT_FIELDS[default])
+
+
+def parse_page_size(raw, default: Optional[int] = None) -> int:
+    default = default or getattr(settings, 'FILE_LIST_PAGE_SIZE', 100)
+    maximum = getattr(settings, 'FILE_LIST_MAX_PAGE_SIZE', 1000)
+    try:
+        size = int(raw) if raw not in (None, '') else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def encode_cursor(field: str, value, pk: int) -> str:
+    if field in DATETIME_FIELDS and value is not None:
+        value = value.isoformat()
+    payload = json.dumps({'f': field, 'v': value, 'id': pk}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, field: str):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        value, pk = payload['v'], int(payload['id'])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor('Malformed cursor') from exc
+    if payload.get('f') != field:
+        raise InvalidCursor('Cursor does not match the requested ordering')
+    if field in DATETIME_FIELDS and value is not None:
+        value = parse_datetime(value)
+        if value is None:
+            raise InvalidCursor('Malformed cursor')
+    return value, pk
+
+
+def paginate_keyset(queryset, field: str = 'uploaded_at', descending: bool = True,
+                    cursor: Optional[str] = None, page_size: int = 100) -> KeysetPage:
+    """
+    Return one page of ``queryset`` ordered by ``(field, id)``.
+
+    The query is a range scan on the ordering index followed by LIMIT, so
+    its cost is independent of how deep the page is.
+    """
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}id')
+
+    if cursor:
+        value, pk = decode_cursor(cursor, field)
+        op = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk})
+        )
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(field, getattr(last, field), last.pk)
+    return KeysetPage(items=rows, next_cursor=next_cursor, page_size=page_size)
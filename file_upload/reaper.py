@@ -0,0 +1,146 @@
+"""
+Background removal of physical file blobs.
+
+Deleting a ``File`` row only records a tombstone; the bytes are unlinked later
+by ``reap_tombstones`` (see the ``reap_files`` management command) so request
+handling never waits on the filesystem.
+"""
+
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+
+from .models import File, FileTombstone
+
+logger = logging.getLogger(__name__)
+
+FILES_SUBDIR = 'files'
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def media_path(relative_name: str) -> Optional[str]:
+    """Resolve a storage name under MEDIA_ROOT, refusing paths that escape it"""
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    candidate = os.path.realpath(os.path.join(root, relative_name))
+    if candidate != root and candidate.startswith(root + os.sep):
+        return candidate
+    return None
+
+
+def record_tombstone(relative_name: str, size: int = 0, reason: str = 'delete') -> Optional[FileTombstone]:
+    """Queue a stored blob for removal"""
+    if not relative_name:
+        return None
+    return FileTombstone.objects.create(path=relative_name, size=size or 0, reason=reason)
+
+
+def unlink_gradually(path: str, step_bytes: int, pause_seconds: float):
+    """
+    Remove a file, shrinking large ones step by step first.
+
+    Truncating in slices spreads the extent freeing over time, so unlinking a
+    multi-GB blob does not monopolise the filesystem journal.
+    """
+    size = os.path.getsize(path)
+    if step_bytes > 0 and size > step_bytes:
+        with open(path, 'r+b') as handle:
+            while size > step_bytes:
+                size -= step_bytes
+                handle.truncate(size)
+                os.fsync(handle.fileno())
+                if pause_seconds:
+                    time.sleep(pause_seconds)
+    os.remove(path)
+
+
+def reap_tombstones(limit: Optional[int] = None, max_per_second: Optional[float] = None) -> int:
+    """
+    Unlink queued blobs, honouring the configured unlink rate.
+
+    Returns the number of tombstones cleared.
+    """
+    limit = limit or _setting('FILE_REAPER_BATCH_SIZE', 100)
+    rate = max_per_second if max_per_second is not None else _setting('FILE_REAPER_MAX_UNLINKS_PER_SECOND', 5.0)
+    step_bytes = _setting('FILE_REAPER_TRUNCATE_STEP_BYTES', 256 * 1024 * 1024)
+    pause = _setting('FILE_REAPER_TRUNCATE_PAUSE_SECONDS', 0.05)
+    max_attempts = _setting('FILE_REAPER_MAX_ATTEMPTS', 5)
+    min_interval = 1.0 / rate if rate and rate > 0 else 0.0
+
+    tombstones = list(FileTombstone.objects.filter(attempts__lt=max_attempts)[:limit])
+    cleared = 0
+    last_unlink = 0.0
+    for tombstone in tombstones:
+        # A live row may point at the same blob (e.g. an orphan re-linked later)
+        if File.objects.filter(file=tombstone.path).exists():
+            tombstone.delete()
+            continue
+
+        path = media_path(tombstone.path)
+        if not path or not os.path.exists(path):
+            tombstone.delete()
+            cleared += 1
+            continue
+
+        wait = min_interval - (time.monotonic() - last_unlink)
+        if wait > 0:
+            time.sleep(wait)
+
+        try:
+            unlink_gradually(path, step_bytes, pause)
+        except OSError as exc:
+            tombstone.attempts += 1
+            tombstone.last_error = str(exc)
+            tombstone.save(update_fields=['attempts', 'last_error'])
+            logger.warning("Failed to reap %s (attempt %s): %s", tombstone.path, tombstone.attempts, exc)
+            continue
+        finally:
+            last_unlink = time.monotonic()
+
+        tombstone.delete()
+        cleared += 1
+        logger.info("Reaped %s (%s bytes)", tombstone.path, tombstone.size)
+    return cleared
+
+
+def scan_orphans(enqueue: bool = False, grace_seconds: Optional[int] = None) -> List[Tuple[str, int]]:
+    """
+    Compare ``MEDIA_ROOT/files/`` against the database.
+
+    Blobs younger than the grace period are ignored so uploads that have been
+    written but not yet committed are never reported.
+    """
+    grace = grace_seconds if grace_seconds is not None else _setting('FILE_REAPER_ORPHAN_GRACE_SECONDS', 3600)
+    base = os.path.join(settings.MEDIA_ROOT, FILES_SUBDIR)
+    if not os.path.isdir(base):
+        return []
+
+    known = set(File.objects.exclude(file='').exclude(file__isnull=True).values_list('file', flat=True).iterator())
+    queued = set(FileTombstone.objects.values_list('path', flat=True).iterator())
+    cutoff = time.time() - grace
+
+    orphans = []
+    for dirpath, _dirnames, filenames in os.walk(base):
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            relative = os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+            if relative in known or relative in queued:
+                continue
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            orphans.append((relative, stat.st_size))
+
+    if enqueue:
+        FileTombstone.objects.bulk_create(
+            [FileTombstone(path=relative, size=size, reason='orphan') for relative, size in orphans]
+        )
+    return orphans
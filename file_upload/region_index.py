@@ -0,0 +1,236 @@
+"""
+Genomic region queries on sorted, bgzip-compressed VCF, BED and GTF/GFF files.
+
+The index follows tabix: records are assigned to the UCSC/SAM hierarchical
+bins, each bin keeps the BGZF virtual-offset chunks holding its records,
+and a linear index stores the smallest offset per 16 kb window. A query
+reads only the chunks of the bins overlapping the region, starting past
+the linear-index offset, so its cost tracks the size of the answer rather
+than the file. Building one is a full pass over the file, so the
+extraction worker does it in the background (``build_region_sidecar``);
+files that cannot be indexed get an error sidecar instead, so the check
+is not repeated on every query.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .compression import detect_compression, iter_bgzf_lines
+from .sidecars import load_fresh_json, sidecar_path, write_atomically
+
+logger = logging.getLogger(__name__)
+
+REGION_FORMATS = ('VCF', 'BED', 'GTF', 'GFF')
+NOT_BGZF_MESSAGE = 'Region queries need a bgzip-compressed file (bgzip, not gzip)'
+LINEAR_SHIFT = 14
+# Bins cover positions up to 2^29, as in tabix .tbi files
+MAX_POSITION = 1 << 29
+REGION_PATTERN = re.compile(r'^(?P<start>[\d,]+)(?:-(?P<end>[\d,]+))?$')
+
+
+def reg2bin(beg: int, end: int) -> int:
+    """Smallest bin holding the zero-based, half-open interval ``[beg, end)``"""
+    end -= 1
+    for shift, offset in ((14, 4681), (17, 585), (20, 73), (23, 9), (26, 1)):
+        if beg >> shift == end >> shift:
+            return offset + (beg >> shift)
+    return 0
+
+
+def reg2bins(beg: int, end: int) -> List[int]:
+    """Every bin that may hold records overlapping ``[beg, end)``"""
+    end -= 1
+    bins = [0]
+    for shift, offset in ((26, 1), (23, 9), (20, 73), (17, 585), (14, 4681)):
+        bins.extend(range(offset + (beg >> shift), offset + (end >> shift) + 1))
+    return bins
+
+
+def _is_meta(line: bytes, file_format: str) -> bool:
+    if not line or line.startswith(b'#'):
+        return True
+    return file_format == 'BED' and line.startswith((b'track', b'browser'))
+
+
+# Splits needed to reach the last column read for each format
+_SPLITS = {'VCF': 8, 'BED': 3, 'GTF': 5, 'GFF': 5}
+
+
+def _span(fields: List[bytes], file_format: str) -> Tuple[int, int]:
+    if file_format == 'VCF':
+        begin = int(fields[1]) - 1
+        end = begin + len(fields[3])
+        # Structural variants give their extent in INFO/END
+        if len(fields) > 7 and b'END=' in fields[7]:
+            for entry in fields[7].split(b';'):
+                if entry.startswith(b'END='):
+                    end = max(end, int(entry[4:]))
+        return begin, end
+    if file_format == 'BED':
+        return int(fields[1]), int(fields[2])
+    return int(fields[3]) - 1, int(fields[4])
+
+
+def record_span(line: bytes, file_format: str) -> Tuple[str, int, int]:
+    """``(reference, begin, end)`` of a record, zero-based and half-open"""
+    fields = line.rstrip(b'\r').split(b'\t', _SPLITS[file_format])
+    return (fields[0].decode('utf-8', 'replace'), *_span(fields, file_format))
+
+
+def build_region_index(path: str, file_format: str) -> Dict[str, Any]:
+    """One pass over a BGZF file; raises ``ValueError`` unless it is sorted by reference and position"""
+    if detect_compression(path) != 'bgzf':
+        raise ValueError(NOT_BGZF_MESSAGE)
+    references = []
+    seen = set()
+    current_name = None
+    bins, linear = {}, []
+    last_begin = 0
+    records = 0
+    splits = _SPLITS[file_format]
+    for start, end_offset, line in iter_bgzf_lines(path):
+        # 35 is '#'; the common case is checked inline as this loop runs once per record
+        if not line or line[0] == 35 or (file_format == 'BED' and _is_meta(line, file_format)):
+            continue
+        fields = line.rstrip(b'\r').split(b'\t', splits)
+        begin, end = _span(fields, file_format)
+        end = max(end, begin + 1)
+        if fields[0] != current_name:
+            current_name = fields[0]
+            name = current_name.decode('utf-8', 'replace')
+            if name in seen:
+                raise ValueError(f"Records for {name} are not contiguous; sort the file before indexing")
+            seen.add(name)
+            bins, linear = {}, []
+            references.append({'name': name, 'bins': bins, 'linear': linear})
+            last_begin = 0
+        elif begin < last_begin:
+            raise ValueError(f"File is not sorted by position at {name}:{begin + 1}")
+        last_begin = begin
+        records += 1
+
+        first_window, last_window = begin >> LINEAR_SHIFT, (end - 1) >> LINEAR_SHIFT
+        bin_number = 4681 + first_window if first_window == last_window else reg2bin(begin, end)
+        chunks = bins.get(bin_number)
+        if chunks is None:
+            bins[bin_number] = [[start, end_offset]]
+        elif chunks[-1][1] == start:
+            chunks[-1][1] = end_offset
+        else:
+            chunks.append([start, end_offset])
+        if len(linear) <= last_window:
+            # Windows are filled in order, so only windows not seen yet need an offset
+            first_window = max(first_window, len(linear))
+            linear.extend([None] * (first_window - len(linear)))
+            linear.extend([start] * (last_window + 1 - first_window))
+
+    for reference in references:
+        reference['bins'] = {str(bin_number): chunks for bin_number, chunks in reference['bins'].items()}
+        # Empty windows inherit the previous offset, which is always safe to start from
+        previous = 0
+        for window, offset in enumerate(reference['linear']):
+            if offset is None:
+                reference['linear'][window] = previous
+            else:
+                previous = offset
+    return {'format': file_format, 'references': references, 'records': records}
+
+
+def stored_region_index(file_name: str, path: str) -> Optional[Dict[str, Any]]:
+    """The region index of a stored blob, or None until the worker has built it"""
+    return load_fresh_json(file_name, path, '.rgi')
+
+
+def region_index_error(file_name: str, path: str) -> Optional[str]:
+    """Why the blob could not be indexed, if the last build failed"""
+    failure = load_fresh_json(file_name, path, '.rgi.err')
+    return failure['error'] if failure else None
+
+
+def build_region_sidecar(file_name: str, path: str, file_format: str) -> bool:
+    """
+    Build and store the region index, or record why it cannot be built.
+    Runs in the extraction worker; True once an index is stored. Files
+    that are not bgzipped are skipped, as queries reject them up front.
+    """
+    if detect_compression(path) != 'bgzf':
+        return False
+    if stored_region_index(file_name, path) is not None:
+        return True
+    if region_index_error(file_name, path) is not None:
+        return False
+    try:
+        index = build_region_index(path, file_format)
+    except Exception as exc:
+        if not isinstance(exc, ValueError):
+            logger.exception("Building the region index of %s failed", file_name)
+        write_atomically(sidecar_path(file_name, '.rgi.err'),
+                         lambda target: json.dump({'error': str(exc)}, target))
+        return False
+    write_atomically(sidecar_path(file_name, '.rgi'), lambda target: json.dump(index, target, separators=(',', ':')))
+    return True
+
+
+def parse_region(region: str) -> Tuple[str, int, int]:
+    """
+    ``chr7:117,000,000-117,300,000`` (one-based, inclusive) to
+    ``('chr7', 116999999, 117300000)``; ``chr7:100`` runs to the end of the
+    reference and a bare name covers all of it.
+    """
+    region = region.strip()
+    name, colon, span = region.rpartition(':')
+    match = REGION_PATTERN.match(span) if colon else None
+    if not match:
+        if not region:
+            raise ValueError('Region is empty')
+        return region, 0, MAX_POSITION
+    start = int(match.group('start').replace(',', ''))
+    end = int(match.group('end').replace(',', '')) if match.group('end') else MAX_POSITION
+    if start < 1 or end < start:
+        raise ValueError(f'Invalid region {region!r}')
+    return name, start - 1, min(end, MAX_POSITION)
+
+
+def _chunks(reference: Dict[str, Any], begin: int, end: int) -> List[List[int]]:
+    linear = reference['linear']
+    min_offset = linear[min(begin >> LINEAR_SHIFT, len(linear) - 1)] if linear else 0
+    chunks = sorted(
+        chunk for bin_number in reg2bins(begin, end)
+        for chunk in reference['bins'].get(str(bin_number), ())
+        if chunk[1] > min_offset
+    )
+    merged = []
+    for chunk_start, chunk_end in chunks:
+        chunk_start = max(chunk_start, min_offset)
+        if merged and chunk_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], chunk_end)
+        else:
+            merged.append([chunk_start, chunk_end])
+    return merged
+
+
+def query_region(path: str, index: Dict[str, Any], reference_name: str, begin: int, end: int,
+                 limit: Optional[int] = None) -> Iterator[str]:
+    """Records overlapping ``[begin, end)`` on ``reference_name``, in file order"""
+    file_format = index['format']
+    reference = next((entry for entry in index['references'] if entry['name'] == reference_name), None)
+    if reference is None:
+        return
+    produced = 0
+    for chunk_start, chunk_end in _chunks(reference, begin, end):
+        for start, _next, line in iter_bgzf_lines(path, chunk_start):
+            if start >= chunk_end:
+                break
+            if _is_meta(line, file_format):
+                continue
+            name, record_begin, record_end = record_span(line, file_format)
+            if name != reference_name or record_begin >= end:
+                # Sorted input: nothing later can overlap
+                return
+            if max(record_end, record_begin + 1) > begin:
+                yield line.rstrip(b'\r').decode('utf-8', 'replace')
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
@@ -0,0 +1,166 @@
+"""
+Full-text search backends for ``File``.
+
+SQLite uses an FTS5 table and PostgreSQL a weighted ``tsvector`` column with a
+GIN index; both are kept in sync by triggers installed in migration 0006.
+Other databases fall back to ``icontains`` matching.
+"""
+
+import re
+from typing import List
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FILE_TABLE = 'file_upload_file'
+FTS_TABLE = 'file_upload_file_fts'
+PG_COLUMN = 'search_document'
+
+# Indexed columns and their relevance weight (title matches rank highest)
+INDEXED_FIELDS = (
+    ('title', 10.0),
+    ('tags', 5.0),
+    ('project', 4.0),
+    ('organism', 4.0),
+    ('original_filename', 3.0),
+    ('description', 1.0),
+    ('uploader', 1.0),
+)
+
+_COLUMNS = ', '.join(field for field, _weight in INDEXED_FIELDS)
+_NEW_COLUMNS = ', '.join(f'new.{field}' for field, _weight in INDEXED_FIELDS)
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {FILE_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW_COLUMNS});
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {FILE_TABLE} BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_COLUMNS} ON {FILE_TABLE} BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+            INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW_COLUMNS});
+        END
+    """,
+}
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+', re.UNICODE)
+
+_availability = {}
+
+
+def tokenize(term: str) -> List[str]:
+    """Split a user term the way the index tokenizers do"""
+    return [token.lower() for token in TOKEN_PATTERN.findall(term)]
+
+
+def _fts5_match_expression(terms: List[str]) -> str:
+    # Each term becomes a prefix phrase so "RNA-seq" matches the adjacent tokens "rna seq"
+    phrases = []
+    for term in terms:
+        tokens = tokenize(term)
+        if tokens:
+            phrases.append('"{}"*'.format(' '.join(tokens)))
+    return ' AND '.join(phrases)
+
+
+def _tsquery_expression(terms: List[str]) -> str:
+    clauses = []
+    for term in terms:
+        tokens = tokenize(term)
+        if tokens:
+            clauses.append('(' + ' <-> '.join(f'{token}:*' for token in tokens) + ')')
+    return ' & '.join(clauses)
+
+
+def _fts_available(connection) -> bool:
+    """Whether the index for this connection's vendor was installed"""
+    key = connection.alias
+    if key not in _availability:
+        if connection.vendor == 'sqlite':
+            _availability[key] = FTS_TABLE in connection.introspection.table_names()
+        elif connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                columns = connection.introspection.get_table_description(cursor, FILE_TABLE)
+            _availability[key] = any(column.name == PG_COLUMN for column in columns)
+        else:
+            _availability[key] = False
+    return _availability[key]
+
+
+def _icontains_filter(queryset, terms: List[str]):
+    search_q = Q()
+    for term in terms:
+        term_q = Q(search_vector__icontains=term)
+        for field, _weight in INDEXED_FIELDS:
+            term_q |= Q(**{f'{field}__icontains': term})
+        search_q &= term_q
+    return queryset.filter(search_q).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def full_text_filter(queryset, terms: List[str]):
+    """
+    Restrict ``queryset`` to rows matching every term and annotate ``search_rank``.
+
+    Higher ranks are better on every backend.
+    """
+    terms = [term for term in terms if tokenize(term)]
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    connection = connections[queryset.db]
+    if not _fts_available(connection):
+        return _icontains_filter(queryset, terms)
+
+    if connection.vendor == 'sqlite':
+        match = _fts5_match_expression(terms)
+        weights = ', '.join(str(weight) for _field, weight in INDEXED_FIELDS)
+        matching_ids = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+        # bm25() is negative with better matches lower, so flip the sign
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {FILE_TABLE}.id',
+            (match,),
+            output_field=FloatField(),
+        )
+        return queryset.filter(id__in=matching_ids).annotate(search_rank=rank)
+
+    tsquery = _tsquery_expression(terms)
+    matches = RawSQL(
+        f"{FILE_TABLE}.{PG_COLUMN} @@ to_tsquery('simple', %s)",
+        (tsquery,),
+        output_field=BooleanField(),
+    )
+    rank = RawSQL(
+        f"ts_rank_cd({FILE_TABLE}.{PG_COLUMN}, to_tsquery('simple', %s))",
+        (tsquery,),
+        output_field=FloatField(),
+    )
+    return queryset.filter(matches).annotate(search_rank=rank)
+
+
+def ensure_sqlite_triggers(connection):
+    """
+    Reinstall the FTS5 sync triggers if a table rebuild dropped them.
+
+    SQLite migrations that alter ``file_upload_file`` recreate the table, which
+    silently discards its triggers; the index is rebuilt when that happened.
+    """
+    if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [FILE_TABLE])
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) SELECT id, {_COLUMNS} FROM {FILE_TABLE}')
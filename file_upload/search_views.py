@@ -3,19 +3,55 @@ Search and filtering API views for files.
 Supports full-text search, facets, and metadata-driven queries.
 """
 
-from django.db.models import Q, Count
+from django.db.models import Count, F
 from django.http import JsonResponse
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.core.paginator import Paginator
 from django.db.models import Case, When, Value, CharField
 import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
+from .compression import detect_compression, open_text
+from .extraction import enqueue_extraction, refresh_if_stale
+from .folder_index import FolderIndex
+from .line_index import line_index, read_lines, read_rows
+from .metadata_index import (
+    INDEXED_METADATA,
+    METADATA_SORT_PREFIX,
+    NUMERIC_KEYS,
+    annotate_sort,
+    filter_by_comparison,
+    filter_by_text,
+    parse_comparisons,
+)
 from .models import File
+from .pagination import InvalidCursor, paginate_keyset, parse_page_size, resolve_sort
+from .region_index import (
+    NOT_BGZF_MESSAGE, REGION_FORMATS, parse_region, query_region, region_index_error, stored_region_index,
+)
+from .search_backend import full_text_filter
+from .sequence_index import fasta_index, fastq_index, fetch_bases, fetch_reads, wrap
 from .serializers import FileSerializer
+from .stats_cache import cached_for_user
+from .suggestions import suggest
+from .tags import filter_by_tags, parse_tags
+
+FACET_FIELDS = ('document_type', 'file_format', 'organism', 'project', 'experiment_type', 'access_level')
+# Facets that hide blank values and those truncated to their most common entries
+FACET_SKIP_BLANK = {'organism', 'experiment_type'}
+FACET_LIMITS = {'organism': 20, 'project': 20, 'tags': 30}
+# Facet label of the union row carrying the fully filtered count
+TOTAL_FACET = '__total__'
+# Filters matched with icontains; the rest are exact
+CONTAINS_FILTERS = {'organism', 'project'}
+# Default and maximum window sizes for indexed previews
+TEXT_PREVIEW_LINES, MAX_TEXT_PREVIEW_LINES = 50, 5000
+SEQUENCE_PREVIEW_BASES, MAX_SEQUENCE_PREVIEW_BASES = 10000, 1000000
+SEQUENCE_PREVIEW_READS, MAX_SEQUENCE_PREVIEW_READS = 25, 1000
+SEQUENCE_PREVIEW_RECORDS, MAX_SEQUENCE_PREVIEW_RECORDS = 100, 1000
+REGION_RECORDS, MAX_REGION_RECORDS = 1000, 10000
 
 
 @api_view(['GET'])
@@ -27,8 +63,9 @@ def search_files(request):
     try:
         # Query parameters
         query = request.GET.get('q', '').strip()
+        cursor = request.GET.get('cursor') or None
         page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', 20))
+        page_size = parse_page_size(request.GET.get('page_size'), default=20)
         
         # Facet filters
         document_type = request.GET.get('document_type', '')
@@ -37,57 +74,66 @@ def search_files(request):
         project = request.GET.get('project', '')
         experiment_type = request.GET.get('experiment_type', '')
         access_level = request.GET.get('access_level', '')
+        tags = [tag for raw in request.GET.getlist('tag') for tag in parse_tags(raw)]
         
         # Sorting parameters
         sort_by = request.GET.get('sort_by', 'uploaded_at')
         sort_order = request.GET.get('sort_order', 'desc')
         
         # Base queryset: only the current user's files
-        queryset = File.objects.filter(user=request.user)
+        queryset = File.objects.filter(user=request.user).select_related('parent_folder')
         
-        # Apply search query
-        if query:
-            queryset = apply_search_query(queryset, query)
+        # Apply search query (annotates search_rank for relevance sorting)
+        matched = apply_search_query(queryset, query)
         
         # Apply filters
-        if document_type:
-            queryset = queryset.filter(document_type=document_type)
-        if file_format:
-            queryset = queryset.filter(file_format=file_format)
-        if organism:
-            queryset = queryset.filter(organism__icontains=organism)
-        if project:
-            queryset = queryset.filter(project__icontains=project)
-        if experiment_type:
-            queryset = queryset.filter(experiment_type=experiment_type)
-        if access_level:
-            queryset = queryset.filter(access_level=access_level)
+        filters = {
+            'document_type': document_type,
+            'file_format': file_format,
+            'organism': organism,
+            'project': project,
+            'experiment_type': experiment_type,
+            'access_level': access_level,
+        }
+        filters = {field: value for field, value in filters.items() if value}
+        queryset = apply_facet_filters(filter_by_tags(matched, tags), filters)
         
-        # Apply sorting
-        order_field = sort_by
-        if sort_order == 'desc':
-            order_field = f'-{sort_by}'
-        queryset = queryset.order_by(order_field)
+        # Facets are recomputed on the first page only unless asked for; they also yield the total.
+        # Page turns skip the COUNT over the whole result set unless ``count=1``; has_next comes from the page.
+        include_facets = request.GET.get('facets', '0' if cursor else '1') not in ('0', 'false')
+        facets = None
+        total_count = None
+        if include_facets:
+            facets, total_count = get_facets_data(matched, filters, tags)
+        elif request.GET.get('count') in ('1', 'true'):
+            total_count = queryset.count()
         
-        # Pagination
-        paginator = Paginator(queryset, page_size)
-        page_obj = paginator.get_page(page)
+        sort_field = resolve_sort(sort_by)
+        if sort_field.startswith(METADATA_SORT_PREFIX):
+            queryset = annotate_sort(queryset, sort_field[len(METADATA_SORT_PREFIX):])
         
-        # Serialize results
-        serializer = FileSerializer(page_obj.object_list, many=True)
+        # Keyset pagination on (sort field, id); the client echoes `page` for display only
+        try:
+            page_obj = paginate_keyset(
+                queryset, sort_field, sort_order == 'desc', cursor, page_size
+            )
+        except InvalidCursor as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Compute facet stats
-        facets = get_facets_data(File.objects.filter(user=request.user))
+        # Serialize results
+        context = {'request': request, 'folder_index': FolderIndex.for_user(request.user)}
+        serializer = FileSerializer(page_obj.items, many=True, context=context)
         
         return Response({
             'results': serializer.data,
             'pagination': {
                 'page': page,
                 'page_size': page_size,
-                'total_pages': paginator.num_pages,
-                'total_count': paginator.count,
-                'has_next': page_obj.has_next(),
-                'has_previous': page_obj.has_previous(),
+                'total_pages': max(1, -(-total_count // page_size)) if total_count is not None else None,
+                'total_count': total_count,
+                'next_cursor': page_obj.next_cursor,
+                'has_next': page_obj.has_next,
+                'has_previous': cursor is not None,
             },
             'facets': facets,
             'query_info': {
@@ -99,6 +145,7 @@ def search_files(request):
                     'project': project,
                     'experiment_type': experiment_type,
                     'access_level': access_level,
+                    'tags': tags,
                 }
             }
         })
@@ -117,12 +164,13 @@ def get_facets(request):
     Return available facet values and counts for the current user
     """
     try:
-        queryset = File.objects.filter(user=request.user)
-        facets = get_facets_data(queryset)
+        facets, total_files = cached_for_user(
+            request.user.id, 'facets', lambda: get_facets_data(File.objects.filter(user=request.user))
+        )
         
         return Response({
             'facets': facets,
-            'total_files': queryset.count()
+            'total_files': total_files
         })
         
     except Exception as e:
@@ -146,46 +194,11 @@ def search_suggestions(request):
             return Response({'suggestions': []})
         
         suggestions = []
-        
-        # Project suggestions
-        projects = File.objects.filter(
-            user=request.user,
-            project__icontains=query
-        ).values_list('project', flat=True).distinct()[:limit//2]
-        
-        for project in projects:
-            suggestions.append({
-                'type': 'project',
-                'value': project,
-                'label': f'Project: {project}'
-            })
-        
-        # Organism suggestions
-        organisms = File.objects.filter(
-            user=request.user,
-            organism__icontains=query
-        ).values_list('organism', flat=True).distinct()[:limit//2]
-        
-        for organism in organisms:
-            if organism:  # Skip empty values
-                suggestions.append({
-                    'type': 'organism',
-                    'value': organism,
-                    'label': f'Organism: {organism}'
-                })
-        
-        # Title suggestions
-        titles = File.objects.filter(
-            user=request.user,
-            title__icontains=query
-        ).values_list('title', flat=True).distinct()[:limit//3]
-        
-        for title in titles:
-            suggestions.append({
-                'type': 'title',
-                'value': title,
-                'label': f'Title: {title[:50]}...' if len(title) > 50 else f'Title: {title}'
-            })
+        for match in suggest(request.user, query, limit):
+            label = match['value']
+            if len(label) > 50:
+                label = f'{label[:50]}...'
+            suggestions.append(dict(match, label=f"{match['type'].capitalize()}: {label}"))
         
         return Response({
             'suggestions': suggestions[:limit]
@@ -206,6 +219,8 @@ def file_preview(request, file_id):
     """
     try:
         file_obj = File.objects.get(id=file_id, user=request.user)
+        # Metadata from an outdated extractor is refreshed in the background
+        refresh_if_stale(file_obj)
         
         preview_data = {
             'id': file_obj.id,
@@ -215,13 +230,21 @@ def file_preview(request, file_id):
             'file_size': file_obj.file_size,
             'uploaded_at': file_obj.uploaded_at,
             'metadata': file_obj.extracted_metadata,
+            'extraction_status': file_obj.extraction_status,
         }
         
         # Build preview content per file format
-        if file_obj.file_format in ['txt', 'CSV', 'py']:
-            preview_data['preview'] = get_text_preview(file_obj)
+        if file_obj.file_format in ['txt', 'CSV', 'TSV', 'py']:
+            preview_data['preview'] = get_text_preview(
+                file_obj, offset=request.GET.get('offset'), limit=request.GET.get('limit')
+            )
         elif file_obj.file_format in ['FASTA', 'FASTQ']:
-            preview_data['preview'] = get_sequence_preview(file_obj)
+            preview_data['preview'] = get_sequence_preview(
+                file_obj,
+                record=request.GET.get('record') or None,
+                offset=request.GET.get('offset'),
+                limit=request.GET.get('limit'),
+            )
         elif file_obj.file_format == 'PDF':
             preview_data['preview'] = get_pdf_preview(file_obj)
         else:
@@ -244,24 +267,87 @@ def file_preview(request, file_id):
         )
 
 
-def apply_search_query(queryset, query: str):
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def file_region(request, file_id):
     """
-    Apply search filters supporting several modes
+    Records of a sorted, bgzipped VCF/BED/GTF/GFF file that overlap
+    ``region`` (e.g. ``chr7:117,000,000-117,300,000``). Answers 202 while
+    the extraction worker is still building the file's index.
     """
-    # Parse the query string, supporting field:value syntax
+    try:
+        file_obj = File.objects.get(id=file_id, user=request.user)
+    except File.DoesNotExist:
+        return Response(
+            {'error': 'File does not exist or cannot be accessed'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    if file_obj.file_format not in REGION_FORMATS:
+        return Response(
+            {'error': f'Region queries are not supported for {file_obj.file_format} files'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        reference, begin, end = parse_region(request.GET.get('region', ''))
+        limit = max(1, min(int(request.GET.get('limit') or REGION_RECORDS), MAX_REGION_RECORDS))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if detect_compression(file_obj.file.path) != 'bgzf':
+        return Response({'error': NOT_BGZF_MESSAGE}, status=status.HTTP_400_BAD_REQUEST)
+    index = stored_region_index(file_obj.file.name, file_obj.file.path)
+    if index is None:
+        failure = region_index_error(file_obj.file.name, file_obj.file.path)
+        if failure:
+            return Response({'error': failure}, status=status.HTTP_400_BAD_REQUEST)
+        if file_obj.extraction_status not in ('pending', 'running'):
+            enqueue_extraction(file_obj)
+        return Response({'id': file_obj.id, 'status': 'indexing',
+                         'message': 'The region index is being built; retry shortly'},
+                        status=status.HTTP_202_ACCEPTED)
+    try:
+        records = list(query_region(file_obj.file.path, index, reference, begin, end, limit=limit + 1))
+    except Exception as e:
+        return Response(
+            {'error': f'Region query failed: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return Response({
+        'id': file_obj.id,
+        'file_format': file_obj.file_format,
+        'reference': reference,
+        'start': begin + 1,
+        'end': end,
+        'records': records[:limit],
+        'count': min(len(records), limit),
+        'truncated': len(records) > limit,
+        'references': [entry['name'] for entry in index['references']],
+    })
+
+
+FIELD_QUERY_PATTERN = re.compile(r'(\w+):([^\s]+)')
+
+
+def parse_search_query(query: str):
+    """Split a query into field:value filters and free-text terms"""
     field_queries = {}
-    remaining_query = query
-    
-    # Extract field-specific queries (e.g., project:MyLab)
-    field_pattern = r'(\w+):([^\s]+)'
-    matches = re.findall(field_pattern, query)
-    
-    for field, value in matches:
+    for field, value in FIELD_QUERY_PATTERN.findall(query):
         field_queries[field] = value
-        remaining_query = re.sub(f'{field}:{value}', '', remaining_query)
-    
-    # Clean up the remaining query
-    remaining_query = remaining_query.strip()
+    remaining_query = FIELD_QUERY_PATTERN.sub(' ', query)
+    return field_queries, remaining_query.split()
+
+
+def apply_search_query(queryset, query: str):
+    """
+    Apply search filters supporting several modes.
+
+    Free-text terms go through the full-text index and every returned row
+    carries a ``search_rank`` annotation (higher is more relevant).
+    """
+    # Indexed metadata comparisons (e.g., reads>1000000), then field:value syntax (e.g., project:MyLab)
+    comparisons, query = parse_comparisons(query)
+    field_queries, terms = parse_search_query(query)
+    for alias, op, value in comparisons:
+        queryset = filter_by_comparison(queryset, alias, op, value)
     
     # Apply field-specific filters
     if 'project' in field_queries:
@@ -272,82 +358,97 @@ def apply_search_query(queryset, query: str):
         queryset = queryset.filter(document_type__icontains=field_queries['type'])
     if 'format' in field_queries:
         queryset = queryset.filter(file_format__icontains=field_queries['format'])
+    if 'tag' in field_queries:
+        queryset = filter_by_tags(queryset, [field_queries['tag']])
+    for alias, value in field_queries.items():
+        if alias not in INDEXED_METADATA:
+            continue
+        if alias in NUMERIC_KEYS:
+            try:
+                queryset = filter_by_comparison(queryset, alias, '=', float(value))
+            except ValueError:
+                queryset = queryset.none()
+        else:
+            queryset = filter_by_text(queryset, alias, value)
     
     # Apply full-text search for the remaining tokens
-    if remaining_query:
-        search_q = Q()
-        for term in remaining_query.split():
-            term_q = (
-                Q(search_vector__icontains=term) |
-                Q(title__icontains=term) |
-                Q(description__icontains=term) |
-                Q(tags__icontains=term) |
-                Q(project__icontains=term) |
-                Q(organism__icontains=term) |
-                Q(original_filename__icontains=term)
-            )
-            search_q &= term_q
-        
-        queryset = queryset.filter(search_q)
-    
-    return queryset
+    return full_text_filter(queryset, terms)
+
+
+def get_facets_data(queryset, filters: Dict[str, str] = None, tags: List[str] = ()):
+    """
+    Assemble facet and tag counts for the supplied queryset in one statement.
+
+    Each facet is a ``GROUP BY`` over its own column, narrowed by every
+    *other* active filter (tags included) so sibling values stay selectable;
+    the parts and the fully filtered total are joined with ``UNION ALL``.
+    Grouping by all columns at once would instead return one row per
+    distinct combination, close to one per file. Returns ``(facets, total)``.
+    """
+    filters = filters or {}
+    queryset = queryset.order_by()
+    tagged = filter_by_tags(queryset, tags)
+    parts = [_facet_counts(apply_facet_filters(tagged, filters), TOTAL_FACET, Value('', output_field=CharField()))]
+    for field in FACET_FIELDS:
+        others = {key: value for key, value in filters.items() if key != field}
+        parts.append(_facet_counts(apply_facet_filters(tagged, others), field, F(field)))
+    parts.append(_facet_counts(apply_facet_filters(queryset, filters), 'tags', F('tag_set__name')))
 
+    counts = {field: [] for field in (*FACET_FIELDS, 'tags')}
+    total = 0
+    for row in parts[0].union(*parts[1:], all=True):
+        if row['facet'] == TOTAL_FACET:
+            total = row['count']
+        elif row['value'] or (row['value'] is not None and row['facet'] not in FACET_SKIP_BLANK):
+            counts[row['facet']].append((row['value'], row['count']))
 
-def get_facets_data(queryset) -> Dict[str, List[Dict[str, Any]]]:
-    """Assemble facet counts for the supplied queryset"""
     facets = {}
-    
-    # Document Type facets
-    facets['document_type'] = list(
-        queryset.values('document_type')
-        .annotate(count=Count('id'))
-        .order_by('-count')
-    )
-    
-    # File Format facets
-    facets['file_format'] = list(
-        queryset.values('file_format')
-        .annotate(count=Count('id'))
-        .order_by('-count')
-    )
-    
-    # Organism facets (skip blank values)
-    facets['organism'] = list(
-        queryset.exclude(organism='')
-        .values('organism')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:20]  # Limit results
-    )
-    
-    # Project facets
-    facets['project'] = list(
-        queryset.values('project')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:20]
-    )
-    
-    # Experiment type facets (skip blank values)
-    facets['experiment_type'] = list(
-        queryset.exclude(experiment_type='')
-        .values('experiment_type')
-        .annotate(count=Count('id'))
-        .order_by('-count')
-    )
-    
-    # Access Level facets
-    facets['access_level'] = list(
-        queryset.values('access_level')
-        .annotate(count=Count('id'))
-        .order_by('-count')
-    )
-    
-    return facets
+    for field, rows in counts.items():
+        ranked = sorted(rows, key=lambda item: (-item[1], item[0]))[:FACET_LIMITS.get(field)]
+        key = 'tag' if field == 'tags' else field
+        facets[field] = [{key: value, 'count': count} for value, count in ranked]
+    return facets, total
+
+
+def _facet_counts(queryset, facet: str, value):
+    """``(facet, value, count)`` rows for one part of the facet union"""
+    return (queryset.annotate(facet=Value(facet, output_field=CharField()), value=value)
+            .values('facet', 'value').annotate(count=Count('id')))
+
+
+def apply_facet_filters(queryset, filters: Dict[str, str]):
+    """Narrow ``queryset`` by facet filters (icontains for free-text fields)"""
+    for field, value in filters.items():
+        lookup = f'{field}__icontains' if field in CONTAINS_FILTERS else field
+        queryset = queryset.filter(**{lookup: value})
+    return queryset
+
 
+def get_text_preview(file_obj, offset=None, limit=None) -> Dict[str, Any]:
+    """
+    Return a preview for plain-text files.
 
-def get_text_preview(file_obj) -> Dict[str, Any]:
-    """Return a preview for plain-text files"""
+    Without parameters this is the first 2,000 characters. ``offset`` and
+    ``limit`` select a window of lines (data rows for CSV/TSV, which come
+    back parsed into columns), served through a sparse line index.
+    """
+    if offset is not None or limit is not None:
+        try:
+            offset = max(int(offset or 0), 0)
+            limit = min(int(limit) if limit else TEXT_PREVIEW_LINES, MAX_TEXT_PREVIEW_LINES)
+        except ValueError:
+            return {'type': 'error', 'message': 'offset and limit must be integers'}
+        try:
+            if file_obj.file_format in ('CSV', 'TSV'):
+                return get_table_window(file_obj, offset, limit)
+            return get_text_window(file_obj, offset, limit)
+        except Exception as e:
+            return {
+                'type': 'error',
+                'message': f'Unable to preview file: {str(e)}'
+            }
     try:
-        with open(file_obj.file.path, 'r', encoding='utf-8', errors='ignore') as f:
+        with open_text(file_obj.file.path) as f:
             content = f.read(2000)  # Read the first 2,000 characters
             lines = content.split('\n')[:50]  # Only show the first 50 lines
             
@@ -365,10 +466,74 @@ def get_text_preview(file_obj) -> Dict[str, Any]:
         }
 
 
-def get_sequence_preview(file_obj) -> Dict[str, Any]:
-    """Return a preview of sequence files (FASTA/FASTQ)"""
+def get_text_window(file_obj, offset: int, limit: int) -> Dict[str, Any]:
+    """Lines ``offset`` to ``offset + limit`` (zero-based)"""
+    index = line_index(file_obj.file.name, file_obj.file.path)
+    lines = read_lines(file_obj.file.path, index, offset, limit)
+    return {
+        'type': 'text',
+        'content': '\n'.join(lines),
+        'offset': offset,
+        'limit': limit,
+        'line_count': index['line_count'],
+        'has_more': offset + limit < index['line_count'],
+    }
+
+
+def get_table_window(file_obj, offset: int, limit: int) -> Dict[str, Any]:
+    """Data rows ``offset`` to ``offset + limit`` of a CSV/TSV file, split into columns"""
+    index = line_index(file_obj.file.name, file_obj.file.path)
+    delimiter = (file_obj.extracted_metadata or {}).get('separator')
+    if not delimiter:
+        delimiter = '\t' if file_obj.file_format == 'TSV' else ','
+    path = file_obj.file.path
+    header = read_rows(path, index, 0, 1, delimiter)
+    rows = read_rows(path, index, offset + 1, limit, delimiter)
+    row_count = max(index['line_count'] - 1, 0)
+    return {
+        'type': 'table',
+        'columns': header[0] if header else [],
+        'rows': rows,
+        'separator': delimiter,
+        'offset': offset,
+        'limit': limit,
+        'row_count': row_count,
+        'has_more': offset + limit < row_count,
+    }
+
+
+def get_sequence_preview(file_obj, record=None, offset=None, limit=None) -> Dict[str, Any]:
+    """
+    Return a preview of sequence files (FASTA/FASTQ).
+
+    Without parameters this is the first 100 lines. ``record`` selects a
+    FASTA sequence whose bases ``[offset, offset + limit)`` are returned;
+    otherwise ``offset``/``limit`` page through FASTA records or FASTQ reads.
+    Random access goes through indexes built on first use (sequence_index.py).
+    """
+    if record is None and offset is None and limit is None:
+        return get_sequence_head_preview(file_obj)
+    try:
+        offset = max(int(offset or 0), 0)
+        limit = int(limit) if limit else None
+    except ValueError:
+        return {'type': 'error', 'message': 'offset and limit must be integers'}
     try:
-        with open(file_obj.file.path, 'r', encoding='utf-8', errors='ignore') as f:
+        if file_obj.file_format == 'FASTA':
+            return get_fasta_window(file_obj, record, offset, limit)
+        if record is not None:
+            return {'type': 'error', 'message': 'record= is only supported for FASTA files'}
+        return get_fastq_window(file_obj, offset, limit)
+    except Exception as e:
+        return {
+            'type': 'error',
+            'message': f'Unable to preview sequence file: {str(e)}'
+        }
+
+
+def get_sequence_head_preview(file_obj) -> Dict[str, Any]:
+    try:
+        with open_text(file_obj.file.path) as f:
             lines = []
             for i, line in enumerate(f):
                 if i >= 100:  # Read at most 100 lines
@@ -388,6 +553,54 @@ def get_sequence_preview(file_obj) -> Dict[str, Any]:
         }
 
 
+def get_fasta_window(file_obj, record: Optional[str], offset: int, limit: Optional[int]) -> Dict[str, Any]:
+    """A base range of one record, or a page of the record list when no record is named"""
+    index = fasta_index(file_obj.file.name, file_obj.file.path)
+    if record is None:
+        limit = min(limit or SEQUENCE_PREVIEW_RECORDS, MAX_SEQUENCE_PREVIEW_RECORDS)
+        page = index['records'][offset:offset + limit]
+        return {
+            'type': 'sequence_records',
+            'records': [{'name': entry.name, 'length': entry.length} for entry in page],
+            'offset': offset,
+            'limit': limit,
+            'record_count': len(index['records']),
+            'has_more': offset + len(page) < len(index['records']),
+            'format': file_obj.file_format,
+        }
+    entry = index['by_name'].get(record)
+    if entry is None:
+        return {'type': 'error', 'message': f'No sequence named {record!r} in this file'}
+    limit = min(limit or SEQUENCE_PREVIEW_BASES, MAX_SEQUENCE_PREVIEW_BASES)
+    bases = fetch_bases(file_obj.file.path, entry, offset, offset + limit)
+    return {
+        'type': 'sequence',
+        'content': f'>{entry.name}:{offset + 1}-{offset + len(bases)}\n' + wrap(bases, entry.line_bases),
+        'record': entry.name,
+        'offset': offset,
+        'limit': limit,
+        'sequence_length': entry.length,
+        'has_more': offset + len(bases) < entry.length,
+        'format': file_obj.file_format,
+    }
+
+
+def get_fastq_window(file_obj, offset: int, limit: Optional[int]) -> Dict[str, Any]:
+    """Reads ``offset`` to ``offset + limit`` (zero-based read ordinals)"""
+    index = fastq_index(file_obj.file.name, file_obj.file.path)
+    limit = min(limit or SEQUENCE_PREVIEW_READS, MAX_SEQUENCE_PREVIEW_READS)
+    lines = fetch_reads(file_obj.file.path, index, offset, limit)
+    return {
+        'type': 'sequence',
+        'content': '\n'.join(lines),
+        'offset': offset,
+        'limit': limit,
+        'record_count': index['read_count'],
+        'has_more': offset + limit < index['read_count'],
+        'format': file_obj.file_format,
+    }
+
+
 def get_pdf_preview(file_obj) -> Dict[str, Any]:
     """Return a preview payload for PDFs"""
     try:
@@ -0,0 +1,147 @@
+"""
+Random access into FASTA and FASTQ files through lazily built indexes.
+
+FASTA files get a samtools-compatible ``.fai`` (name, length, offset,
+line bases, line width per record), so any base range of any record is one
+seek away. FASTQ files get a sparse read index holding the byte offset of
+every ``FASTQ_INDEX_INTERVAL``-th read. Both are built on first use and
+stored as sidecars (see sidecars.py); offsets are in decompressed bytes.
+"""
+
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from .compression import open_binary
+from .gzip_index import open_at
+from .sidecars import is_fresh, load_or_build_json, sidecar_path, write_atomically
+
+FASTQ_INDEX_INTERVAL = 1000
+
+
+class FaiRecord(NamedTuple):
+    name: str
+    length: int
+    offset: int
+    line_bases: int
+    line_width: int
+
+
+def build_fai(path: str) -> List[FaiRecord]:
+    """One pass over a FASTA file; every line of a record but the last must have the same length"""
+    records = []
+    position = 0
+    name = None
+
+    def close_record():
+        if name is not None:
+            records.append(FaiRecord(name, length, offset, line_bases or length, line_width or length))
+
+    with open_binary(path) as handle:
+        for line in handle:
+            position += len(line)
+            if line.startswith(b'>'):
+                close_record()
+                name = (line[1:].split() or [b''])[0].decode('utf-8', 'replace')
+                length, offset, line_bases, line_width, short_line = 0, position, 0, 0, False
+                continue
+            if name is None:
+                continue
+            bases = len(line.rstrip(b'\r\n'))
+            if not bases:
+                # Only trailing blank lines are allowed after a record's sequence
+                short_line = short_line or bool(line_bases)
+                continue
+            if short_line:
+                raise ValueError(f"Different line length in sequence '{name}'")
+            if not line_bases:
+                line_bases, line_width = bases, len(line)
+            elif bases != line_bases or len(line) != line_width:
+                if bases > line_bases:
+                    raise ValueError(f"Different line length in sequence '{name}'")
+                short_line = True
+            length += bases
+        close_record()
+    return records
+
+
+def _write_fai(records: List[FaiRecord], target):
+    for record in records:
+        target.write('\t'.join(str(value) for value in record) + '\n')
+
+
+@lru_cache(maxsize=32)
+def _read_fai(index_path: str, mtime: float) -> Dict[str, Any]:
+    records = []
+    with open(index_path) as handle:
+        for line in handle:
+            name, *numbers = line.rstrip('\n').split('\t')
+            records.append(FaiRecord(name, *(int(value) for value in numbers[:4])))
+    return {'records': records, 'by_name': {record.name: record for record in records}}
+
+
+def fasta_index(file_name: str, path: str) -> Dict[str, Any]:
+    """The ``.fai`` of a stored FASTA blob, building it on first use"""
+    index_path = sidecar_path(file_name, '.fai')
+    if not is_fresh(index_path, path):
+        records = build_fai(path)
+        write_atomically(index_path, lambda target: _write_fai(records, target))
+    return _read_fai(index_path, os.path.getmtime(index_path))
+
+
+def fetch_bases(path: str, record: FaiRecord, start: int, end: int) -> str:
+    """Bases ``[start, end)`` of ``record``, computed from the line geometry without scanning"""
+    start, end = max(0, start), min(end, record.length)
+    if start >= end:
+        return ''
+
+    def byte_offset(base):
+        return record.offset + (base // record.line_bases) * record.line_width + base % record.line_bases
+
+    first, last = byte_offset(start), byte_offset(end - 1) + 1
+    with open_at(path, first) as handle:
+        data = handle.read(last - first)
+    return data.replace(b'\r', b'').replace(b'\n', b'').decode('ascii', 'replace')
+
+
+def build_fastq_index(path: str) -> Dict[str, Any]:
+    """Byte offsets of every ``FASTQ_INDEX_INTERVAL``-th read (four-line records)"""
+    offsets = []
+    position = 0
+    line_number = 0
+    with open_binary(path) as handle:
+        for line in handle:
+            if line_number % 4 == 0:
+                if not line.strip():
+                    break
+                if (line_number // 4) % FASTQ_INDEX_INTERVAL == 0:
+                    offsets.append(position)
+            position += len(line)
+            line_number += 1
+    return {'interval': FASTQ_INDEX_INTERVAL, 'offsets': offsets, 'read_count': (line_number + 3) // 4}
+
+
+def fastq_index(file_name: str, path: str) -> Dict[str, Any]:
+    return load_or_build_json(file_name, path, '.fqi', build_fastq_index)
+
+
+def fetch_reads(path: str, index: Dict[str, Any], start: int, count: int) -> List[str]:
+    """Reads ``start`` to ``start + count`` as lines, seeking to the nearest indexed read"""
+    if start >= index['read_count'] or count <= 0:
+        return []
+    checkpoint = start // index['interval']
+    skip_lines = (start - checkpoint * index['interval']) * 4
+    lines = []
+    with open_at(path, index['offsets'][checkpoint]) as handle:
+        for line_number, line in enumerate(handle):
+            if line_number < skip_lines:
+                continue
+            if len(lines) >= count * 4:
+                break
+            lines.append(line.rstrip(b'\r\n').decode('utf-8', 'replace'))
+    return lines
+
+
+def wrap(sequence: str, width: Optional[int]) -> str:
+    width = width or 60
+    return '\n'.join(sequence[start:start + width] for start in range(0, len(sequence), width))
@@ -0,0 +1,269 @@
+"""
+Whole-file sequence statistics computed over raw byte blocks with NumPy.
+
+Files are read in large binary blocks (decompressed by ``compression``)
+and every per-base count is a vectorized operation on the block instead
+of per-line Python string work. FASTQ full scans are opt-in (``METADATA_FULL_SCAN``); FASTA
+files are always scanned in full since assembly statistics need every
+sequence.
+"""
+
+from collections import Counter
+from typing import Any, Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+from .compression import open_binary
+
+BLOCK_SIZE = 8 * 1024 * 1024
+# Per-position quality is tracked for the first bases of each read only
+MAX_QUALITY_POSITIONS = 1000
+HISTOGRAM_BINS = 20
+
+NEWLINE = ord('\n')
+CARRIAGE_RETURN = ord('\r')
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _matches(data, symbols: bytes):
+    """Boolean mask of bytes equal to any of ``symbols`` (comparisons beat a table lookup)"""
+    mask = data == symbols[0]
+    for symbol in symbols[1:]:
+        mask |= data == symbol
+    return mask
+
+
+def length_histogram(length_counts: Counter, bins: int = HISTOGRAM_BINS):
+    """Bucket ``{length: count}`` into at most ``bins`` equal-width ranges"""
+    if not length_counts:
+        return []
+    low, high = min(length_counts), max(length_counts)
+    width = max(1, -(-(high - low + 1) // bins))
+    buckets = Counter()
+    for length, count in length_counts.items():
+        buckets[(length - low) // width] += count
+    return [
+        {'min': low + index * width, 'max': min(high, low + (index + 1) * width - 1), 'count': buckets[index]}
+        for index in sorted(buckets)
+    ]
+
+
+class _FastqAccumulator:
+    def __init__(self):
+        self.read_count = 0
+        self.total_bases = 0
+        self.gc_bases = 0
+        self.n_bases = 0
+        self.quality_sum = 0
+        self.length_counts = Counter()
+        self.position_sums = np.zeros(0, dtype=np.float64)
+        self.position_counts = np.zeros(0, dtype=np.int64)
+
+    def add_records(self, buffer: bytes, newlines):
+        """Fold the complete 4-line records in ``buffer`` (``newlines`` marks every line end)"""
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        starts = np.empty_like(newlines)
+        starts[0] = 0
+        starts[1:] = newlines[:-1] + 1
+        ends = newlines.copy()
+        # Tolerate CRLF line endings
+        has_cr = ends > starts
+        has_cr[has_cr] = data[ends[has_cr] - 1] == CARRIAGE_RETURN
+        ends -= has_cr
+
+        seq_starts, seq_ends = starts[1::4], ends[1::4]
+        qual_starts, qual_ends = starts[3::4], ends[3::4]
+        lengths = seq_ends - seq_starts
+
+        self.read_count += len(lengths)
+        self.total_bases += int(lengths.sum())
+        values, counts = np.unique(lengths, return_counts=True)
+        self.length_counts.update(dict(zip(values.tolist(), counts.tolist())))
+
+        # Per-line sums in one reduceat pass; each segment runs to the next line start
+        # and so includes the line terminator, which is neither a base nor a score
+        self.gc_bases += int(np.add.reduceat(_matches(data, b'GCgc'), starts, dtype=np.int32)[1::4].sum())
+        self.n_bases += int(np.add.reduceat(_matches(data, b'Nn'), starts, dtype=np.int32)[1::4].sum())
+        qual_lengths = qual_ends - qual_starts
+        terminators = NEWLINE * len(qual_starts) + CARRIAGE_RETURN * int(has_cr[3::4].sum())
+        qual_totals = np.add.reduceat(data, starts, dtype=np.int64)[3::4]
+        self.quality_sum += int(qual_totals.sum()) - terminators - 33 * int(qual_lengths.sum())
+
+        # Per-position sums over a (reads x positions) matrix, clipped to the tracked width
+        width = min(int(qual_lengths.max()) if len(qual_lengths) else 0, MAX_QUALITY_POSITIONS)
+        if not width:
+            return
+        columns = np.arange(width, dtype=np.int32)
+        valid = columns < qual_lengths[:, None]
+        index = qual_starts.astype(np.int32)[:, None] + columns
+        np.minimum(index, len(data) - 1, out=index)
+        counts = valid.sum(axis=0)
+        sums = (data[index] * valid).sum(axis=0, dtype=np.int64) - 33 * counts
+        if width > len(self.position_sums):
+            self.position_sums = np.pad(self.position_sums, (0, width - len(self.position_sums)))
+            self.position_counts = np.pad(self.position_counts, (0, width - len(self.position_counts)))
+        self.position_sums[:width] += sums
+        self.position_counts[:width] += counts
+
+    def result(self) -> Dict[str, Any]:
+        reads = self.read_count
+        bases = self.total_bases
+        per_position = np.divide(
+            self.position_sums, self.position_counts,
+            out=np.zeros_like(self.position_sums), where=self.position_counts > 0,
+        )
+        return {
+            'read_count': reads,
+            'total_bases': bases,
+            'average_read_length': bases // reads if reads else 0,
+            'min_read_length': min(self.length_counts) if self.length_counts else 0,
+            'max_read_length': max(self.length_counts) if self.length_counts else 0,
+            'read_length_histogram': length_histogram(self.length_counts),
+            'average_quality': round(self.quality_sum / bases, 2) if bases else 0,
+            'per_position_quality': [round(value, 2) for value in per_position.tolist()],
+            'gc_content': round(100.0 * self.gc_bases / bases, 2) if bases else 0,
+            'n_content': round(100.0 * self.n_bases / bases, 4) if bases else 0,
+            'stats_scope': 'full_file',
+        }
+
+
+def fastq_stats(path: str, block_size: int = BLOCK_SIZE) -> Dict[str, Any]:
+    """
+    Read count, base totals, length distribution, GC/N content and per-position
+    mean quality for a whole (optionally gzipped) 4-line FASTQ file.
+    """
+    accumulator = _FastqAccumulator()
+    carry = b''
+    with open_binary(path) as handle:
+        while True:
+            chunk = handle.read(block_size)
+            if not chunk:
+                break
+            buffer = carry + chunk if carry else chunk
+            newlines = np.flatnonzero(np.frombuffer(buffer, dtype=np.uint8) == NEWLINE)
+            complete = (len(newlines) // 4) * 4
+            if not complete:
+                carry = buffer
+                continue
+            cut = int(newlines[complete - 1]) + 1
+            accumulator.add_records(buffer[:cut], newlines[:complete])
+            carry = buffer[cut:]
+
+    # A final record without a trailing newline
+    if carry.strip():
+        buffer = carry if carry.endswith(b'\n') else carry + b'\n'
+        newlines = np.flatnonzero(np.frombuffer(buffer, dtype=np.uint8) == NEWLINE)
+        complete = (len(newlines) // 4) * 4
+        if complete:
+            accumulator.add_records(buffer[:int(newlines[complete - 1]) + 1], newlines[:complete])
+    return accumulator.result()
+
+
+def _complete_lines(handle, block_size: int):
+    """Yield ``(buffer, newline_positions)`` for runs of whole lines from ``handle``"""
+    carry = b''
+    while True:
+        chunk = handle.read(block_size)
+        if not chunk:
+            break
+        buffer = carry + chunk if carry else chunk
+        newlines = np.flatnonzero(np.frombuffer(buffer, dtype=np.uint8) == NEWLINE)
+        if not len(newlines):
+            carry = buffer
+            continue
+        cut = int(newlines[-1]) + 1
+        yield buffer[:cut], newlines
+        carry = buffer[cut:]
+    if carry:
+        buffer = carry + b'\n'
+        yield buffer, np.array([len(buffer) - 1])
+
+
+def assembly_stats(lengths) -> Dict[str, Any]:
+    """N50/L50 and N90/L90 over an array of sequence lengths"""
+    if not len(lengths):
+        return {'n50': 0, 'l50': 0, 'n90': 0, 'l90': 0}
+    ordered = np.sort(lengths)[::-1]
+    cumulative = np.cumsum(ordered)
+    total = int(cumulative[-1])
+    stats = {}
+    for label, fraction in (('50', 0.5), ('90', 0.9)):
+        index = int(np.searchsorted(cumulative, total * fraction))
+        stats[f'n{label}'] = int(ordered[index])
+        stats[f'l{label}'] = index + 1
+    return stats
+
+
+def fasta_stats(path: str, block_size: int = BLOCK_SIZE, sample_headers: int = 5) -> Dict[str, Any]:
+    """
+    Sequence count, total length, N50/L50, GC and N content and a length
+    histogram for a whole (optionally gzipped) FASTA file.
+
+    Memory is bounded by the block size plus one length per sequence.
+    """
+    lengths: List = []
+    headers: List[str] = []
+    current = 0          # bases of the sequence still open at the end of the previous block
+    seen_header = False
+    gc_bases = n_bases = 0
+
+    with open_binary(path) as handle:
+        for buffer, newlines in _complete_lines(handle, block_size):
+            data = np.frombuffer(buffer, dtype=np.uint8)
+            starts = np.empty_like(newlines)
+            starts[0] = 0
+            starts[1:] = newlines[:-1] + 1
+            ends = newlines - (data[np.maximum(newlines - 1, 0)] == CARRIAGE_RETURN) * (newlines > starts)
+            is_header = data[np.minimum(starts, len(data) - 1)] == ord('>')
+            is_header &= ends > starts
+            line_bases = np.where(is_header, 0, ends - starts)
+
+            gc_lines = np.add.reduceat(_matches(data, b'GCgc'), starts, dtype=np.int64)
+            n_lines = np.add.reduceat(_matches(data, b'Nn'), starts, dtype=np.int64)
+            gc_bases += int(gc_lines[~is_header].sum())
+            n_bases += int(n_lines[~is_header].sum())
+
+            header_rows = np.flatnonzero(is_header)
+            for row in header_rows[:max(0, sample_headers - len(headers))]:
+                headers.append(buffer[starts[row] + 1:ends[row]].decode('utf-8', 'replace'))
+
+            # Bases before each header close the previous sequence; the tail stays open
+            cumulative = np.concatenate(([0], np.cumsum(line_bases)))
+            if len(header_rows):
+                closed = np.diff(cumulative[header_rows])
+                first = current + int(cumulative[header_rows[0]])
+                if seen_header:
+                    lengths.append(np.array([first], dtype=np.int64))
+                lengths.append(closed.astype(np.int64))
+                current = int(cumulative[-1] - cumulative[header_rows[-1]])
+                seen_header = True
+            else:
+                current += int(cumulative[-1])
+
+    if seen_header:
+        lengths.append(np.array([current], dtype=np.int64))
+    lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64)
+    total = int(lengths.sum())
+    count = len(lengths)
+    values, counts = np.unique(lengths, return_counts=True)
+
+    result = {
+        'sequence_count': count,
+        'total_length': total,
+        'average_length': total // count if count else 0,
+        'min_length': int(lengths.min()) if count else 0,
+        'max_length': int(lengths.max()) if count else 0,
+        'gc_content': round(100.0 * gc_bases / total, 2) if total else 0,
+        'n_content': round(100.0 * n_bases / total, 4) if total else 0,
+        'length_histogram': length_histogram(Counter(dict(zip(values.tolist(), counts.tolist())))),
+        'sample_headers': headers,
+        'stats_scope': 'full_file',
+    }
+    result.update(assembly_stats(lengths))
+    return result
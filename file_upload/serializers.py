@@ -1,5 +1,9 @@
 from rest_framework import serializers
-from .models import File, Folder
+from django.utils import timezone
+from .models import File, Folder, NcbiImportJob
+from .compression import strip_compression_suffix
+from .extraction import enqueue_extraction
+from .tags import parse_tags
 from django.conf import settings
 
 
@@ -17,9 +21,10 @@ class FileSerializer(serializers.ModelSerializer):
                  # Additional metadata fields
                  'title', 'project', 'uploader', 'file_format', 'document_type', 'access_level',
                  'organism', 'experiment_type', 'tags', 'tags_list', 'description', 'checksum', 
-                 'qc_status', 'extracted_metadata')
+                 'qc_status', 'extracted_metadata', 'extraction_status', 'extraction_error')
         read_only_fields = ('id', 'uploaded_at', 'file_size', 'file_url', 'file_name', 'file_path', 
-                           'parent_folder_name', 'checksum', 'extracted_metadata', 'tags_list')
+                           'parent_folder_name', 'checksum', 'extracted_metadata', 'tags_list',
+                           'extraction_status', 'extraction_error')
 
     def get_file_url(self, obj):
         if obj.file:
@@ -32,16 +37,18 @@ class FileSerializer(serializers.ModelSerializer):
         return obj.original_filename
 
     def get_file_path(self, obj):
+        folder_index = self.context.get('folder_index')
+        if folder_index is not None and obj.parent_folder_id in folder_index:
+            return f"{folder_index.path(obj.parent_folder_id)}/{obj.original_filename}"
         return obj.get_path()
 
     def get_parent_folder_name(self, obj):
-        return obj.parent_folder.name if obj.parent_folder else None
+        # Listing querysets select_related('parent_folder'), so this never hits the DB
+        return obj.parent_folder.name if obj.parent_folder_id else None
     
     def get_tags_list(self, obj):
         """Convert the comma-delimited tag string into a list"""
-        if obj.tags:
-            return [tag.strip() for tag in obj.tags.split(',') if tag.strip()]
-        return []
+        return parse_tags(obj.tags)
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -114,7 +121,8 @@ class FileUploadSerializer(serializers.ModelSerializer):
         if not data.get('file_format'):
             # Infer the format from the file extension
             if data.get('file'):
-                filename = data['file'].name
+                # reads.fastq.gz is a FASTQ file; extractors decompress it transparently
+                filename = strip_compression_suffix(data['file'].name)
                 ext = filename.split('.')[-1].lower() if '.' in filename else ''
                 # Map common extensions to internal format names
                 format_mapping = {
@@ -122,7 +130,9 @@ class FileUploadSerializer(serializers.ModelSerializer):
                     'pdf': 'PDF', 'doc': 'DOC', 'docx': 'DOCX', 'xls': 'XLS', 'xlsx': 'XLSX',
                     'jpg': 'JPG', 'jpeg': 'JPG', 'png': 'PNG', 'gif': 'GIF',
                     'mp4': 'MP4', 'avi': 'AVI', 'mov': 'MOV',
-                    'zip': 'ZIP', 'tar': 'TAR', 'gz': 'GZ'
+                    'zip': 'ZIP', 'tar': 'TAR', 'gz': 'GZ',
+                    'fasta': 'FASTA', 'fa': 'FASTA', 'fastq': 'FASTQ', 'fq': 'FASTQ', 'vcf': 'VCF',
+                    'bam': 'BAM', 'sam': 'SAM', 'cram': 'CRAM', 'h5ad': 'H5AD',
                 }
                 data['file_format'] = format_mapping.get(ext, 'OTHER')
             else:
@@ -144,37 +154,10 @@ class FileUploadSerializer(serializers.ModelSerializer):
         # Persist the file record
         file_obj = super().create(validated_data)
         
-        # Extract metadata asynchronously
-        self._extract_metadata_async(file_obj)
+        # Metadata is extracted by the background workers (manage.py extract_metadata)
+        enqueue_extraction(file_obj)
         
         return file_obj
-    
-    def _extract_metadata_async(self, file_obj):
-        """Kick off metadata extraction in a fire-and-forget manner"""
-        try:
-            from .metadata_extractor import extract_file_metadata
-            
-            if file_obj.file and file_obj.file_format:
-                metadata = extract_file_metadata(file_obj.file.path, file_obj.file_format)
-                if metadata:
-                    file_obj.extracted_metadata = metadata
-                    
-                    # Autofill organism if user left it blank
-                    if not file_obj.organism and 'detected_organism' in metadata:
-                        file_obj.organism = metadata['detected_organism']
-                    
-                    # Populate description using detected keywords when possible
-                    if not file_obj.description and 'detected_keywords' in metadata:
-                        keywords = metadata['detected_keywords']
-                        if keywords:
-                            file_obj.description = f\"Detected keywords: {', '.join(keywords[:5])}\"
-                    
-                    file_obj.save()
-        except Exception as e:
-            # Log errors but do not block the upload
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f\"Metadata extraction failed for {file_obj.id}: {e}\")
 
 
 class FolderSerializer(serializers.ModelSerializer):
@@ -191,20 +174,39 @@ class FolderSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at', 'updated_at', 'folder_path', 
                            'parent_name', 'subfolders_count', 'files_count', 'folder_size')
 
+    def _folder_index(self, obj):
+        folder_index = self.context.get('folder_index')
+        if folder_index is not None and obj.id in folder_index:
+            return folder_index
+        return None
+
     def get_folder_path(self, obj):
+        folder_index = self._folder_index(obj)
+        if folder_index:
+            return folder_index.path(obj.id)
         return obj.get_path()
 
     def get_parent_name(self, obj):
-        return obj.parent.name if obj.parent else None
+        return obj.parent.name if obj.parent_id else None
 
     def get_subfolders_count(self, obj):
+        folder_index = self._folder_index(obj)
+        if folder_index:
+            return folder_index.subfolder_count(obj.id)
         return obj.subfolders.count()
 
     def get_files_count(self, obj):
+        folder_index = self._folder_index(obj)
+        if folder_index:
+            return folder_index.file_count(obj.id)
         return obj.files.count()
 
     def get_folder_size(self, obj):
         """Recursively compute the folder size including descendants"""
+        folder_index = self._folder_index(obj)
+        if folder_index:
+            return folder_index.total_size(obj.id)
+
         def calculate_folder_size(folder):
             # Sum file sizes within the current folder
             files_size = sum(file.file_size or 0 for file in folder.files.all())
@@ -229,3 +231,25 @@ class FolderCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
+
+
+class NcbiImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    eta_seconds = serializers.SerializerMethodField()
+
+    class Meta:
+        model = NcbiImportJob
+        fields = ('id', 'url', 'status', 'cancel_requested', 'bytes_downloaded', 'total_bytes', 'progress',
+                  'eta_seconds', 'error', 'error_status', 'file', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        if obj.status == 'done':
+            return 1.0
+        if not obj.total_bytes:
+            return None
+        return min(obj.bytes_downloaded / obj.total_bytes, 1.0)
+
+    def get_eta_seconds(self, obj):
+        eta = obj.eta_seconds(timezone.now())
+        return round(eta, 1) if eta is not None else None
@@ -0,0 +1,81 @@
+"""
+Derived index files stored alongside uploaded blobs.
+
+Random-access indexes (``.fai``, line offsets, gzip checkpoints, ...) are
+built lazily on first use and kept under ``MEDIA_ROOT/indexes/``, mirroring
+the blob's storage name, so orphan scans of ``files/`` never see them.
+They are removed with their blob (see ``signals.queue_blob_removal``).
+"""
+
+import glob
+import json
+import os
+import tempfile
+from functools import lru_cache
+from typing import Any, Callable, List, Optional
+
+from django.conf import settings
+
+INDEX_SUBDIR = 'indexes'
+
+
+def sidecar_path(file_name: str, suffix: str) -> str:
+    """Absolute path of the ``suffix`` index for the blob stored as ``file_name``"""
+    return os.path.join(settings.MEDIA_ROOT, INDEX_SUBDIR, f'{file_name}{suffix}')
+
+
+def is_fresh(index_path: str, source_path: str) -> bool:
+    """An index is valid while it is at least as new as its source blob"""
+    try:
+        return os.path.getmtime(index_path) >= os.path.getmtime(source_path)
+    except OSError:
+        return False
+
+
+def write_atomically(path: str, write: Callable[[Any], None], mode: str = 'w'):
+    """Write through a temporary file so concurrent readers never see a partial index"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.building-')
+    try:
+        with os.fdopen(handle, mode) as target:
+            write(target)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+@lru_cache(maxsize=64)
+def _read_json(path: str, mtime: float) -> Any:
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def load_fresh_json(file_name: str, source_path: str, suffix: str) -> Optional[Any]:
+    """The stored JSON index for a blob, or None when it is missing or stale"""
+    path = sidecar_path(file_name, suffix)
+    if not is_fresh(path, source_path):
+        return None
+    return _read_json(path, os.path.getmtime(path))
+
+
+def load_or_build_json(file_name: str, source_path: str, suffix: str, build: Callable[[str], Any]) -> Any:
+    """
+    The JSON index for a blob, (re)building it with ``build(source_path)``
+    when missing or stale. Loaded indexes are shared per process; treat them as read-only.
+    """
+    path = sidecar_path(file_name, suffix)
+    if not is_fresh(path, source_path):
+        index = build(source_path)
+        write_atomically(path, lambda target: json.dump(index, target, separators=(',', ':')))
+    return _read_json(path, os.path.getmtime(path))
+
+
+def existing_sidecars(file_name: str) -> List[str]:
+    """Storage names (relative to MEDIA_ROOT) of every index built for ``file_name``"""
+    pattern = glob.escape(sidecar_path(file_name, '')) + '.*'
+    return [
+        os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        for path in glob.glob(pattern)
+    ]
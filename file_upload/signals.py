@@ -0,0 +1,98 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_init, post_migrate, post_save
+from django.dispatch import receiver
+
+from .metadata_index import project_metadata, sync_metadata_values
+from .models import File, Folder
+from .reaper import record_tombstone
+from .search_backend import ensure_sqlite_triggers
+from .sidecars import existing_sidecars
+from .stats_cache import bump_version
+from .suggestions import SUGGESTION_FIELDS, record_change
+from .tags import sync_file_tags
+
+
+@receiver(post_delete, sender=File)
+def queue_blob_removal(sender, instance, **kwargs):
+    """Record tombstones for the stored blob and its indexes; covers cascades from folders and users too"""
+    if instance.file:
+        record_tombstone(instance.file.name, instance.file_size)
+        for name in existing_sidecars(instance.file.name):
+            record_tombstone(name)
+
+
+def _suggestion_values(instance):
+    # Read __dict__ directly so deferred fields are not fetched
+    return {field: instance.__dict__.get(field) for field in SUGGESTION_FIELDS if field in instance.__dict__}
+
+
+def _indexed_metadata(instance):
+    if 'extracted_metadata' not in instance.__dict__:
+        return None
+    return project_metadata(instance.__dict__['extracted_metadata'])
+
+
+@receiver(post_init, sender=File)
+def snapshot_indexed_values(sender, instance, **kwargs):
+    """Remember the loaded values that feed side indexes so saves only resync what changed"""
+    loaded = instance.pk is not None
+    instance._suggestion_snapshot = _suggestion_values(instance) if loaded else {}
+    instance._tags_snapshot = instance.__dict__.get('tags') if loaded else None
+    instance._metadata_snapshot = _indexed_metadata(instance) if loaded else {}
+
+
+@receiver(post_save, sender=File)
+def update_tag_set(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and 'tags' not in update_fields):
+        return
+    if 'tags' in instance.__dict__ and (created or instance.tags != instance._tags_snapshot):
+        sync_file_tags(instance)
+        instance._tags_snapshot = instance.tags
+
+
+@receiver(post_save, sender=File)
+def update_metadata_values(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and 'extracted_metadata' not in update_fields):
+        return
+    current = _indexed_metadata(instance)
+    if current is None or current == instance._metadata_snapshot:
+        return
+    sync_metadata_values(instance, current)
+    instance._metadata_snapshot = current
+
+
+@receiver(post_save, sender=File)
+def update_suggestion_index(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and not set(update_fields) & set(SUGGESTION_FIELDS)):
+        return
+    current = _suggestion_values(instance)
+    previous = {} if created else instance._suggestion_snapshot
+    # Only fields known on both sides can be diffed
+    fields = current.keys() if created else current.keys() & previous.keys()
+    record_change(
+        instance.user_id,
+        {field: previous.get(field) for field in fields},
+        {field: current[field] for field in fields},
+    )
+    instance._suggestion_snapshot = current
+
+
+@receiver(post_delete, sender=File)
+def drop_suggestion_values(sender, instance, **kwargs):
+    record_change(instance.user_id, instance._suggestion_snapshot, {})
+
+
+@receiver(post_save, sender=File)
+@receiver(post_delete, sender=File)
+@receiver(post_save, sender=Folder)
+@receiver(post_delete, sender=Folder)
+def invalidate_user_stats(sender, instance, **kwargs):
+    # After commit, so a concurrent reader cannot cache pre-write data under the new version
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_version(user_id))
+
+
+@receiver(post_migrate)
+def restore_fulltext_triggers(sender, using='default', **kwargs):
+    if sender.name == 'file_upload':
+        ensure_sqlite_triggers(connections[using])
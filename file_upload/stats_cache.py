@@ -0,0 +1,47 @@
+"""
+Versioned per-user cache for facet counts and storage stats.
+
+Entries are keyed by a per-user version number; any write to the user's
+files or folders bumps the version, which orphans every older entry at
+once instead of deleting keys one by one. Orphans expire by timeout.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'file_stats:version:{user_id}'
+ENTRY_KEY = 'file_stats:{user_id}:{version}:{name}'
+
+
+def _fresh_version() -> int:
+    # Millisecond clock so a version lost to eviction is never reissued
+    return int(time.time() * 1000)
+
+
+def get_version(user_id: int) -> int:
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(user_id: int):
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+
+
+def cached_for_user(user_id: int, name: str, compute):
+    """Return ``compute()`` for this user, reusing the value until their next write"""
+    key = ENTRY_KEY.format(user_id=user_id, version=get_version(user_id), name=name)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout=getattr(settings, 'FILE_STATS_CACHE_TIMEOUT', 3600))
+    return value
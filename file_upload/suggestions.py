@@ -0,0 +1,156 @@
+"""
+Trigram index behind search autocomplete.
+
+Every distinct project/organism/title value a user has is stored once in
+``SuggestionTerm`` together with its trigrams in ``SuggestionTrigram``.
+A lookup counts shared trigrams per term in one grouped query on the
+``(user, trigram)`` index, which serves prefix, substring and typo-tolerant
+matches without scanning ``File``.
+"""
+
+from typing import Dict, List, Set
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Q, Value
+
+from .models import File, SuggestionTerm, SuggestionTrigram
+
+SUGGESTION_FIELDS = ('project', 'organism', 'title')
+
+# Minimum trigram similarity for a match that is neither a prefix nor a substring
+SIMILARITY_THRESHOLD = 0.3
+# Candidate terms fetched per requested suggestion before re-ranking
+CANDIDATE_FACTOR = 5
+
+
+def normalize(value: str) -> str:
+    return ' '.join(value.lower().split())
+
+
+def trigrams(value: str) -> Set[str]:
+    """pg_trgm style trigrams: each word padded with two leading and one trailing space"""
+    grams = set()
+    for word in normalize(value).split(' '):
+        if not word:
+            continue
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def inner_trigrams(value: str) -> Set[str]:
+    """Unpadded trigrams; every term containing ``value`` verbatim carries all of them"""
+    grams = set()
+    for word in normalize(value).split(' '):
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def _add_value(user_id: int, field: str, value: str):
+    term, created = SuggestionTerm.objects.get_or_create(
+        user_id=user_id, field=field, value=value,
+        defaults={'normalized': normalize(value)[:500]},
+    )
+    if created:
+        grams = trigrams(value)
+        SuggestionTrigram.objects.bulk_create(
+            [SuggestionTrigram(user_id=user_id, term=term, trigram=gram) for gram in grams]
+        )
+        term.trigram_count = len(grams)
+        term.file_count = 1
+        term.save(update_fields=['trigram_count', 'file_count'])
+    else:
+        SuggestionTerm.objects.filter(pk=term.pk).update(file_count=F('file_count') + 1)
+
+
+def _remove_value(user_id: int, field: str, value: str):
+    terms = SuggestionTerm.objects.filter(user_id=user_id, field=field, value=value)
+    terms.update(file_count=F('file_count') - 1)
+    terms.filter(file_count__lte=0).delete()
+
+
+def record_change(user_id: int, old_values: Dict[str, str], new_values: Dict[str, str]):
+    """Move suggestion counts from a file's previous field values to its current ones"""
+    with transaction.atomic():
+        for field in SUGGESTION_FIELDS:
+            old, new = old_values.get(field) or '', new_values.get(field) or ''
+            if old == new:
+                continue
+            if old:
+                _remove_value(user_id, field, old)
+            if new:
+                _add_value(user_id, field, new)
+
+
+def rebuild_for_user(user_id: int):
+    """Recreate a user's suggestion index from their files"""
+    with transaction.atomic():
+        SuggestionTerm.objects.filter(user_id=user_id).delete()
+        for field in SUGGESTION_FIELDS:
+            rows = (
+                File.objects.filter(user_id=user_id).exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .values(field).annotate(count=Count('id'))
+            )
+            for row in rows:
+                value = row[field]
+                grams = trigrams(value)
+                term = SuggestionTerm.objects.create(
+                    user_id=user_id, field=field, value=value, normalized=normalize(value)[:500],
+                    trigram_count=len(grams), file_count=row['count'],
+                )
+                SuggestionTrigram.objects.bulk_create(
+                    [SuggestionTrigram(user_id=user_id, term=term, trigram=gram) for gram in grams]
+                )
+
+
+def suggest(user, query: str, limit: int = 10) -> List[dict]:
+    """
+    Ranked suggestions across all fields for a partial ``query``.
+
+    Candidates come from one query grouping trigram hits per term. Terms are
+    capped after ordering by how many of the needle's unpadded trigrams they
+    share, so a mid-word match such as ``ome`` in ``genome``, which misses
+    the padded leading trigrams, is not cut before its substring bonus
+    applies. Candidates are then ordered by prefix match, substring match
+    and trigram similarity, with the number of files carrying the value as
+    the tie-breaker.
+    """
+    needle = normalize(query)
+    grams = trigrams(needle)
+    if not grams:
+        return []
+    inner = inner_trigrams(needle)
+
+    candidates = (
+        SuggestionTrigram.objects.filter(user=user, trigram__in=grams)
+        .values('term_id', 'term__field', 'term__value', 'term__normalized',
+                'term__trigram_count', 'term__file_count')
+        .annotate(
+            hits=Count('id'),
+            inner_hits=Count('id', filter=Q(trigram__in=inner)) if inner else Value(0, output_field=IntegerField()),
+        )
+        .order_by('-inner_hits', '-hits', '-term__file_count')[:limit * CANDIDATE_FACTOR]
+    )
+
+    ranked = []
+    for row in candidates:
+        normalized = row['term__normalized']
+        union = len(grams) + row['term__trigram_count'] - row['hits']
+        similarity = row['hits'] / union if union else 0.0
+        prefix = normalized.startswith(needle) or f' {needle}' in normalized
+        substring = needle in normalized
+        if not (prefix or substring or similarity >= SIMILARITY_THRESHOLD):
+            continue
+        score = similarity + (1.0 if prefix else 0.0) + (0.5 if substring else 0.0)
+        ranked.append((score, row['term__file_count'], row))
+
+    ranked.sort(key=lambda item: (-item[0], -item[1], item[2]['term__value']))
+    return [
+        {
+            'type': row['term__field'],
+            'value': row['term__value'],
+            'score': round(score, 3),
+            'count': count,
+        }
+        for score, count, row in ranked[:limit]
+    ]
@@ -0,0 +1,45 @@
+"""
+Normalized tags.
+
+``File.tags`` remains the comma-separated text users edit; every save mirrors
+it into ``Tag`` rows linked through ``File.tag_set`` so tag filters are exact
+index lookups and tag facets are a grouped join instead of string scans
+(see ``search_views.get_facets_data``).
+"""
+
+from typing import Iterable, List
+
+from .models import Tag
+
+MAX_TAG_LENGTH = 100
+
+
+def parse_tags(raw: str) -> List[str]:
+    """Split a comma-separated tag string, dropping blanks and case-insensitive duplicates"""
+    tags, seen = [], set()
+    for tag in (raw or '').split(','):
+        tag = tag.strip()[:MAX_TAG_LENGTH]
+        if tag and tag.lower() not in seen:
+            seen.add(tag.lower())
+            tags.append(tag)
+    return tags
+
+
+def sync_file_tags(file_obj):
+    """Point ``file_obj.tag_set`` at the Tag rows named by ``file_obj.tags``"""
+    names = parse_tags(file_obj.tags)
+    wanted = {name.lower(): name for name in names}
+    existing = {tag.key: tag for tag in Tag.objects.filter(user_id=file_obj.user_id, key__in=wanted)}
+    missing = [Tag(user_id=file_obj.user_id, name=name, key=key) for key, name in wanted.items() if key not in existing]
+    if missing:
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        existing = {tag.key: tag for tag in Tag.objects.filter(user_id=file_obj.user_id, key__in=wanted)}
+    file_obj.tag_set.set(existing.values())
+
+
+def filter_by_tags(queryset, names: Iterable[str]):
+    """Keep files carrying every tag in ``names`` (exact, case-insensitive)"""
+    for name in names:
+        queryset = queryset.filter(tag_set__key=name.strip().lower())
+    return queryset
+
@@ -1,3 +1,1434 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from . import gzip_index, h5ad_summary, sequence_stats
+from .models import File, FileTombstone, Folder
+from .reaper import reap_tombstones, scan_orphans
+
+User = get_user_model()
+
+
+class MediaTestCase(TestCase):
+    """Run each test against a throwaway MEDIA_ROOT"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_override.enable()
+        cache.clear()
+        self.user = User.objects.create_user(email='tester@example.com', password='Passw0rd123')
+
+    def tearDown(self):
+        self.media_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def make_file(self, name='sample.txt', content=b'hello', **kwargs):
+        file_obj = File(user=self.user, upload_method='Test', original_filename=name, **kwargs)
+        file_obj.file.save(name, ContentFile(content), save=True)
+        return file_obj
+
+
+@override_settings(FILE_REAPER_MAX_UNLINKS_PER_SECOND=0, FILE_REAPER_TRUNCATE_PAUSE_SECONDS=0)
+class FileReaperTests(MediaTestCase):
+    def test_cascade_delete_is_tombstoned_and_reaped(self):
+        folder = Folder.objects.create(user=self.user, name='runs')
+        file_obj = self.make_file(parent_folder=folder)
+        path = file_obj.file.path
+
+        folder.delete()
+
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(FileTombstone.objects.count(), 1)
+        self.assertEqual(reap_tombstones(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(FileTombstone.objects.exists())
+
+    @override_settings(FILE_REAPER_TRUNCATE_STEP_BYTES=4)
+    def test_large_blob_is_truncated_before_unlink(self):
+        file_obj = self.make_file(content=b'x' * 64)
+        path = file_obj.file.path
+        file_obj.delete()
+
+        reap_tombstones()
+        self.assertFalse(os.path.exists(path))
+
+    def test_orphan_scan_ignores_known_blobs(self):
+        known = self.make_file()
+        orphan_dir = os.path.join(self.media_root, 'files', str(self.user.id))
+        orphan_path = os.path.join(orphan_dir, 'stray.bin')
+        with open(orphan_path, 'wb') as handle:
+            handle.write(b'stray')
+
+        orphans = scan_orphans(enqueue=True, grace_seconds=0)
+
+        self.assertEqual([path for path, _size in orphans], [f'files/{self.user.id}/stray.bin'])
+        self.assertTrue(FileTombstone.objects.filter(reason='orphan').exists())
+        reap_tombstones()
+        self.assertFalse(os.path.exists(orphan_path))
+        self.assertTrue(os.path.exists(known.file.path))
+
+
+class ListingQueryCountTests(MediaTestCase):
+    """Listing endpoints must not issue per-row queries"""
+
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.root = Folder.objects.create(user=self.user, name='root')
+
+    def populate(self, count):
+        start = Folder.objects.filter(parent=self.root).count()
+        for i in range(start, start + count):
+            child = Folder.objects.create(user=self.user, name=f'child-{i}', parent=self.root)
+            Folder.objects.create(user=self.user, name='grandchild', parent=child)
+            self.make_file(name=f'file-{i}.txt', parent_folder=self.root)
+            self.make_file(name=f'nested-{i}.txt', parent_folder=child)
+
+    def count_queries(self, url, params):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant(self, url, params=None):
+        params = params or {}
+        self.populate(2)
+        small = self.count_queries(url, params)
+        self.populate(8)
+        large = self.count_queries(url, params)
+        self.assertEqual(small, large)
+
+    def test_file_list(self):
+        self.assert_constant('/api/files/', {'folder_id': self.root.id})
+
+    def test_search_files(self):
+        self.assert_constant('/api/files/search/', {'page_size': 50})
+
+    def test_folder_list_create(self):
+        self.assert_constant('/api/files/folders/', {'parent_id': self.root.id})
+
+    def test_folder_all(self):
+        self.assert_constant('/api/files/folders/all/')
+
+    def test_folder_aggregates_match_tree(self):
+        self.populate(3)
+        response = self.client.get('/api/files/folders/all/')
+        root = next(f for f in response.json()['folders'] if f['id'] == self.root.id)
+        self.assertEqual(root['subfolders_count'], 3)
+        self.assertEqual(root['files_count'], 3)
+        self.assertEqual(root['folder_size'], 6 * len(b'hello'))
+        child = next(f for f in response.json()['folders'] if f['name'].startswith('child-'))
+        self.assertTrue(child['folder_path'].startswith('root/child-'))
+
+
+class KeysetPaginationTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(7):
+            self.make_file(name=f'file-{i}.txt')
+
+    def walk(self, url, params):
+        cursor = None
+        while True:
+            response = self.client.get(url, dict(params, **({'cursor': cursor} if cursor else {})))
+            self.assertEqual(response.status_code, 200)
+            payload = response.json()
+            yield payload
+            cursor = payload.get('next_cursor') or payload.get('pagination', {}).get('next_cursor')
+            if not cursor:
+                break
+
+    def test_file_list_pages_by_name(self):
+        pages = list(self.walk('/api/files/', {'sort': 'name', 'page_size': 3}))
+        names = [f['original_filename'] for page in pages for f in page['files']]
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(names, sorted(names))
+        self.assertEqual(len(set(names)), 7)
+        self.assertEqual(pages[1]['folders'], [])
+
+    def test_search_pages_by_upload_time(self):
+        pages = list(self.walk('/api/files/search/', {'page_size': 2}))
+        ids = [f['id'] for page in pages for f in page['results']]
+        expected = list(File.objects.order_by('-uploaded_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages[0]['pagination']['total_count'], 7)
+
+    def test_cursor_for_other_ordering_is_rejected(self):
+        first = self.client.get('/api/files/', {'page_size': 2}).json()
+        response = self.client.get('/api/files/', {'sort': 'name', 'cursor': first['next_cursor']})
+        self.assertEqual(response.status_code, 400)
+
+
+class FullTextSearchTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.liver = self.make_file(name='liver.fastq', title='Liver RNA-seq run', organism='Homo sapiens',
+                                    project='HepAtlas')
+        self.brain = self.make_file(name='brain.fastq', title='Brain atlas', description='liver contamination check',
+                                    project='NeuroMap')
+
+    def search(self, **params):
+        response = self.client.get('/api/files/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_terms_and_prefixes_match(self):
+        self.assertEqual(self.search(q='rna-seq'), [self.liver.id])
+        self.assertEqual(self.search(q='sapi'), [self.liver.id])
+        self.assertEqual(self.search(q='atlas brain'), [self.brain.id])
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search(q='liver', sort_by='relevance'), [self.liver.id, self.brain.id])
+
+    def test_relevance_pages_with_cursor(self):
+        first = self.client.get('/api/files/search/', {'q': 'liver', 'sort_by': 'relevance', 'page_size': 1}).json()
+        cursor = first['pagination']['next_cursor']
+        second = self.search(q='liver', sort_by='relevance', page_size=1, cursor=cursor)
+        self.assertEqual([first['results'][0]['id']] + second, [self.liver.id, self.brain.id])
+
+    def test_field_syntax_combines_with_terms(self):
+        self.assertEqual(self.search(q='project:Neuro liver'), [self.brain.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.brain.title = 'Cortex atlas'
+        self.brain.save()
+        self.assertEqual(self.search(q='cortex'), [self.brain.id])
+        self.brain.delete()
+        self.assertEqual(self.search(q='cortex'), [])
+
+
+class SearchSuggestionTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.make_file(name='a.fastq', title='Liver biopsy reads', organism='Homo sapiens', project='HepAtlas')
+        self.make_file(name='b.fastq', title='Mouse cortex', organism='Mus musculus', project='HepAtlas')
+
+    def suggest(self, q):
+        response = self.client.get('/api/files/suggestions/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [(s['type'], s['value']) for s in response.json()['suggestions']]
+
+    def test_prefix_substring_and_typo(self):
+        self.assertEqual(self.suggest('hep')[0], ('project', 'HepAtlas'))
+        self.assertIn(('organism', 'Homo sapiens'), self.suggest('sapie'))
+        self.assertIn(('organism', 'Mus musculus'), self.suggest('muscalus'))
+
+    def test_mid_word_match_survives_the_candidate_cap(self):
+        # Each distractor shares as many trigrams with 'ome' as 'genome' does and is on more files
+        for index in range(12):
+            for copy in range(2):
+                self.make_file(name=f'd{index}_{copy}.txt', title='', project=f'Omaha{index}')
+        self.make_file(name='g.fa', title='', project='Mouse genome')
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/files/suggestions/', {'q': 'ome', 'limit': 2})
+        self.assertEqual(response.json()['suggestions'][0]['value'], 'Mouse genome')
+        # A single lookup on the trigram index; no LIKE scan over the terms
+        lookups = [q['sql'] for q in queries if 'file_upload_suggestion' in q['sql']]
+        self.assertEqual(len(lookups), 1)
+        self.assertNotIn('LIKE', lookups[0])
+
+    def test_index_tracks_saves_and_deletes(self):
+        from .models import SuggestionTerm
+        term = SuggestionTerm.objects.get(field='project', value='HepAtlas')
+        self.assertEqual(term.file_count, 2)
+
+        liver = File.objects.get(original_filename='a.fastq')
+        liver.project = 'LiverMap'
+        liver.save()
+        self.assertIn(('project', 'LiverMap'), self.suggest('liverm'))
+        self.assertEqual(SuggestionTerm.objects.get(value='HepAtlas').file_count, 1)
+
+        liver.delete()
+        self.assertNotIn(('project', 'LiverMap'), self.suggest('liverm'))
+        self.assertFalse(SuggestionTerm.objects.filter(value='Homo sapiens').exists())
+
+
+class SearchFacetTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.make_file(name='a.fastq', title='liver run', file_format='FASTQ', document_type='Dataset')
+        self.make_file(name='b.vcf', title='liver calls', file_format='VCF', document_type='Dataset')
+        self.make_file(name='c.pdf', title='liver paper', file_format='PDF', document_type='Paper')
+        self.make_file(name='d.fastq', title='brain run', file_format='FASTQ', document_type='Dataset')
+
+    def counts(self, facets, field):
+        return {row[field]: row['count'] for row in facets[field]}
+
+    def test_facets_follow_query_and_other_filters(self):
+        payload = self.client.get('/api/files/search/', {'q': 'liver', 'file_format': 'FASTQ'}).json()
+        facets = payload['facets']
+        self.assertEqual(payload['pagination']['total_count'], 1)
+        # The active facet still lists its siblings; the others are narrowed by it
+        self.assertEqual(self.counts(facets, 'file_format'), {'FASTQ': 1, 'VCF': 1, 'PDF': 1})
+        self.assertEqual(self.counts(facets, 'document_type'), {'Dataset': 1})
+
+    def test_facets_run_in_one_union_and_are_skipped_on_page_turns(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .search_views import FACET_FIELDS
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get('/api/files/search/', {'page_size': 1}).json()
+        grouped = [q['sql'] for q in queries if 'GROUP BY' in q['sql'] and '"document_type"' in q['sql']]
+        self.assertEqual(len(grouped), 1)
+        # One small GROUP BY per facet column plus tags, not one over every column at once
+        self.assertEqual(grouped[0].count('UNION ALL'), len(FACET_FIELDS) + 1)
+        self.assertIn('file_upload_tag', grouped[0])
+        self.assertEqual(first['pagination']['total_count'], 4)
+        self.assertEqual(self.counts(first['facets'], 'document_type'), {'Dataset': 3, 'Paper': 1})
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/files/search/',
+                                     {'page_size': 1, 'cursor': first['pagination']['next_cursor']}).json()
+        self.assertFalse([q for q in queries if '"__count"' in q['sql']])
+        self.assertIsNone(second['facets'])
+        self.assertIsNone(second['pagination']['total_count'])
+        self.assertTrue(second['pagination']['has_next'])
+        counted = self.client.get('/api/files/search/',
+                                  {'page_size': 1, 'cursor': first['pagination']['next_cursor'], 'count': 1})
+        self.assertEqual(counted.json()['pagination']['total_count'], 4)
+
+
+class StatsCacheTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_stats_are_cached_until_a_write(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_file(content=b'x' * 10)
+        self.assertEqual(self.get('/api/files/stats/')['total_size'], 10)
+        self.get('/api/files/facets/')
+        with CaptureQueriesContext(connection) as queries:
+            self.get('/api/files/stats/')
+            self.get('/api/files/facets/')
+        self.assertEqual([q for q in queries if 'file_upload_file' in q['sql']], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_file(name='more.txt', content=b'y' * 5)
+        self.assertEqual(self.get('/api/files/stats/')['total_size'], 15)
+        self.assertEqual(self.get('/api/files/facets/')['total_files'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            File.objects.get(original_filename='more.txt').delete()
+        self.assertEqual(self.get('/api/files/stats/')['total_files'], 1)
+
+    def test_version_bumps_reach_other_processes(self):
+        import multiprocessing
+        from .stats_cache import bump_version, get_version
+        before = get_version(self.user.id)
+        # extract_metadata and run_ncbi_imports bump from their own processes
+        worker = multiprocessing.get_context('fork').Process(target=bump_version, args=(self.user.id,))
+        worker.start()
+        worker.join()
+        self.assertNotEqual(get_version(self.user.id), before)
+
+
+class TagTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rna = self.make_file(name='a.fastq', tags='RNA, liver')
+        self.rnai = self.make_file(name='b.fastq', tags='RNAi')
+
+    def search(self, **params):
+        return self.client.get('/api/files/search/', params).json()
+
+    def test_tag_filter_is_exact(self):
+        self.assertEqual([f['id'] for f in self.search(tag='rna')['results']], [self.rna.id])
+        self.assertEqual([f['id'] for f in self.search(q='tag:RNAi')['results']], [self.rnai.id])
+        listing = self.client.get('/api/files/', {'tag': 'liver'}).json()
+        self.assertEqual([f['id'] for f in listing['files']], [self.rna.id])
+
+    def test_tag_set_follows_edits_and_feeds_facets(self):
+        self.rnai.tags = 'RNAi, liver'
+        self.rnai.save()
+        self.assertEqual(sorted(self.rnai.tag_set.values_list('name', flat=True)), ['RNAi', 'liver'])
+        facets = {row['tag']: row['count'] for row in self.search()['facets']['tags']}
+        self.assertEqual(facets, {'liver': 2, 'RNA': 1, 'RNAi': 1})
+        # Like the other facets, tag counts ignore the tag filter itself so sibling tags stay listed
+        narrowed = self.search(tag='RNAi', file_format='FASTQ')['facets']
+        self.assertEqual({row['tag']: row['count'] for row in narrowed['tags']}, facets)
+        self.assertEqual([(row['file_format'], row['count']) for row in narrowed['file_format']], [('FASTQ', 1)])
+
+
+class MetadataIndexTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.deep = self.make_file(name='deep.fastq', extracted_metadata={
+            'read_count': 2_000_000, 'sequencing_platform': 'Illumina'})
+        self.shallow = self.make_file(name='shallow.fastq', extracted_metadata={
+            'read_count': 5_000, 'sequencing_platform': 'Oxford Nanopore'})
+        self.table = self.make_file(name='table.csv', extracted_metadata={'column_count': 12})
+
+    def search(self, **params):
+        response = self.client.get('/api/files/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_range_and_text_filters(self):
+        self.assertEqual(self.search(q='reads>1000000'), [self.deep.id])
+        self.assertEqual(self.search(q='reads<=5000'), [self.shallow.id])
+        self.assertEqual(self.search(q='platform:illumina'), [self.deep.id])
+        self.assertEqual(self.search(q='reads>1 platform:Illumina'), [self.deep.id])
+
+    def test_sort_by_metadata_key(self):
+        self.assertEqual(self.search(sort_by='reads', sort_order='desc'),
+                         [self.deep.id, self.shallow.id, self.table.id])
+        first = self.client.get('/api/files/search/', {'sort_by': 'reads', 'page_size': 1}).json()
+        rest = self.search(sort_by='reads', page_size=5, cursor=first['pagination']['next_cursor'])
+        self.assertEqual(rest, [self.shallow.id, self.table.id])
+
+    def test_side_table_follows_metadata_updates(self):
+        self.shallow.extracted_metadata = dict(self.shallow.extracted_metadata, read_count=3_000_000)
+        self.shallow.save()
+        self.assertEqual(sorted(self.search(q='reads>1000000')), sorted([self.deep.id, self.shallow.id]))
+
+
+class ExtractionQueueTests(MediaTestCase):
+    READS = b'@HWI-ST1:1:1:1:1\nACGT\n+\nIIII\n'
+
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        response = self.client.post('/api/files/upload/', {
+            'file': SimpleUploadedFile(name, content), 'upload_method': 'Test', 'file_format': 'FASTQ',
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def test_upload_queues_and_worker_fills_metadata(self):
+        from concurrent.futures import ProcessPoolExecutor
+        from .extraction import claim_jobs, process_jobs
+
+        payload = self.upload('reads.fastq', b'@HWI-ST1:1:1:1:1\nACGT\n+\nIIII\n')
+        self.assertEqual(payload['extraction_status'], 'pending')
+        self.assertEqual(payload['extracted_metadata'], {})
+
+        jobs = claim_jobs(10)
+        self.assertEqual([job[0] for job in jobs], [payload['id']])
+        self.assertEqual(claim_jobs(10), [])
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            process_jobs(jobs, pool)
+
+        file_obj = File.objects.get(pk=payload['id'])
+        self.assertEqual(file_obj.extraction_status, 'done')
+        self.assertEqual(file_obj.extracted_metadata['read_count'], 1)
+        self.assertEqual(file_obj.metadata_values.get(key='reads').number_value, 1)
+
+    def test_failures_are_recorded_on_the_row(self):
+        from unittest import mock
+        from .extraction import claim_jobs, process_jobs
+
+        payload = self.upload('broken.fastq', b'@r\nA\n+\nI\n')
+        with mock.patch('file_upload.extraction.run_extractor', side_effect=RuntimeError('boom')):
+            process_jobs(claim_jobs(10))
+        file_obj = File.objects.get(pk=payload['id'])
+        self.assertEqual((file_obj.extraction_status, file_obj.extraction_error), ('failed', 'boom'))
+
+    def test_duplicate_content_is_extracted_once(self):
+        from unittest import mock
+        from .extraction import claim_jobs, process_jobs, run_extractor
+
+        first = self.upload('a.fastq', self.READS)
+        with mock.patch('file_upload.extraction.run_extractor', wraps=run_extractor) as extractor:
+            process_jobs(claim_jobs(10))
+            self.assertEqual(extractor.call_count, 1)
+            # Two more copies in one batch are served from the cache
+            copies = [self.upload('b.fastq', self.READS)['id'], self.upload('c.fastq', self.READS)['id']]
+            process_jobs(claim_jobs(10))
+            self.assertEqual(extractor.call_count, 1)
+
+        for file_obj in File.objects.filter(pk__in=copies + [first['id']]):
+            self.assertEqual(file_obj.extraction_status, 'done')
+            self.assertEqual(file_obj.extractor_version, 'FASTQ/2')
+            self.assertEqual(file_obj.extracted_metadata['read_count'], 1)
+
+    def test_version_bump_reextracts_lazily_and_in_bulk(self):
+        from unittest import mock
+        from django.core.management import call_command
+        from .extraction import claim_jobs, process_jobs
+
+        payload = self.upload('a.fastq', self.READS)
+        process_jobs(claim_jobs(10))
+        with mock.patch.dict('file_upload.metadata_extractor.EXTRACTOR_VERSIONS', {'FASTQ': 3}):
+            preview = self.client.get(f"/api/files/{payload['id']}/preview/").json()
+            self.assertEqual(preview['extraction_status'], 'pending')
+
+            call_command('reextract_metadata', workers=0, stdout=io.StringIO())
+            file_obj = File.objects.get(pk=payload['id'])
+            self.assertEqual((file_obj.extraction_status, file_obj.extractor_version), ('done', 'FASTQ/3'))
+            self.assertEqual(self.client.get(f"/api/files/{payload['id']}/preview/").json()['extraction_status'], 'done')
+
+    def test_unversioned_rows_are_stale(self):
+        from .extraction import claim_jobs, process_jobs, refresh_if_stale
+
+        payload = self.upload('a.fastq', self.READS)
+        process_jobs(claim_jobs(10))
+        # Rows extracted before versioning was introduced
+        File.objects.filter(pk=payload['id']).update(extractor_version='')
+        self.assertTrue(refresh_if_stale(File.objects.get(pk=payload['id'])))
+
+    @override_settings(METADATA_FULL_SCAN=True)
+    def test_fallback_results_are_not_cached(self):
+        from unittest import mock
+        from .extraction import claim_jobs, process_jobs
+        from .models import ExtractionCacheEntry
+
+        payload = self.upload('a.fastq', self.READS)
+        with mock.patch('file_upload.sequence_stats.fastq_stats', side_effect=MemoryError('scan failed')):
+            process_jobs(claim_jobs(10))
+        file_obj = File.objects.get(pk=payload['id'])
+        # Either the scan error or, without numpy, the sampling fallback
+        self.assertIn('extraction_degraded', file_obj.extracted_metadata)
+        self.assertFalse(ExtractionCacheEntry.objects.exists())
+
+
+class SequenceStatsTests(MediaTestCase):
+    FASTQ = (b'@HWI-ST1:1:1:1:1\nACGTNN\n+\nIIII##\n'
+             b'@HWI-ST1:1:1:1:2\nGGCC\n+\n5555\n'
+             b'@HWI-ST1:1:1:1:3\nAT\n+\nII')
+
+    def write(self, name, content, compress=False):
+        import gzip
+        path = os.path.join(self.media_root, name)
+        with (gzip.open if compress else open)(path, 'wb') as handle:
+            handle.write(content)
+        return path
+
+    def test_full_fastq_stats(self):
+        from .sequence_stats import fastq_stats
+        for compress in (False, True):
+            stats = fastq_stats(self.write('reads.fq', self.FASTQ, compress), block_size=16)
+            self.assertEqual(stats['read_count'], 3)
+            self.assertEqual(stats['total_bases'], 12)
+            self.assertEqual((stats['min_read_length'], stats['max_read_length']), (2, 6))
+            self.assertEqual(stats['gc_content'], round(100 * 6 / 12, 2))
+            self.assertEqual(stats['n_content'], round(100 * 2 / 12, 4))
+            self.assertEqual(stats['per_position_quality'][:2], [round((40 + 20 + 40) / 3, 2)] * 2)
+            self.assertEqual(stats['per_position_quality'][4:], [2.0, 2.0])
+
+    def test_fasta_assembly_stats(self):
+        from .metadata_extractor import extract_file_metadata
+        fasta = b'>chr1 Homo sapiens\nACGT\nACGT\nNN\n>chr2\nGGGGCC\n>chr3\nA\n'
+        path = self.write('genome.fa.gz', fasta, compress=True)
+        stats = extract_file_metadata(path, 'FASTA')
+        self.assertEqual((stats['sequence_count'], stats['total_length']), (3, 17))
+        self.assertEqual((stats['n50'], stats['l50']), (10, 1))
+        self.assertEqual(stats['gc_content'], round(100 * 10 / 17, 2))
+        self.assertEqual(stats['n_content'], round(100 * 2 / 17, 4))
+        self.assertEqual(stats['sample_headers'], ['chr1 Homo sapiens', 'chr2', 'chr3'])
+        self.assertEqual(stats['detected_organism'], 'Homo sapiens')
+
+    def test_failed_fasta_scan_falls_back_to_the_head(self):
+        from unittest import mock
+        from .metadata_extractor import DEGRADED_KEY, extract_file_metadata
+        path = self.write('genome.fa', b'>chr1 Homo sapiens\nACGT\n>chr2\nGG\n')
+        with mock.patch.object(sequence_stats, 'available', return_value=True), \
+                mock.patch.object(sequence_stats, 'fasta_stats', side_effect=ValueError('bad block')):
+            metadata = extract_file_metadata(path, 'FASTA')
+        self.assertEqual((metadata['sequence_count'], metadata['detected_organism']), (2, 'Homo sapiens'))
+        self.assertTrue(metadata[DEGRADED_KEY].startswith('bad block'))
+
+    def test_full_scan_is_opt_in(self):
+        from .metadata_extractor import extract_file_metadata
+        path = self.write('reads.fastq', self.FASTQ)
+        self.assertNotIn('total_bases', extract_file_metadata(path, 'FASTQ', full_scan=False))
+        metadata = extract_file_metadata(path, 'FASTQ', full_scan=True)
+        self.assertEqual((metadata['read_count'], metadata['stats_scope']), (3, 'full_file'))
+        self.assertEqual(metadata['sequencing_platform'], 'Illumina')
+
+
+def bgzf_compress(data: bytes, block_size: int = 65280) -> bytes:
+    """Minimal BGZF writer for fixtures: gzip members carrying the BC block-size field"""
+    import struct
+    import zlib
+    out = []
+    for start in range(0, len(data), block_size):
+        chunk = data[start:start + block_size]
+        deflate = zlib.compressobj(6, zlib.DEFLATED, -15)
+        body = deflate.compress(chunk) + deflate.flush()
+        header = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' + struct.pack('<H', len(body) + 25)
+        out.append(header + body + struct.pack('<II', zlib.crc32(chunk), len(chunk)))
+    out.append(bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000'))
+    return b''.join(out)
+
+
+class VcfSummaryTests(MediaTestCase):
+    VCF = (
+        b'##fileformat=VCFv4.2\n'
+        b'##contig=<ID=chr1,length=248956422>\n'
+        b'##contig=<ID=chr2,length=242193529>\n'
+        b'##INFO=<ID=DP,Number=1,Type=Integer,Description="Total depth, all samples">\n'
+        b'##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n'
+        b'#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS1\tS2\n'
+        b'chr1\t100\t.\tA\tG\t50\tPASS\tDP=10\tGT\t0/1\t0/0\n'
+        b'chr1\t200\t.\tC\tA\t50\tPASS\tDP=10\tGT\t0/1\t0/0\n'
+        b'chr1\t300\t.\tAT\tA\t50\tPASS\tDP=10\tGT\t0/1\t0/0\n'
+        b'chr2\t400\t.\tC\tT,G\t50\tPASS\tDP=10\tGT\t1/2\t0/0\n'
+        b'chr2\t500\t.\tG\t<DEL>\t50\tPASS\tDP=10\tGT\t0/1\t0/0\n'
+    )
+
+    def write(self, name, content):
+        path = os.path.join(self.media_root, name)
+        with open(path, 'wb') as handle:
+            handle.write(content)
+        return path
+
+    def assert_summary(self, summary):
+        self.assertEqual(summary['variant_count'], 5)
+        self.assertEqual(summary['variants_per_chromosome'], {'chr1': 3, 'chr2': 2})
+        self.assertEqual((summary['snv_count'], summary['indel_count'], summary['other_allele_count']), (4, 1, 1))
+        self.assertEqual(summary['multiallelic_count'], 1)
+        self.assertEqual((summary['transitions'], summary['transversions']), (2, 2))
+        self.assertEqual(summary['ts_tv_ratio'], 1.0)
+        self.assertEqual(summary['contigs'][0], {'id': 'chr1', 'length': 248956422})
+        self.assertEqual(summary['info_fields'][0]['description'], 'Total depth, all samples')
+        self.assertEqual(summary['sample_names'], ['S1', 'S2'])
+
+    def test_sequential_summary(self):
+        from .metadata_extractor import extract_file_metadata
+        self.assert_summary(extract_file_metadata(self.write('calls.vcf', self.VCF), 'VCF'))
+
+    def test_parallel_chunks_stitch_records(self):
+        from .vcf_summary import summarize_vcf
+        plain = self.write('calls.vcf', self.VCF)
+        bgzipped = self.write('calls.vcf.gz', bgzf_compress(self.VCF, block_size=40))
+        for path, chunk_size in ((plain, 29), (plain, 1000), (bgzipped, 60)):
+            self.assert_summary(summarize_vcf(path, workers=2, chunk_size=chunk_size, parallel_threshold=0))
+
+    @override_settings(VCF_SUMMARY_WORKERS=0, METADATA_WORKERS=4)
+    def test_inner_pool_shares_cpus_with_extraction_workers(self):
+        from unittest import mock
+        from .metadata_extractor import extract_file_metadata
+        path = self.write('calls.vcf', self.VCF)
+        with mock.patch('file_upload.metadata_extractor.os.cpu_count', return_value=8), \
+                mock.patch('file_upload.vcf_summary.summarize_vcf', return_value={}) as summarize:
+            extract_file_metadata(path, 'VCF')
+        self.assertEqual(summarize.call_args.kwargs['workers'], 2)
+
+    def test_failed_summary_is_flagged(self):
+        from unittest import mock
+        from .metadata_extractor import DEGRADED_KEY, extract_file_metadata
+        path = self.write('calls.vcf', self.VCF)
+        with mock.patch('file_upload.vcf_summary.summarize_vcf', side_effect=ValueError('truncated record')):
+            metadata = extract_file_metadata(path, 'VCF')
+        self.assertEqual((metadata[DEGRADED_KEY], metadata['file_size']), ('truncated record', len(self.VCF)))
+
+
+class CompressionTests(MediaTestCase):
+    FASTQ = SequenceStatsTests.FASTQ + b'\n'
+
+    def test_open_binary_detects_compression_by_magic(self):
+        import gzip
+        from .compression import detect_compression, open_binary, zstandard
+        payload = b''.join(b'line %d\n' % index for index in range(2000))
+        variants = [('plain', payload, None), ('gzip', gzip.compress(payload), 'gzip'),
+                    ('bgzf', bgzf_compress(payload, block_size=500), 'bgzf')]
+        if zstandard is not None:
+            variants.append(('zstd', zstandard.ZstdCompressor().compress(payload), 'zstd'))
+        for name, content, kind in variants:
+            path = os.path.join(self.media_root, name)
+            with open(path, 'wb') as handle:
+                handle.write(content)
+            self.assertEqual(detect_compression(path), kind)
+            for threads in (1, 3):
+                with open_binary(path, threads=threads) as handle:
+                    self.assertEqual(handle.readline(), b'line 0\n')
+                    self.assertEqual(handle.read(), payload[len(b'line 0\n'):], (name, threads))
+
+    def test_compressed_fastq_gets_metadata_and_preview(self):
+        import gzip
+        from rest_framework.test import APIClient
+        from .metadata_extractor import extract_file_metadata
+
+        file_obj = self.make_file('SRR000001.fastq.gz', gzip.compress(self.FASTQ), file_format='FASTQ')
+        metadata = extract_file_metadata(file_obj.file.path, 'FASTQ')
+        self.assertEqual(metadata['read_count'], 3)
+        self.assertEqual(metadata['sequencing_platform'], 'Illumina')
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        preview = client.get(f'/api/files/{file_obj.id}/preview/').json()['preview']
+        self.assertTrue(preview['content'].startswith('@HWI-ST1:1:1:1:1\nACGTNN'))
+
+    def test_upload_infers_format_under_compression_suffix(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from rest_framework.test import APIClient
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/files/upload/', {
+            'file': SimpleUploadedFile('reads.fq.gz', b'\x1f\x8b'), 'upload_method': 'Test',
+        }, format='multipart')
+        self.assertEqual(response.json()['file_format'], 'FASTQ')
+
+
+class AlignmentSummaryTests(MediaTestCase):
+    HEADER = (
+        '@HD\tVN:1.6\tSO:coordinate\n'
+        '@SQ\tSN:chr1\tLN:1000\n'
+        '@SQ\tSN:chr2\tLN:500\n'
+        '@RG\tID:lane1\tSM:NA12878\tPL:ILLUMINA\tLB:lib1\n'
+        '@PG\tID:samtools\tPN:samtools\tPP:bwa\tVN:1.17\tCL:samtools sort\n'
+        '@PG\tID:bwa\tPN:bwa\tVN:0.7.17\tCL:bwa mem ref.fa r1.fq\n'
+        '@CO\tuser comment\n'
+    )
+
+    def bam_bytes(self):
+        import struct
+        text = self.HEADER.encode()
+        body = b'BAM\x01' + struct.pack('<i', len(text)) + text + struct.pack('<i', 2)
+        for name, length in ((b'chr1', 1000), (b'chr2', 500)):
+            body += struct.pack('<i', len(name) + 1) + name + b'\x00' + struct.pack('<i', length)
+        return bgzf_compress(body + b'\x00' * 64, block_size=100)
+
+    def bai_bytes(self):
+        import struct
+        ref1 = (struct.pack('<i', 2) + struct.pack('<Ii', 4681, 1) + b'\x00' * 16
+                + struct.pack('<Ii', 37450, 2) + b'\x00' * 16 + struct.pack('<QQ', 90, 3)
+                + struct.pack('<i', 1) + b'\x00' * 8)
+        ref2 = struct.pack('<i', 1) + struct.pack('<Ii', 37450, 2) + b'\x00' * 16 + struct.pack('<QQ', 5, 1)
+        ref2 += struct.pack('<i', 0)
+        return b'BAI\x01' + struct.pack('<i', 2) + ref1 + ref2 + struct.pack('<Q', 7)
+
+    def test_bam_header_and_uploaded_index(self):
+        from .extraction import claim_jobs, enqueue_extraction, process_jobs
+
+        bam = self.make_file('sample.bam', self.bam_bytes(), file_format='BAM')
+        enqueue_extraction(bam)
+        process_jobs(claim_jobs(10))
+        bam.refresh_from_db()
+        metadata = bam.extracted_metadata
+        self.assertEqual((metadata['alignment_format'], metadata['sort_order']), ('BAM', 'coordinate'))
+        self.assertEqual(metadata['references'], [{'name': 'chr1', 'length': 1000}, {'name': 'chr2', 'length': 500}])
+        self.assertEqual(metadata['samples'], ['NA12878'])
+        self.assertEqual(metadata['sequencing_platform'], 'ILLUMINA')
+        self.assertEqual([program['id'] for program in metadata['programs']], ['bwa', 'samtools'])
+        self.assertFalse(metadata['indexed'])
+
+        # Uploading the index re-queues the BAM, which now reports idxstats-style counts
+        index = self.make_file('sample.bam.bai', self.bai_bytes())
+        enqueue_extraction(index)
+        process_jobs(claim_jobs(10))
+        bam.refresh_from_db()
+        metadata = bam.extracted_metadata
+        self.assertEqual((metadata['index_type'], metadata['mapped_reads'], metadata['unmapped_reads']), ('bai', 95, 11))
+        self.assertEqual(metadata['reads_per_reference'][1], {'name': 'chr2', 'mapped': 5, 'unmapped': 1})
+        self.assertEqual(bam.metadata_values.get(key='reads').number_value, 106)
+
+    def test_corrupt_index_is_flagged(self):
+        from .metadata_extractor import DEGRADED_KEY, extract_file_metadata
+        bam = os.path.join(self.media_root, 'sample.bam')
+        bai = os.path.join(self.media_root, 'sample.bam.bai')
+        with open(bam, 'wb') as handle:
+            handle.write(self.bam_bytes())
+        with open(bai, 'wb') as handle:
+            handle.write(self.bai_bytes()[:30])
+        metadata = extract_file_metadata(bam, 'BAM', index_path=bai)
+        self.assertIn(DEGRADED_KEY, metadata)
+        self.assertEqual(metadata['file_extension'], '.bam')
+
+    def test_sam_and_cram_headers(self):
+        import struct
+        from .alignment_summary import summarize_alignment
+
+        sam = os.path.join(self.media_root, 'reads.sam')
+        with open(sam, 'w') as handle:
+            handle.write(self.HEADER + 'r1\t0\tchr1\t1\t60\t4M\t*\t0\t0\tACGT\tIIII\n')
+        self.assertEqual(summarize_alignment(sam)['reference_count'], 2)
+
+        text = self.HEADER.encode()
+        block_data = struct.pack('<i', len(text)) + text
+        # Raw (uncompressed) file-header block; sizes under 0x4000 encode as two-byte ITF8
+        block = bytes([0, 0, 0]) + struct.pack('>H', 0x8000 | len(block_data)) * 2 + block_data + b'\x00' * 4
+        container = bytes([0xFF, 0xFF, 0xFF, 0xFF, 0x0F, 0, 0, 0, 0, 0, 1, 0]) + b'\x00' * 4
+        cram = os.path.join(self.media_root, 'reads.cram')
+        with open(cram, 'wb') as handle:
+            handle.write(b'CRAM\x03\x00' + b'\x00' * 20 + struct.pack('<i', len(block)) + container + block)
+        metadata = summarize_alignment(cram)
+        self.assertEqual((metadata['alignment_format'], metadata['format_version']), ('CRAM', '1.6'))
+        self.assertEqual(metadata['read_groups'][0]['library'], 'lib1')
+
+
+@skipUnless(h5ad_summary.available(), 'h5py is not installed')
+class H5adSummaryTests(MediaTestCase):
+    def write_h5ad(self, path, with_umap=True):
+        import h5py
+        import numpy as np
+        with h5py.File(path, 'w') as file:
+            file.attrs['encoding-type'] = 'anndata'
+            file.attrs['encoding-version'] = '0.1.0'
+            x = file.create_group('X')
+            x.attrs.update({'encoding-type': 'csr_matrix', 'encoding-version': '0.1.0', 'shape': (4, 5)})
+            x['data'] = np.ones(6, dtype='float32')
+            x['indices'] = np.array([0, 1, 2, 3, 4, 0])
+            x['indptr'] = np.array([0, 2, 4, 5, 6])
+            obs = file.create_group('obs')
+            obs.attrs.update({'encoding-type': 'dataframe', '_index': '_index', 'column-order': ['cell_type', 'n_genes']})
+            obs['_index'] = np.array([b'c1', b'c2', b'c3', b'c4'], dtype=h5py.string_dtype())
+            obs['n_genes'] = np.array([2, 2, 1, 1])
+            cell_type = obs.create_group('cell_type')
+            cell_type.attrs['encoding-type'] = 'categorical'
+            cell_type['codes'] = np.array([0, 1, 0, 1], dtype='int8')
+            cell_type['categories'] = np.array([b'B', b'T'], dtype=h5py.string_dtype())
+            var = file.create_group('var')
+            var.attrs.update({'encoding-type': 'dataframe', '_index': '_index', 'column-order': []})
+            var['_index'] = np.array([b'g%d' % i for i in range(5)], dtype=h5py.string_dtype())
+            obsm = file.create_group('obsm')
+            obsm['X_pca'] = np.zeros((4, 3), dtype='float32')
+            if with_umap:
+                obsm['X_umap'] = np.zeros((4, 2), dtype='float32')
+            file.create_group('layers')['counts'] = np.zeros((4, 5), dtype='int32')
+
+    def test_summary_reads_structure_lazily(self):
+        from .metadata_extractor import extract_file_metadata
+        path = os.path.join(self.media_root, 'pbmc.h5ad')
+        self.write_h5ad(path)
+        metadata = extract_file_metadata(path, 'other')
+        self.assertEqual((metadata['n_obs'], metadata['n_vars']), (4, 5))
+        self.assertEqual((metadata['x_encoding'], metadata['x_nnz'], metadata['x_density']), ('csr_matrix', 6, 0.3))
+        self.assertEqual(metadata['obs_columns'], [
+            {'name': 'cell_type', 'dtype': 'category', 'categories': 2}, {'name': 'n_genes', 'dtype': 'int64'},
+        ])
+        self.assertEqual(metadata['obsm'], {'X_pca': [4, 3], 'X_umap': [4, 2]})
+        self.assertEqual(metadata['layers']['counts'], {'encoding': 'dense', 'shape': [4, 5], 'dtype': 'int32'})
+        self.assertTrue(metadata['has_umap_layout'])
+
+    def test_unreadable_file_is_flagged(self):
+        from .metadata_extractor import DEGRADED_KEY, extract_file_metadata
+        path = os.path.join(self.media_root, 'broken.h5ad')
+        with open(path, 'wb') as handle:
+            handle.write(b'not an HDF5 file')
+        metadata = extract_file_metadata(path, 'H5AD')
+        self.assertIn(DEGRADED_KEY, metadata)
+        self.assertNotIn('has_umap_layout', metadata)
+
+    def test_publish_skips_layout_when_metadata_has_umap(self):
+        from unittest import mock
+        from rest_framework.test import APIClient
+        source = os.path.join(self.media_root, 'source.h5ad')
+        self.write_h5ad(source)
+        with open(source, 'rb') as handle:
+            file_obj = self.make_file('pbmc.h5ad', handle.read(), file_format='H5AD')
+        file_obj.extracted_metadata = {'has_umap_layout': True}
+        file_obj.save()
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with override_settings(CELLXGENE_DATA_DIR=os.path.join(self.media_root, 'cellxgene')), \
+                mock.patch('file_upload.api_views.prepare_h5ad_for_cellxgene') as prepare, \
+                mock.patch('file_upload.api_views.restart_cellxgene_process', return_value={'status': 'skipped'}):
+            response = client.post(f'/api/files/{file_obj.id}/publish-cellxgene/')
+        self.assertEqual(response.status_code, 200, response.content)
+        prepare.assert_not_called()
+        self.assertEqual(response.json()['layout']['status'], 'skipped')
+
+
+@override_settings(CHUNKED_HEAD_EXTRACTION_BYTES=200)
+class ChunkedHeadExtractionTests(MediaTestCase):
+    def test_head_metadata_is_ready_before_complete(self):
+        import gzip
+        from rest_framework.test import APIClient
+        from .extraction import claim_jobs, process_jobs
+        from .models import UploadSession
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        reads = b''.join(b'@HWI-ST1:1:1:1:%d\nACGTACGTNN\n+\nIIIIIIIII#\n' % index for index in range(3000))
+        content = gzip.compress(reads)
+        session_id = client.post('/api/files/chunked/init/', {
+            'filename': 'reads.fastq.gz', 'total_size': len(content), 'chunk_size': 256,
+        }, format='json').json()['session_id']
+
+        def send(start, end):
+            response = client.put(f'/api/files/chunked/{session_id}/chunk/', content[start:end],
+                                  content_type='application/octet-stream',
+                                  HTTP_CONTENT_RANGE=f'bytes {start}-{end - 1}/{len(content)}')
+            self.assertEqual(response.status_code, 200, response.content)
+
+        # An out-of-order chunk does not count towards the contiguous head
+        send(256, 512)
+        self.assertEqual(UploadSession.objects.get(session_id=session_id).head_metadata, {})
+        send(0, 256)
+        head = UploadSession.objects.get(session_id=session_id).head_metadata
+        self.assertEqual((head['stats_scope'], head['detected_format']), ('head', 'FASTQ'))
+        self.assertGreater(head['read_count'], 0)
+        self.assertEqual(head['sequencing_platform'], 'Illumina')
+
+        for start in range(512, len(content), 256):
+            send(start, min(start + 256, len(content)))
+        payload = client.post(f'/api/files/chunked/{session_id}/complete/').json()
+        self.assertEqual(payload['file_format'], 'FASTQ')
+        self.assertEqual(payload['extracted_metadata']['stats_scope'], 'head')
+        self.assertEqual(payload['extraction_status'], 'pending')
+
+        process_jobs(claim_jobs(10))
+        self.assertEqual(File.objects.get(pk=payload['id']).extracted_metadata['read_count'], 1000)
+
+    def test_zstd_head_is_capped_while_inflating(self):
+        from unittest import mock
+        from .compression import zstandard
+        from .head_extraction import _inflate_prefix
+        if zstandard is None:
+            self.skipTest('zstandard is not installed')
+
+        bomb = zstandard.ZstdCompressor().compress(b'A' * (64 * 1024 * 1024))
+        with mock.patch('file_upload.head_extraction.MAX_DECOMPRESSED_HEAD', 1024 * 1024):
+            self.assertEqual(len(_inflate_prefix(bomb, 'zstd')), 1024 * 1024)
+        text = b''.join(b'line %d\n' % index for index in range(50000))
+        compressed = zstandard.ZstdCompressor().compress(text)
+        head = _inflate_prefix(compressed[:len(compressed) // 2], 'zstd')
+        self.assertTrue(head and text.startswith(head))
+
+
+class SequencePreviewIndexTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def preview(self, file_obj, **params):
+        return self.client.get(f'/api/files/{file_obj.id}/preview/', params).json()['preview']
+
+    def test_fasta_region_by_record_name(self):
+        chr2 = ''.join('ACGT'[index % 4] for index in range(250))
+        content = f'>chr1 first\nNNNNNNNNNN\nNNNNN\n>chr2\n' + '\n'.join(
+            chr2[start:start + 60] for start in range(0, 250, 60)) + '\n'
+        file_obj = self.make_file('genome.fa', content.encode(), file_format='FASTA')
+
+        preview = self.preview(file_obj, record='chr2', offset=58, limit=5)
+        self.assertEqual(preview['content'], f'>chr2:59-63\n{chr2[58:63]}')
+        self.assertEqual((preview['sequence_length'], preview['has_more']), (250, True))
+        self.assertEqual(self.preview(file_obj, record='chr2', offset=240)['content'].split('\n')[1], chr2[240:])
+
+        listing = self.preview(file_obj, offset=1)
+        self.assertEqual(listing['records'], [{'name': 'chr2', 'length': 250}])
+        with open(os.path.join(self.media_root, 'indexes', file_obj.file.name + '.fai')) as handle:
+            self.assertEqual(handle.readline(), 'chr1\t15\t12\t10\t11\n')
+        self.assertEqual(self.preview(file_obj, record='chrX')['type'], 'error')
+
+        # Indexes are removed along with their blob
+        file_obj.delete()
+        self.assertEqual(FileTombstone.objects.count(), 2)
+        reap_tombstones()
+        self.assertFalse(os.listdir(os.path.join(self.media_root, 'indexes', 'files', str(self.user.id))))
+
+    def test_fastq_window_by_read_ordinal(self):
+        import gzip
+        from unittest import mock
+        from . import sequence_index
+        reads = b''.join(b'@read%d\nACGT\n+\nIIII\n' % index for index in range(2500))
+        file_obj = self.make_file('reads.fastq.gz', gzip.compress(reads), file_format='FASTQ')
+
+        with mock.patch.object(sequence_index, 'FASTQ_INDEX_INTERVAL', 100):
+            preview = self.preview(file_obj, offset=2498, limit=5)
+        self.assertEqual(preview['content'].split('\n'), ['@read2498', 'ACGT', '+', 'IIII', '@read2499', 'ACGT', '+', 'IIII'])
+        self.assertEqual((preview['record_count'], preview['has_more']), (2500, False))
+        self.assertEqual(self.preview(file_obj, offset=1234, limit=1)['content'].split('\n')[0], '@read1234')
+        self.assertTrue(self.preview(file_obj)['content'].startswith('@read0\nACGT'))
+
+
+class TextPreviewIndexTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def preview(self, file_obj, **params):
+        return self.client.get(f'/api/files/{file_obj.id}/preview/', params).json()['preview']
+
+    def test_line_index_checkpoints(self):
+        from unittest import mock
+        from . import line_index
+        path = os.path.join(self.media_root, 'log.txt')
+        lines = [b'line %d' % number for number in range(1000)]
+        with open(path, 'wb') as handle:
+            handle.write(b'\n'.join(lines))
+        with mock.patch.object(line_index, 'LINE_INDEX_INTERVAL', 64), \
+                mock.patch.object(line_index, 'SCAN_BLOCK', 100):
+            index = line_index.build_line_index(path)
+        self.assertEqual(index['line_count'], 1000)
+        self.assertEqual(len(index['offsets']), 16)
+        with open(path, 'rb') as handle:
+            for checkpoint, offset in enumerate(index['offsets']):
+                handle.seek(offset)
+                self.assertEqual(handle.readline().rstrip(), lines[checkpoint * 64])
+        self.assertEqual(line_index.read_lines(path, index, 998, 10), ['line 998', 'line 999'])
+
+    def test_text_and_csv_windows(self):
+        log = self.make_file('run.log.txt', b''.join(b'event %d\n' % n for n in range(25000)), file_format='txt')
+        preview = self.preview(log, offset=20001, limit=2)
+        self.assertEqual(preview['content'], 'event 20001\nevent 20002')
+        self.assertEqual((preview['line_count'], preview['has_more']), (25000, True))
+        self.assertTrue(self.preview(log)['content'].startswith('event 0\n'))
+
+        table = b'sample\tcount\n' + b''.join(b's%d\t%d\n' % (n, n * 2) for n in range(30000))
+        tsv = self.make_file('counts.tsv', table, file_format='TSV')
+        preview = self.preview(tsv, offset=29998, limit=5)
+        self.assertEqual(preview['columns'], ['sample', 'count'])
+        self.assertEqual(preview['rows'], [['s29998', '59996'], ['s29999', '59998']])
+        self.assertEqual((preview['row_count'], preview['has_more']), (30000, False))
+
+
+class GzipIndexTests(MediaTestCase):
+    PAYLOAD = b''.join(b'record %06d\n' % number for number in range(20000))
+
+    def stored(self, name, content):
+        return self.make_file(name, content).file.path
+
+    def assert_random_reads(self, path):
+        for offset in (0, 1, 77777, 150000, len(self.PAYLOAD) - 5):
+            with gzip_index.open_at(path, offset) as handle:
+                self.assertEqual(handle.read(20), self.PAYLOAD[offset:offset + 20], offset)
+
+    def test_bgzf_and_multi_member_seek_points(self):
+        import gzip
+        from unittest import mock
+        members = b''.join(gzip.compress(self.PAYLOAD[start:start + 5000])
+                           for start in range(0, len(self.PAYLOAD), 5000))
+        with mock.patch.object(gzip_index, 'CHECKPOINT_SPAN', 16000):
+            for name, content, kind in (('a.txt.gz', bgzf_compress(self.PAYLOAD, 4000), 'bgzf'),
+                                        ('b.txt.gz', members, 'gzip')):
+                path = self.stored(name, content)
+                self.assert_random_reads(path)
+                index = gzip_index.build_gzip_index(path)
+                self.assertEqual((index['kind'], index['size']), (kind, len(self.PAYLOAD)))
+                self.assertGreater(len(index['points']), 10)
+                for compressed, decompressed in index['points']:
+                    with open(path, 'rb') as raw:
+                        raw.seek(compressed)
+                        with gzip.GzipFile(fileobj=raw) as handle:
+                            self.assertEqual(handle.read(12), self.PAYLOAD[decompressed:decompressed + 12])
+
+    def test_single_member_gzip_reads_correctly(self):
+        import gzip
+        path = self.stored('c.txt.gz', gzip.compress(self.PAYLOAD))
+        self.assert_random_reads(path)
+
+    def test_large_first_member_stops_the_scan(self):
+        import gzip
+        from unittest import mock
+        path = self.stored('e.txt.gz', gzip.compress(self.PAYLOAD) + gzip.compress(self.PAYLOAD))
+        with mock.patch.object(gzip_index, 'FIRST_MEMBER_SCAN_LIMIT', 100000):
+            index = gzip_index.build_gzip_index(path)
+            for offset in (1, 150000, 2 * len(self.PAYLOAD) - 20):
+                with gzip_index.open_at(path, offset) as handle:
+                    self.assertEqual(handle.read(20), (self.PAYLOAD * 2)[offset:offset + 20], offset)
+        self.assertEqual((index['points'], index['sequential']), ([[0, 0]], True))
+
+    def test_member_scan_inflates_in_bounded_steps(self):
+        import gzip
+        import zlib
+        from unittest import mock
+        outputs = []
+        decompressobj = zlib.decompressobj
+
+        class Recording:
+            def __init__(self, *args):
+                self.inner = decompressobj(*args)
+
+            def decompress(self, data, max_length=0):
+                block = self.inner.decompress(data, max_length)
+                outputs.append(len(block))
+                return block
+
+            def __getattr__(self, name):
+                return getattr(self.inner, name)
+
+        members = gzip.compress(b'\0' * 3000000) + gzip.compress(b'x' * 10)
+        path = self.stored('zeros.gz', members)
+        with mock.patch.object(gzip_index.zlib, 'decompressobj', Recording):
+            index = gzip_index.build_gzip_index(path)
+        self.assertEqual((index['size'], index['members']), (3000010, 2))
+        self.assertLessEqual(max(outputs), gzip_index.SCAN_CHUNK)
+
+    @skipUnless(gzip_index.available(), 'indexed_gzip is not installed')
+    def test_single_member_gzip_uses_zran_index(self):
+        import gzip
+        from unittest import mock
+        path = self.stored('d.txt.gz', gzip.compress(self.PAYLOAD))
+        with mock.patch.object(gzip_index, 'CHECKPOINT_SPAN', 16000):
+            self.assert_random_reads(path)
+        name = os.path.relpath(path, self.media_root)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, 'indexes', name + '.gzidx')))
+
+
+class RegionQueryTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bgzip(self, text):
+        from .compression import bgzf_block
+        data = text.encode()
+        return b''.join(bgzf_block(data[start:start + 3000]) for start in range(0, len(data), 3000)) + bgzf_block(b'')
+
+    def region(self, file_obj, region, **params):
+        return self.client.get(f'/api/files/{file_obj.id}/region/', {'region': region, **params})
+
+    def run_worker(self):
+        from .extraction import claim_jobs, process_jobs
+        process_jobs(claim_jobs(10))
+
+    def test_vcf_region_matches_linear_scan(self):
+        import random
+        from .region_index import build_region_index, query_region
+        rng = random.Random(7)
+        lines = ['##fileformat=VCFv4.2', '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO']
+        records = []
+        for chrom in ('chr1', 'chr2'):
+            position = 1
+            for _ in range(2000):
+                position += rng.randint(1, 400)
+                ref = rng.choice(['A', 'AC', 'ACGTACGT'])
+                info = f'SVTYPE=DEL;END={position + 100000}' if rng.random() < 0.01 else '.'
+                records.append((chrom, position, ref, info))
+                lines.append(f'{chrom}\t{position}\t.\t{ref}\tT\t50\tPASS\t{info}')
+        file_obj = self.make_file('calls.vcf.gz', self.bgzip('\n'.join(lines) + '\n'), file_format='VCF')
+        index = build_region_index(file_obj.file.path, 'VCF')
+        self.assertEqual(index['records'], 4000)
+
+        for chrom, begin, end in (('chr1', 0, 100), ('chr1', 200000, 230000), ('chr2', 350000, 351000),
+                                  ('chr2', 10 ** 7, 10 ** 7 + 10), ('chr3', 0, 1000)):
+            expected = []
+            for name, position, ref, info in records:
+                stop = position - 1 + len(ref)
+                if 'END=' in info:
+                    stop = int(info.rsplit('=', 1)[1])
+                if name == chrom and position - 1 < end and stop > begin:
+                    expected.append(position)
+            found = [int(line.split('\t')[1]) for line in query_region(file_obj.file.path, index, chrom, begin, end)]
+            self.assertEqual(found, expected, (chrom, begin, end))
+
+        # The first query only queues the index build for the extraction worker
+        self.assertEqual(self.region(file_obj, 'chr1:200,001-230,000').json()['status'], 'indexing')
+        self.run_worker()
+        payload = self.region(file_obj, 'chr1:200,001-230,000', limit=3).json()
+        self.assertEqual((payload['start'], payload['end'], payload['count']), (200001, 230000, 3))
+        self.assertTrue(payload['truncated'])
+        self.assertEqual(payload['references'], ['chr1', 'chr2'])
+        clamped = self.region(file_obj, 'chr1:200,001-230,000', limit=-5).json()
+        self.assertEqual((clamped['count'], len(clamped['records']), clamped['truncated']), (1, 1, True))
+
+    def test_bed_and_rejections(self):
+        bed = 'track name=peaks\nchr1\t100\t200\tp1\nchr1\t150\t400\tp2\nchr1\t500\t600\tp3\n'
+        from unittest import mock
+        file_obj = self.make_file('peaks.bed.gz', self.bgzip(bed), file_format='BED')
+        unsorted = self.make_file('unsorted.bed.gz', self.bgzip('chr1\t500\t600\nchr1\t100\t200\n'), file_format='BED')
+        self.assertEqual(self.region(file_obj, 'chr1:201-450').status_code, 202)
+        self.assertEqual(self.region(unsorted, 'chr1').status_code, 202)
+        self.run_worker()
+        records = self.region(file_obj, 'chr1:201-450').json()['records']
+        self.assertEqual([line.split('\t')[3] for line in records], ['p2'])
+
+        # The failed build is recorded, not repeated per query
+        with mock.patch('file_upload.region_index.build_region_index') as build:
+            response = self.region(unsorted, 'chr1')
+            self.run_worker()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not sorted', response.json()['error'])
+        build.assert_not_called()
+        import gzip
+        plain_gzip = self.make_file('plain.bed.gz', gzip.compress(bed.encode()), file_format='BED')
+        self.assertIn('bgzip', self.region(plain_gzip, 'chr1').json()['error'])
+        self.assertEqual(self.region(file_obj, 'chr1:9-2').status_code, 400)
+
+
+class NcbiImportTests(MediaTestCase):
+    BODY = b'>NC_000001.1 test\n' + b'ACGT' * 100000 + b'\n'
+
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stub_response(self, body, on_chunk=None):
+        class Stub:
+            status_code = 200
+            headers = {'Content-Length': str(len(body))}
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def iter_content(self, chunk_size):
+                for start in range(0, len(body), chunk_size):
+                    if on_chunk:
+                        on_chunk(start)
+                    yield body[start:start + chunk_size]
+        return Stub()
+
+    def submit(self, url='https://www.ncbi.nlm.nih.gov/nuccore/NC_000001.1'):
+        response = self.client.post('/api/files/ncbi/import/', {'url': url, 'tags': 'chr1'}, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        return response.json()['job']
+
+    def test_import_job_streams_into_final_storage(self):
+        import hashlib
+        from unittest import mock
+        from .ncbi_imports import claim_import_jobs, run_import_job
+
+        job = self.submit()
+        self.assertEqual(job['status'], 'queued')
+        self.assertEqual(claim_import_jobs(10), [job['id']])
+        with mock.patch('file_upload.ncbi_client.requests.Session.get', return_value=self.stub_response(self.BODY)), \
+                mock.patch('file_upload.ncbi_client._fetch_summary', return_value={'title': 'Test contig'}), \
+                mock.patch('tempfile.mkstemp') as mkstemp:
+            self.assertEqual(run_import_job(job['id']), 'done')
+        mkstemp.assert_not_called()
+
+        payload = self.client.get(f"/api/files/ncbi/jobs/{job['id']}/").json()
+        self.assertEqual((payload['job']['status'], payload['job']['progress']), ('done', 1.0))
+        self.assertEqual(payload['job']['bytes_downloaded'], len(self.BODY))
+        file_obj = File.objects.get(pk=payload['file']['id'])
+        self.assertTrue(file_obj.file.name.startswith(f'files/{self.user.id}/'))
+        self.assertEqual(file_obj.file_size, len(self.BODY))
+        self.assertEqual(file_obj.checksum, hashlib.md5(self.BODY).hexdigest())
+        self.assertEqual(file_obj.tags, 'NCBI,NUCCORE,chr1')
+        with open(file_obj.file.path, 'rb') as handle:
+            self.assertEqual(handle.read(), self.BODY)
+
+    @override_settings(NCBI_IMPORT_PROGRESS_SECONDS=0)
+    def test_requeued_download_stops_and_leaves_nothing_behind(self):
+        from unittest import mock
+        from .models import FileTombstone, NcbiImportJob
+        from .ncbi_imports import claim_import_jobs, requeue_stale_imports, run_import_job
+
+        job = self.submit()
+        claim_import_jobs(10)
+        blob_names = []
+
+        def requeue_midway(offset):
+            if offset >= len(self.BODY) // 2 and not blob_names:
+                # A negative timeout makes every running job look stalled
+                self.assertEqual(requeue_stale_imports(timeout_seconds=-60, exclude_ids=[job['id']]), 0)
+                blob_names.append(NcbiImportJob.objects.get(pk=job['id']).blob_name)
+                self.assertEqual(requeue_stale_imports(timeout_seconds=-60), 1)
+
+        response = self.stub_response(self.BODY, on_chunk=requeue_midway)
+        with mock.patch('file_upload.ncbi_client.requests.Session.get', return_value=response), \
+                mock.patch('file_upload.ncbi_client.DOWNLOAD_CHUNK_BYTES', 4096):
+            self.assertEqual(run_import_job(job['id']), 'lost')
+        requeued = NcbiImportJob.objects.get(pk=job['id'])
+        self.assertEqual((requeued.status, requeued.bytes_downloaded, requeued.blob_name), ('queued', 0, ''))
+        self.assertFalse(File.objects.exists())
+        self.assertTrue(blob_names[0])
+        self.assertTrue(FileTombstone.objects.filter(path=blob_names[0], reason='orphan').exists())
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, blob_names[0])))
+
+    @override_settings(NCBI_IMPORT_PROGRESS_SECONDS=0)
+    def test_cancel_queued_and_running_jobs(self):
+        from unittest import mock
+        from .models import NcbiImportJob
+        from .ncbi_imports import claim_import_jobs, run_import_job
+
+        queued = self.submit()
+        self.assertEqual(self.client.post(f"/api/files/ncbi/jobs/{queued['id']}/cancel/").json()['job']['status'],
+                         'cancelled')
+        self.assertEqual(self.client.post(f"/api/files/ncbi/jobs/{queued['id']}/cancel/").status_code, 409)
+
+        running = self.submit()
+        claim_import_jobs(10)
+
+        def cancel_midway(offset):
+            if offset >= len(self.BODY) // 2:
+                job = NcbiImportJob.objects.get(pk=running['id'])
+                self.assertGreater(job.bytes_downloaded, 0)
+                self.assertEqual(job.total_bytes, len(self.BODY))
+                self.client.post(f"/api/files/ncbi/jobs/{running['id']}/cancel/")
+
+        response = self.stub_response(self.BODY, on_chunk=cancel_midway)
+        with mock.patch('file_upload.ncbi_client.requests.Session.get', return_value=response), \
+                mock.patch('file_upload.ncbi_client.DOWNLOAD_CHUNK_BYTES', 4096):
+            self.assertEqual(run_import_job(running['id']), 'cancelled')
+        self.assertFalse(File.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'files', str(self.user.id))), [])
+        self.assertEqual(self.client.get('/api/files/ncbi/jobs/', {'status': 'cancelled'}).json()['jobs'][0]['id'],
+                         running['id'])
+
+    def test_unparseable_link_is_rejected_up_front(self):
+        response = self.client.post('/api/files/ncbi/import/', {'url': 'https://example.org/'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def start_eutils_stub(self):
+        """A local E-utilities stand-in; returns its base URL and the (endpoint, params, client port) it saw"""
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import parse_qs, urlparse
+
+        seen = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                endpoint = parsed.path.rsplit('/', 1)[-1]
+                seen.append((endpoint, params, self.client_address[1]))
+                if endpoint == 'esummary.fcgi':
+                    ids = params['id'].split(',')
+                    result = {'uids': [str(100 + n) for n in range(len(ids))]}
+                    for n, accession in enumerate(ids):
+                        result[str(100 + n)] = {'caption': accession.split('.')[0], 'title': f'{accession} contig'}
+                    body = json.dumps({'result': result}).encode()
+                else:
+                    body = f">{params['id']}\nACGTACGT\n".encode()
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f'http://127.0.0.1:{server.server_port}/entrez/eutils', seen
+
+    def test_batch_import_against_stub_eutils(self):
+        from .ncbi_imports import claim_import_jobs, prefetch_summaries, run_import_job
+
+        base, seen = self.start_eutils_stub()
+        items = ['NC_000001.1', 'https://www.ncbi.nlm.nih.gov/nuccore/NC_000002.1', 'not an accession', 'NC_000003.1']
+        with self.settings(NCBI_EUTILS_BASE=base, NCBI_API_KEY='secret', NCBI_REQUESTS_PER_SECOND=50):
+            response = self.client.post('/api/files/ncbi/import/batch/', {'items': items, 'tags': 'batch'},
+                                        format='json')
+            self.assertEqual(response.status_code, 202, response.content)
+            self.assertEqual([error['item'] for error in response.json()['errors']], ['not an accession'])
+            job_ids = claim_import_jobs(10)
+            self.assertEqual(len(job_ids), 3)
+            self.assertEqual(prefetch_summaries(job_ids), 3)
+            self.assertEqual([run_import_job(job_id) for job_id in job_ids], ['done'] * 3)
+
+        summaries = [params for endpoint, params, _port in seen if endpoint == 'esummary.fcgi']
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0]['id'], 'NC_000001.1,NC_000002.1,NC_000003.1')
+        self.assertEqual(summaries[0]['api_key'], 'secret')
+        self.assertEqual(sum(1 for endpoint, _params, _port in seen if endpoint == 'efetch.fcgi'), 3)
+        # Every request went over the same pooled connection
+        self.assertEqual(len({port for _endpoint, _params, port in seen}), 1)
+        self.assertEqual(sorted(File.objects.values_list('title', flat=True)),
+                         ['NC_000001.1 contig', 'NC_000002.1 contig', 'NC_000003.1 contig'])
+
+    def test_batch_skips_repeats_and_existing_targets(self):
+        folder = Folder.objects.create(user=self.user, name='refs')
+        self.make_file('NC_000005.1.fasta', parent_folder=folder)
+        items = ['NC_000005.1', 'NC_000006.1', 'https://www.ncbi.nlm.nih.gov/nuccore/NC_000006.1']
+        response = self.client.post('/api/files/ncbi/import/batch/', {'items': items, 'parent_folder': folder.id},
+                                    format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(len(response.json()['jobs']), 1)
+        self.assertEqual([error['item'] for error in response.json()['errors']], [items[2], items[0]])
+
+        # The queued job now owns NC_000006.1.fasta in that folder
+        again = self.client.post('/api/files/ncbi/import/', {'url': items[2], 'parent_folder': folder.id},
+                                 format='json')
+        self.assertEqual(again.status_code, 409)
+        invalid = self.client.post('/api/files/ncbi/import/batch/', {'items': items, 'parent_folder': 'refs'},
+                                   format='json')
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_sra_summaries_match_by_run_accession(self):
+        from unittest import mock
+        from .ncbi_client import fetch_summaries
+        # Out of request order, keyed by UID, with the run accession only inside the XML fragments
+        result = {
+            'uids': ['902', '901', '903'],
+            '901': {'runs': '<Run acc="SRR0001" total_spots="10"/>', 'expxml': '<Organism name="Homo sapiens"/>',
+                    'title': 'first'},
+            '902': {'runs': '<Run acc="SRR0002" total_spots="10"/>', 'title': 'second'},
+            '903': {'runs': '<Run acc="SRR0009"/>', 'title': 'unrequested'},
+        }
+        response = mock.Mock(json=mock.Mock(return_value={'result': result}))
+        with mock.patch('file_upload.ncbi_client._get', return_value=response):
+            summaries = fetch_summaries('sra', ['SRR0001', 'SRR0002', 'SRR0003'])
+        self.assertEqual({accession: summary['title'] for accession, summary in summaries.items()},
+                         {'SRR0001': 'first', 'SRR0002': 'second'})
+
+    def test_throttled_requests_retry_through_the_rate_limiter(self):
+        from unittest import mock
+        from . import ncbi_client
+        answers = [mock.Mock(status_code=429, headers={'Retry-After': '2'}),
+                   mock.Mock(status_code=503, headers={}), mock.Mock(status_code=200, headers={})]
+        with mock.patch.object(ncbi_client.requests.Session, 'get', side_effect=answers) as get, \
+                mock.patch.object(ncbi_client.TokenBucket, 'acquire') as acquire, \
+                mock.patch.object(ncbi_client.time, 'sleep') as sleep:
+            response = ncbi_client._get('https://example.org/fastq')
+        self.assertEqual((response.status_code, get.call_count, acquire.call_count), (200, 3, 3))
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [2.0, 1.0])
+
+    def test_rate_limiter_follows_ncbi_policy(self):
+        from .ncbi_client import TokenBucket, request_rate
+
+        with self.settings(NCBI_API_KEY='', NCBI_REQUESTS_PER_SECOND=0):
+            self.assertEqual(request_rate(), 3.0)
+        with self.settings(NCBI_API_KEY='secret', NCBI_REQUESTS_PER_SECOND=0):
+            self.assertEqual(request_rate(), 10.0)
+
+        now = [0.0]
+        calls = []
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        bucket = TokenBucket(3, clock=lambda: now[0], sleep=sleep)
+        for _ in range(7):
+            bucket.acquire()
+            calls.append(now[0])
+        self.assertAlmostEqual(calls[-1], 2.0)
+        self.assertTrue(all(later - earlier >= 1 / 3 - 1e-9 for earlier, later in zip(calls, calls[1:])))
\ No newline at end of file
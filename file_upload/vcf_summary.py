@@ -0,0 +1,248 @@
+"""
+Whole-file VCF summaries parsed in parallel chunks.
+
+The record section is split into byte ranges (BGZF block runs for bgzipped
+files) that worker processes parse independently. A chunk does not know
+whether it starts on a line boundary, so each worker returns the partial
+line at either edge and the parent stitches neighbouring fragments back
+into whole records.
+"""
+
+import gzip
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .compression import bgzf_block_offsets, detect_compression, is_bgzf, open_binary
+
+# Files smaller than this are parsed in-process
+PARALLEL_THRESHOLD = 64 * 1024 * 1024
+TARGET_CHUNK_SIZE = 32 * 1024 * 1024
+# Records tallied when only the head of a file is summarized
+HEAD_RECORDS = 1000
+
+TRANSITIONS = {(b'A', b'G'), (b'G', b'A'), (b'C', b'T'), (b'T', b'C')}
+BASES = {b'A', b'C', b'G', b'T'}
+STRUCTURED_HEADER = re.compile(r'^##(\w+)=<(.*)>$')
+HEADER_FIELD = re.compile(r'(\w+)=("(?:[^"\\]|\\.)*"|[^,]*)')
+
+# (byte range) for plain files, (compressed byte range) for BGZF
+Chunk = Tuple[str, int, int, bool]
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """Parse the ``##`` meta lines and the ``#CHROM`` sample columns"""
+    meta: Dict[str, Any] = {'contigs': [], 'info_fields': [], 'format_fields': [], 'filters': []}
+    header_info: Dict[str, str] = {}
+    samples: List[str] = []
+    with open_binary(path) as handle:
+        for raw in handle:
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            if line.startswith('#CHROM'):
+                samples = line.split('\t')[9:]
+                break
+            if not line.startswith('##'):
+                break
+            structured = STRUCTURED_HEADER.match(line)
+            if structured:
+                kind, body = structured.groups()
+                fields = {key: value.strip('"') for key, value in HEADER_FIELD.findall(body)}
+                if kind == 'contig':
+                    length = fields.get('length')
+                    meta['contigs'].append({'id': fields.get('ID'), 'length': int(length) if length and length.isdigit() else None})
+                elif kind in ('INFO', 'FORMAT'):
+                    meta['info_fields' if kind == 'INFO' else 'format_fields'].append({
+                        'id': fields.get('ID'),
+                        'number': fields.get('Number'),
+                        'type': fields.get('Type'),
+                        'description': fields.get('Description', ''),
+                    })
+                elif kind == 'FILTER':
+                    meta['filters'].append({'id': fields.get('ID'), 'description': fields.get('Description', '')})
+            elif '=' in line:
+                key, value = line[2:].split('=', 1)
+                if key in ('fileformat', 'reference', 'source', 'fileDate'):
+                    header_info['file_format' if key == 'fileformat' else key] = value
+    meta['header_info'] = header_info
+    meta['samples'] = samples
+    return meta
+
+
+class VariantCounts:
+    """Running tallies over VCF records; instances from different chunks merge with ``+=``"""
+
+    def __init__(self):
+        self.per_chromosome = Counter()
+        self.snv = self.indel = self.mnv = self.other = 0
+        self.multiallelic = 0
+        self.transitions = self.transversions = 0
+
+    def add_line(self, line: bytes):
+        if not line or line.startswith(b'#'):
+            return
+        fields = line.split(b'\t', 5)
+        if len(fields) < 5:
+            return
+        chrom, ref, alts = fields[0], fields[3].upper(), fields[4].upper()
+        self.per_chromosome[chrom] += 1
+        alt_list = alts.split(b',')
+        if len(alt_list) > 1:
+            self.multiallelic += 1
+        for alt in alt_list:
+            if alt in (b'.', b'*') or alt.startswith(b'<') or b'[' in alt or b']' in alt:
+                self.other += 1
+            elif len(ref) == 1 and len(alt) == 1:
+                if ref in BASES and alt in BASES:
+                    self.snv += 1
+                    if (ref, alt) in TRANSITIONS:
+                        self.transitions += 1
+                    else:
+                        self.transversions += 1
+                else:
+                    self.other += 1
+            elif len(ref) == len(alt):
+                self.mnv += 1
+            else:
+                self.indel += 1
+
+    def add_block(self, text: bytes):
+        for line in text.split(b'\n'):
+            self.add_line(line.rstrip(b'\r'))
+
+    def __iadd__(self, other: 'VariantCounts'):
+        self.per_chromosome.update(other.per_chromosome)
+        for name in ('snv', 'indel', 'mnv', 'other', 'multiallelic', 'transitions', 'transversions'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            'variant_count': sum(self.per_chromosome.values()),
+            'variants_per_chromosome': {
+                chrom.decode('utf-8', 'replace'): count for chrom, count in self.per_chromosome.items()
+            },
+            'snv_count': self.snv,
+            'indel_count': self.indel,
+            'mnv_count': self.mnv,
+            'other_allele_count': self.other,
+            'multiallelic_count': self.multiallelic,
+            'transitions': self.transitions,
+            'transversions': self.transversions,
+            'ts_tv_ratio': round(self.transitions / self.transversions, 3) if self.transversions else None,
+        }
+
+
+def _read_chunk(path: str, start: int, end: int, bgzf: bool) -> bytes:
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        raw = handle.read(end - start)
+    if not bgzf:
+        return raw
+    # Each BGZF block is a complete gzip member
+    return gzip.decompress(raw) if raw else b''
+
+
+def parse_chunk(chunk: Chunk) -> Tuple[bytes, VariantCounts, bytes, bool]:
+    """
+    Count the whole lines in one chunk.
+
+    Returns the bytes before the first newline and after the last one, which
+    may be halves of records that straddle a chunk edge, and whether the
+    chunk contained a newline at all.
+    """
+    data = _read_chunk(*chunk)
+    counts = VariantCounts()
+    first = data.find(b'\n')
+    if first < 0:
+        return data, counts, b'', False
+    last = data.rfind(b'\n')
+    counts.add_block(data[first + 1:last])
+    return data[:first], counts, data[last + 1:], True
+
+
+def plan_chunks(path: str, chunk_size: int = TARGET_CHUNK_SIZE) -> List[Chunk]:
+    size = os.path.getsize(path)
+    if is_bgzf(path):
+        offsets = bgzf_block_offsets(path) + [size]
+        chunks, start = [], 0
+        for offset in offsets[1:]:
+            if offset - start >= chunk_size or offset == size:
+                if offset > start:
+                    chunks.append((path, start, offset, True))
+                start = offset
+        return chunks
+    return [(path, start, min(start + chunk_size, size), False) for start in range(0, size, chunk_size)] or [
+        (path, 0, 0, False)]
+
+
+def _count_sequential(path: str) -> VariantCounts:
+    counts = VariantCounts()
+    with open_binary(path) as handle:
+        for line in handle:
+            counts.add_line(line.rstrip(b'\r\n'))
+    return counts
+
+
+def summarize_vcf(path: str, workers: Optional[int] = None, chunk_size: int = TARGET_CHUNK_SIZE,
+                  parallel_threshold: int = PARALLEL_THRESHOLD) -> Dict[str, Any]:
+    """Full header definitions plus variant tallies over every record in ``path``"""
+    meta = read_header(path)
+    size = os.path.getsize(path)
+
+    if size < parallel_threshold or detect_compression(path) not in (None, 'bgzf'):
+        # Plain gzip and zstd streams cannot be split; small files are not worth a pool
+        counts = _count_sequential(path)
+    else:
+        chunks = plan_chunks(path, chunk_size)
+        workers = workers or min(len(chunks), os.cpu_count() or 1)
+        counts = VariantCounts()
+        carry = b''
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for head, chunk_counts, tail, has_newline in pool.map(parse_chunk, chunks):
+                if not has_newline:
+                    # The whole chunk sits inside one record
+                    carry += head
+                    continue
+                # ``head`` completes the record left open by the previous chunk
+                counts.add_line((carry + head).rstrip(b'\r'))
+                counts += chunk_counts
+                carry = tail
+        counts.add_line(carry.rstrip(b'\r'))
+
+    return _summary(meta, counts, 'full_file')
+
+
+def summarize_vcf_head(path: str, max_records: int = HEAD_RECORDS) -> Dict[str, Any]:
+    """Header definitions plus tallies over the first ``max_records`` records only"""
+    meta = read_header(path)
+    counts = VariantCounts()
+    records = 0
+    with open_binary(path, threads=1) as handle:
+        try:
+            for line in handle:
+                if not line.startswith(b'#'):
+                    counts.add_line(line.rstrip(b'\r\n'))
+                    records += 1
+                    if records >= max_records:
+                        break
+        except EOFError:
+            # A truncated compressed head (e.g. a partial upload) ends mid-stream
+            pass
+    return _summary(meta, counts, 'head')
+
+
+def _summary(meta: Dict[str, Any], counts: VariantCounts, scope: str) -> Dict[str, Any]:
+    summary = counts.result()
+    summary.update({
+        'sample_count': len(meta['samples']),
+        'sample_names': meta['samples'][:10],
+        'header_info': meta['header_info'],
+        'contigs': meta['contigs'],
+        'info_fields': meta['info_fields'],
+        'format_fields': meta['format_fields'],
+        'filters': meta['filters'],
+        'stats_scope': scope,
+    })
+    return summary
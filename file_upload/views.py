@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect
 from .models import File
 from .forms import FileUploadForm, FileUploadModelForm
+from .pagination import InvalidCursor, paginate_keyset, parse_page_size
 import os
 import uuid
 from django.http import JsonResponse
@@ -9,10 +10,14 @@ from django.template.defaultfilters import filesizeformat
 # Create your views here.
 
 
-# Show file list
+# Show file list, one keyset page at a time (?cursor=...)
 def file_list(request):
-    files = File.objects.all().order_by("-id")
-    return render(request, 'file_upload/file_list.html', {'files': files})
+    try:
+        page = paginate_keyset(File.objects.all(), cursor=request.GET.get('cursor') or None,
+                               page_size=parse_page_size(request.GET.get('page_size')))
+    except InvalidCursor:
+        page = paginate_keyset(File.objects.all(), page_size=parse_page_size(None))
+    return render(request, 'file_upload/file_list.html', {'files': page.items, 'next_cursor': page.next_cursor})
 
 
 # Regular file upload without using ModelForm
@@ -94,13 +99,13 @@ def ajax_upload(request):
         form = FileUploadModelForm(data=request.POST, files=request.FILES)
         if form.is_valid():
             form.save()
-            # Obtain the latest file list
-            files = File.objects.all().order_by('-id')
+            # Obtain the latest page of the file list
+            files = paginate_keyset(File.objects.all(), page_size=parse_page_size(None)).items
             data = []
             for file in files:
                 data.append({
                     "url": file.file.url,
-                    "size": filesizeformat(file.file.size),
+                    "size": filesizeformat(file.file_size),
                     "upload_method": file.upload_method,
                     "original_filename": file.original_filename or os.path.basename(file.file.name),
                     })
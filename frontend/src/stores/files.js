@@ -4,6 +4,7 @@ import axios from 'axios'
 export const useFilesStore = defineStore('files', {
   state: () => ({
     files: [],
+    filesNextCursor: null, // 下一页文件的游标
     folders: [],
     currentFolder: null,
     breadcrumb: [],
@@ -76,6 +77,7 @@ export const useFilesStore = defineStore('files', {
         
         // 更新状态
         this.files = response.data.files || []
+        this.filesNextCursor = response.data.next_cursor || null
         this.folders = response.data.folders || []
         this.currentFolder = response.data.current_folder || null
         this.currentFolderId = this.currentFolder ? this.currentFolder.id : null
@@ -94,6 +96,23 @@ export const useFilesStore = defineStore('files', {
       }
     },
 
+    async loadMoreFiles() {
+      if (!this.filesNextCursor || this.isLoading) return
+      this.isLoading = true
+      try {
+        const params = { cursor: this.filesNextCursor }
+        if (this.currentFolderId) params.folder_id = this.currentFolderId
+        const response = await axios.get('/api/files/', { params })
+        this.files = this.files.concat(response.data.files || [])
+        this.filesNextCursor = response.data.next_cursor || null
+      } catch (error) {
+        this.error = error.response?.data?.message || '获取文件列表失败'
+        console.error('Load more files error:', error)
+      } finally {
+        this.isLoading = false
+      }
+    },
+
     async uploadFile(file, uploadMethod = 'Vue Frontend', parentFolderId = null) {
       // 启用分片上传以支持真正暂停/继续
       this.isLoading = true
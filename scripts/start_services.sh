@@ -95,9 +95,66 @@ start_backend() {
   wait_for_port "后端" "$BACKEND_PORT" 20
 }
 
+start_reaper() {
+  echo "启动文件回收进程 (reap_files) ..."
+  if [[ -f "$PID_DIR/reaper.pid" ]]; then
+    local pid
+    pid="$(cat "$PID_DIR/reaper.pid" || true)"
+    if [[ -n "${pid}" ]] && kill -0 "$pid" 2>/dev/null; then
+      echo "文件回收进程已在运行 (PID ${pid})，跳过启动。"
+      return 0
+    fi
+  fi
+  (
+    cd "$BACKEND_DIR"
+    nohup python3 manage.py reap_files \
+      > "$LOG_DIR/reaper.log" 2>&1 &
+    echo $! > "$PID_DIR/reaper.pid"
+  )
+}
+
+start_extractor() {
+  echo "启动元数据提取进程 (extract_metadata) ..."
+  if [[ -f "$PID_DIR/extractor.pid" ]]; then
+    local pid
+    pid="$(cat "$PID_DIR/extractor.pid" || true)"
+    if [[ -n "${pid}" ]] && kill -0 "$pid" 2>/dev/null; then
+      echo "元数据提取进程已在运行 (PID ${pid})，跳过启动。"
+      return 0
+    fi
+  fi
+  (
+    cd "$BACKEND_DIR"
+    nohup python3 manage.py extract_metadata \
+      > "$LOG_DIR/extractor.log" 2>&1 &
+    echo $! > "$PID_DIR/extractor.pid"
+  )
+}
+
+start_ncbi_importer() {
+  echo "启动 NCBI 导入进程 (run_ncbi_imports) ..."
+  if [[ -f "$PID_DIR/ncbi_importer.pid" ]]; then
+    local pid
+    pid="$(cat "$PID_DIR/ncbi_importer.pid" || true)"
+    if [[ -n "${pid}" ]] && kill -0 "$pid" 2>/dev/null; then
+      echo "NCBI 导入进程已在运行 (PID ${pid})，跳过启动。"
+      return 0
+    fi
+  fi
+  (
+    cd "$BACKEND_DIR"
+    nohup python3 manage.py run_ncbi_imports \
+      > "$LOG_DIR/ncbi_importer.log" 2>&1 &
+    echo $! > "$PID_DIR/ncbi_importer.pid"
+  )
+}
+
 start_frontend
 start_backend
+start_reaper
+start_extractor
+start_ncbi_importer
 
 echo "已尝试启动：前端 http://localhost:${FRONTEND_PORT}/，后端 http://localhost:${BACKEND_PORT}/"
-echo "日志: $LOG_DIR/frontend.log, $LOG_DIR/backend.log"
-echo "PID 文件: $PID_DIR/frontend.pid, $PID_DIR/backend.pid"
\ No newline at end of file
+echo "日志: $LOG_DIR/frontend.log, $LOG_DIR/backend.log, $LOG_DIR/reaper.log, $LOG_DIR/extractor.log, $LOG_DIR/ncbi_importer.log"
+echo "PID 文件: $PID_DIR/frontend.pid, $PID_DIR/backend.pid, $PID_DIR/reaper.pid, $PID_DIR/extractor.pid, $PID_DIR/ncbi_importer.pid"
\ No newline at end of file
@@ -82,6 +82,9 @@ stop_one() {
 
 stop_one "前端" "$PID_DIR/frontend.pid"
 stop_one "后端" "$PID_DIR/backend.pid"
+stop_one "文件回收" "$PID_DIR/reaper.pid"
+stop_one "元数据提取" "$PID_DIR/extractor.pid"
+stop_one "NCBI 导入" "$PID_DIR/ncbi_importer.pid"
 
 kill_by_port "前端" "$FRONTEND_PORT"
 kill_by_port "后端" "$BACKEND_PORT"